@@ -0,0 +1 @@
+# Lets a bare `pytest` (as in CI) import the monitor package from the repository root.
@@ -1,7 +1,5 @@
 # gui.py
-import os
-import json
-import datetime
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, font
 import matplotlib
@@ -9,30 +7,13 @@ matplotlib.rcParams['font.family'] = 'sans-serif'
 matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
-from monitor import SingleMonitor, OneBotWSClient
-
-CONFIG_FILE = "bili_monitor_config.json"
-DEFAULT_BOT_QQ = 3807093079  # 由你提供或修改为实际值
-
-def load_config():
-    cfg = {}
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-        except Exception:
-            cfg = {}
-    # ensure bot qq exists
-    if "onebot_bot_qq" not in cfg or not cfg.get("onebot_bot_qq"):
-        cfg["onebot_bot_qq"] = DEFAULT_BOT_QQ
-    return cfg
-
-def save_config(cfg):
-    try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print("保存配置失败:", e)
+from monitor.config import load_config, save_config
+from monitor.notifier import endpoint_urls
+from monitor.push import push_targets
+from monitor import SingleMonitor, MonitorHub
+from monitor.ui_refresh import RefreshTicker
+from monitor.logsink import LogSink
+from monitor.overview import OverviewTable
 
 class BiliVideoMonitorGUI:
     def __init__(self, root):
@@ -41,22 +22,51 @@ class BiliVideoMonitorGUI:
         self.root.geometry("1280x900")
 
         self.config = load_config()
-        self.default_interval = int(self.config.get("default_interval", 75))
-
-        self.obot_client = OneBotWSClient(lambda: self.config, on_log=self._log)
-        if self.config.get("onebot_enabled", False) and self.config.get("onebot_ws_url"):
-            try:
-                self.obot_client.start()
-            except Exception:
-                pass
-
-        self.monitors = {}  # bv -> SingleMonitor
+        # every component logs into this sink from any thread; the widget is filled on a timer
+        self.logsink = LogSink.from_config(self.config)
+        self.log_flush_ms = int(self.config.get("log_flush_ms", 250))
+        # the services shared by every monitor (engine, limiter, OneBot, exporter, covers)
+        self.hub = MonitorHub(self.config, on_log=self._log, on_debug=self.logsink.debug)
+        self.obot_client = self.hub.obot_client
+        self.outbox = self.hub.outbox
+        self.exporter = self.hub.exporter
+        self.limiter = self.hub.limiter
+        self.scheduler = self.hub.scheduler
+        self.engine = self.hub.engine
+        self.cover_cache = self.hub.cover_cache
+
+        # every BV gets a light placeholder tab; its SingleMonitor (summary, cover, charts) is
+        # only built when the tab is first selected, and may be released again when hidden long
+        self.tabs = {}  # bv -> outer notebook tab
+        self.monitors = {}  # bv -> SingleMonitor (the Tk view of hub.monitors[bv]), built tabs only
+        self._hidden_since = {}  # bv -> time.monotonic() when its built tab was hidden
+        self._shown_bv = None
+        self.tab_release_after = int(self.config.get("tab_release_after", 0))  # seconds, 0: keep
+        # every view redraws on this shared tick (latest state only), not once per sample
+        self.ticker = RefreshTicker(self.root, fps=float(self.config.get("gui_refresh_fps", RefreshTicker.DEFAULT_FPS)),
+                                    on_log=self._log)
+        self._push_all_busy = False
 
         self._build_ui()
 
         # load persisted BV list and restore tabs/monitors (do not auto-start)
         self._restore_persisted_bvs()
 
+        self._refresh_api_stats()
+        self.ticker.start()
+        self._flush_log()
+        self._refresh_overview()
+        if self.tab_release_after > 0:
+            self._release_hidden_tabs()
+
+    @property
+    def default_interval(self):
+        return self.hub.default_interval
+
+    @default_interval.setter
+    def default_interval(self, v):
+        self.hub.default_interval = v
+
     def _build_ui(self):
         main = ttk.Frame(self.root, padding=8)
         main.pack(fill=tk.BOTH, expand=True)
@@ -76,14 +86,17 @@ class BiliVideoMonitorGUI:
         ttk.Button(top, text="应用间隔（立即生效）", command=self.apply_interval).grid(row=0, column=5, padx=(8, 4))
         ttk.Button(top, text="保存默认间隔", command=self.save_default_interval).grid(row=0, column=6, padx=(8, 4))
 
+        self.api_stats_var = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.api_stats_var).grid(row=0, column=7, sticky=tk.W, padx=(8, 4))
+
         # OneBot
         onebot_frame = ttk.LabelFrame(main, text="OneBot (WebSocket) 设置", padding=8)
         onebot_frame.pack(fill=tk.X, pady=(0, 6))
 
-        ttk.Label(onebot_frame, text="WS URL:").grid(row=0, column=0, sticky=tk.W)
+        ttk.Label(onebot_frame, text="WS URL (可逗号分隔多个):").grid(row=0, column=0, sticky=tk.W)
         self.onebot_url_entry = ttk.Entry(onebot_frame, width=50)
         self.onebot_url_entry.grid(row=0, column=1, sticky=tk.W, padx=(4, 8))
-        self.onebot_url_entry.insert(0, self.config.get("onebot_ws_url", ""))
+        self.onebot_url_entry.insert(0, ", ".join(endpoint_urls(self.config)))
 
         self.onebot_enabled_var = tk.BooleanVar(value=self.config.get("onebot_enabled", False))
         ttk.Checkbutton(onebot_frame, text="启用 OneBot 通知", variable=self.onebot_enabled_var).grid(row=0, column=2, padx=(8, 4))
@@ -134,6 +147,13 @@ class BiliVideoMonitorGUI:
 
         self.bv_notebook = ttk.Notebook(main)
         self.bv_notebook.pack(fill=tk.BOTH, expand=True)
+        self.bv_notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+        # first tab: every BV in one table (the per-BV tabs follow)
+        self.overview_tab = ttk.Frame(self.bv_notebook)
+        self.bv_notebook.add(self.overview_tab, text="总览")
+        self.overview = OverviewTable(self.overview_tab, on_open=self._open_bv_tab)
+        self.overview_refresh_ms = int(self.config.get("overview_refresh_ms", 1000))
 
     # BV management
     def add_bv(self):
@@ -141,52 +161,88 @@ class BiliVideoMonitorGUI:
         if not bv:
             messagebox.showerror("错误", "请输入 BV 号")
             return
-        if bv in self.monitors:
+        if bv in self.tabs:
             messagebox.showwarning("提示", "该 BV 已添加")
             return
 
-        # create tab (this frame acts as the notebook tab id)
-        tab = ttk.Frame(self.bv_notebook)
-        self.bv_notebook.add(tab, text=bv)
-
-        # add to listbox
-        self.bv_listbox.insert(tk.END, bv)
-
-        # create monitor with parent_frame == tab
-        monitor = SingleMonitor(tab, bv, self.get_interval, self._log, obot_client=self.obot_client)
-        self.monitors[bv] = monitor
-
-        # persist the bv to config
-        try:
-            bvs = self.config.get("monitored_bvs", [])
-            if not isinstance(bvs, list):
-                bvs = []
-            if bv not in bvs:
-                bvs.append(bv)
-                self.config["monitored_bvs"] = bvs
-                save_config(self.config)
-        except Exception as e:
-            self._log("保存 monitored_bvs 失败: %s" % e)
-
+        # the hub also persists the bv to config
+        self._add_tab(bv, self.hub.add(bv, get_global_interval=self.get_interval))
         self._log("已添加 %s" % bv)
 
     def _restore_bv(self, bv):
         """从持久化配置恢复 BV 监控和大tab（不自动开始监控）"""
-        if bv in self.monitors:
+        if bv in self.tabs:
             return
+        self._add_tab(bv, self.hub.add(bv, get_global_interval=self.get_interval, persist=False))
+        self._log("已从配置恢复监控: %s" % bv)
+
+    def _add_tab(self, bv, core):
+        # create tab (this frame acts as the notebook tab id); its widgets come on first selection
         tab = ttk.Frame(self.bv_notebook)
         self.bv_notebook.add(tab, text=bv)
+        self.tabs[bv] = tab
+        # add to listbox
         self.bv_listbox.insert(tk.END, bv)
 
-        monitor = SingleMonitor(tab, bv, self.get_interval, self._log, obot_client=self.obot_client)
-        self.monitors[bv] = monitor
-        self._log("已从配置恢复监控: %s" % bv)
+    def _materialize(self, bv):
+        """ SingleMonitor for bv, built into its placeholder tab on first use. """
+        view = self.monitors.get(bv)
+        if view is None:
+            view = SingleMonitor(self.tabs[bv], self.hub.monitors[bv], on_log=self._log, ticker=self.ticker)
+            self.monitors[bv] = view
+        return view
 
-    def _restore_persisted_bvs(self):
-        bvs = self.config.get("monitored_bvs", []) or []
-        if not isinstance(bvs, (list, tuple)):
+    def _on_tab_changed(self, event=None):
+        try:
+            selected = self.bv_notebook.select()
+        except Exception:
             return
-        for bv in bvs:
+        bv = next((b for b, tab in self.tabs.items() if str(tab) == str(selected)), None)
+        if self._shown_bv is not None and self._shown_bv != bv:
+            self._hidden_since[self._shown_bv] = time.monotonic()
+        self._shown_bv = bv
+        if bv is None:
+            if str(selected) == str(self.overview_tab):
+                self.overview.sync(self.hub.monitors)
+            return
+        self._hidden_since.pop(bv, None)
+        try:
+            self._materialize(bv).refresh()
+        except Exception as e:
+            self._log("创建 %s 界面失败: %s" % (bv, e))
+
+    def _refresh_overview(self):
+        """ Update the overview rows of the BVs that changed, while the overview is shown. """
+        try:
+            if str(self.bv_notebook.select()) == str(self.overview_tab):
+                self.overview.sync(self.hub.monitors)
+        except Exception as e:
+            self._log("刷新总览失败: %s" % e)
+        self.root.after(self.overview_refresh_ms, self._refresh_overview)
+
+    def _open_bv_tab(self, bv):
+        tab = self.tabs.get(bv)
+        if tab is not None:
+            self.bv_notebook.select(tab)
+
+    def _release_hidden_tabs(self):
+        """ Drop the widgets of tabs hidden for tab_release_after seconds; sampling goes on. """
+        now = time.monotonic()
+        for bv, since in list(self._hidden_since.items()):
+            view = self.monitors.get(bv)
+            if view is None or now - since < self.tab_release_after or view._btn_busy:
+                continue
+            del self._hidden_since[bv]
+            del self.monitors[bv]
+            view.release()
+        self.root.after(30000, self._release_hidden_tabs)
+
+    def _monitor(self, bv):
+        """ The view of bv if it is built (keeps its buttons in sync), else its core. """
+        return self.monitors.get(bv) or self.hub.monitors.get(bv)
+
+    def _restore_persisted_bvs(self):
+        for bv in self.hub.persisted_bvs():
             try:
                 self._restore_bv(bv)
             except Exception as e:
@@ -200,39 +256,21 @@ class BiliVideoMonitorGUI:
 
         for idx in reversed(sel):
             bv = self.bv_listbox.get(idx)
-            # stop monitor if running
-            if bv in self.monitors:
-                try:
-                    self.monitors[bv].stop()
-                except Exception:
-                    pass
-
+            if bv in self.tabs:
                 # the tab in the outer notebook is the parent_frame passed to SingleMonitor
+                parent_tab = self.tabs.pop(bv)
+                view = self.monitors.pop(bv, None)
+                self._hidden_since.pop(bv, None)
+                if view is not None:
+                    view.release()
+                # forget from notebook
                 try:
-                    parent_tab = self.monitors[bv].parent_frame
-                    # forget from notebook
-                    try:
-                        self.bv_notebook.forget(parent_tab)
-                    except Exception as e:
-                        self._log("移除 Tab 失败 (forget) %s: %s" % (bv, e))
-                    # destroy parent tab widget
-                    try:
-                        parent_tab.destroy()
-                    except Exception:
-                        pass
+                    self.bv_notebook.forget(parent_tab)
                 except Exception as e:
-                    self._log("移除 Tab 失败 (获取 parent_frame) %s: %s" % (bv, e))
-
-                # destroy internal monitor frame (if exists)
+                    self._log("移除 Tab 失败 (forget) %s: %s" % (bv, e))
+                # destroy parent tab widget
                 try:
-                    if hasattr(self.monitors[bv], "frame") and self.monitors[bv].frame.winfo_exists():
-                        self.monitors[bv].frame.destroy()
-                except Exception:
-                    pass
-
-                # finally remove from monitors dict
-                try:
-                    del self.monitors[bv]
+                    parent_tab.destroy()
                 except Exception:
                     pass
 
@@ -242,15 +280,8 @@ class BiliVideoMonitorGUI:
             except Exception:
                 pass
 
-            # remove from persisted config
-            try:
-                bvs = self.config.get("monitored_bvs", []) or []
-                if bv in bvs:
-                    bvs.remove(bv)
-                    self.config["monitored_bvs"] = bvs
-                    save_config(self.config)
-            except Exception as e:
-                self._log("从配置移除 %s 失败: %s" % (bv, e))
+            # stop monitor if running and remove it from the persisted config
+            self.hub.remove(bv)
 
             self._log("已移除 %s" % bv)
 
@@ -261,9 +292,9 @@ class BiliVideoMonitorGUI:
             return
         for idx in sel:
             bv = self.bv_listbox.get(idx)
-            if bv in self.monitors:
+            if bv in self.tabs:
                 try:
-                    self.monitors[bv].start()
+                    self._monitor(bv).start()
                 except Exception as e:
                     self._log("启动 %s 失败: %s" % (bv, e))
 
@@ -274,21 +305,21 @@ class BiliVideoMonitorGUI:
             return
         for idx in sel:
             bv = self.bv_listbox.get(idx)
-            if bv in self.monitors:
+            if bv in self.tabs:
                 try:
-                    self.monitors[bv].stop()
+                    self._monitor(bv).stop()
                 except Exception as e:
                     self._log("停止 %s 失败: %s" % (bv, e))
 
     def start_all(self):
-        for m in list(self.monitors.values()):
+        for m in [self._monitor(bv) for bv in list(self.tabs)]:
             try:
                 m.start()
             except Exception as e:
                 self._log("start_all 某监控启动失败: %s" % e)
 
     def stop_all(self):
-        for m in list(self.monitors.values()):
+        for m in [self._monitor(bv) for bv in list(self.tabs)]:
             try:
                 m.stop()
             except Exception as e:
@@ -304,16 +335,28 @@ class BiliVideoMonitorGUI:
         except Exception:
             return self.default_interval
 
+    def _refresh_api_stats(self):
+        try:
+            self.api_stats_var.set(self.hub.status_line())
+        except Exception:
+            pass
+        self.root.after(2000, self._refresh_api_stats)
+
     def apply_interval(self):
         v = self.get_interval()
         self.default_interval = v
         self.config["default_interval"] = v
         save_config(self.config)
         self._log("已将间隔设置为 %d 秒（实时生效）" % v)
-        for m in self.monitors.values():
+        if self.scheduler is not None:
+            # the global interval is the fallback for monitors without a prediction yet
+            self.scheduler.rebalance()
+        for bv, core in list(self.hub.monitors.items()):
             try:
-                if not m.interval_var.get().strip():
-                    m.effective_interval_var.set(v)
+                if not core._local_interval:
+                    if bv in self.monitors:
+                        self.monitors[bv]._show_interval()
+                    core.wake()
             except Exception:
                 pass
 
@@ -354,7 +397,10 @@ class BiliVideoMonitorGUI:
         group_ids = parse_ids(gid_raw)
         user_ids = parse_ids(uid_raw)
 
-        self.config["onebot_ws_url"] = url
+        # endpoint_urls() prefers the list: keep both keys on what the entry shows
+        urls = endpoint_urls({"onebot_ws_url": url})
+        self.config["onebot_ws_urls"] = urls
+        self.config["onebot_ws_url"] = ", ".join(urls)
         self.config["onebot_enabled"] = enabled
         if group_ids is not None:
             self.config["onebot_group_ids"] = group_ids
@@ -385,25 +431,16 @@ class BiliVideoMonitorGUI:
             pass
 
         save_config(self.config)
-        try:
-            self.obot_client.stop()
-        except Exception:
-            pass
-        self.obot_client = OneBotWSClient(lambda: self.config, on_log=self._log)
-        for m in self.monitors.values():
-            m.obot_client = self.obot_client
-        if enabled and url:
-            try:
-                self.obot_client.start()
-                self._log("OneBot 客户端已启动（WebSocket）")
-            except Exception as e:
-                self._log("OneBot 启动失败: %s" % e)
+        # applied in place: the client reconnects by itself and keeps queued messages
+        self.obot_client.reload_config()
+        if enabled and urls:
+            self.obot_client.when_ready(lambda f: self._log("OneBot 配置已应用（WebSocket）"))
         else:
             self._log("OneBot 未启用或 URL 为空（已保存配置）")
 
     # 全部推送（合并转发）：对所有 BV 构造 nodes 列表并发出 forward
     def push_all(self):
-        if not self.monitors:
+        if not self.hub.monitors:
             messagebox.showinfo("提示", "当前没有监控项")
             return
         if not self.obot_client:
@@ -414,121 +451,54 @@ class BiliVideoMonitorGUI:
             messagebox.showwarning("OneBot 未启用", "请先在设置中启用 OneBot")
             return
 
-        group_ids = cfg.get("onebot_group_ids") or cfg.get("onebot_group_id") or []
-        user_ids = cfg.get("onebot_user_ids") or cfg.get("onebot_user_id") or []
-
-        def normalize_list(x):
-            if x is None:
-                return []
-            if isinstance(x, (list, tuple)):
-                return [int(i) for i in x if str(i).strip()]
-            s = str(x).strip()
-            if not s:
-                return []
-            parts = [p.strip() for p in s.split(",") if p.strip()]
-            out = []
-            for p in parts:
-                try:
-                    out.append(int(p))
-                except Exception:
-                    continue
-            return out
-        group_ids = normalize_list(group_ids)
-        user_ids = normalize_list(user_ids)
+        group_ids, user_ids = push_targets(cfg)
         if not group_ids and not user_ids:
             messagebox.showwarning("目标为空", "请配置目标群或私聊用户")
             return
+        if self._push_all_busy:
+            return
+        self._push_all_busy = True
+        # reading samples, encoding covers and sending happen on a worker, not the Tk thread
+        self.engine.run_in_worker(self._push_all_worker, cfg)
 
-        bot_qq = str(cfg.get("onebot_bot_qq") or 0)
-        # build a list of forward nodes: each monitor becomes a node (text + image if available)
-        nodes = []
-        for bv, mon in self.monitors.items():
-            # get last sample
-            with mon._lock:
-                if not mon.data:
-                    continue
-                last = mon.data[-1]
-            view = last.get("view", 0)
-            like = last.get("like", 0)
-            coin = last.get("coin", 0)
-            reply = last.get("reply", 0)
-            share = last.get("share", 0)
-            danmaku = last.get("danmaku", 0)
-            view_inc = last.get("view_increment", 0)
-            sampling_time = last.get("time", "")
-            favorite = last.get("favorite", 0)
-            text = (
-                "视频标题:%s\n"
-                "视频bv号:%s\n"
-                "播放数: %s\n"
-                "点赞: %s\n"
-                "硬币: %s\n"
-                "评论: %s\n"
-                "收藏: %s\n"
-                "分享: %s\n"
-                "弹幕: %s\n"
-                "播放量增量: %s\n"
-                "数据采样时间: %s"
-            ) % (mon.latest_info.get("title") if isinstance(mon.latest_info, dict) else bv, bv, view, like, coin, reply, favorite, share, danmaku, view_inc, sampling_time)
-
-            # use a single text segment containing newline characters
-            content = [
-                {"type": "text", "data": {"text": text}}
-            ]
-
-            cover_path = mon.get_cover_path()
-            if cover_path and os.path.exists(cover_path):
-                try:
-                    with open(cover_path, "rb") as f:
-                        b = f.read()
-                    import base64
-                    b64 = base64.b64encode(b).decode()
-                    content.append({"type": "image", "data": {"file": "base64://" + b64}})
-                except Exception as e:
-                    self._log("读取封面失败 %s: %s" % (bv, e))
-            node = {"type": "node", "data": {"name": "监控器", "uin": bot_qq, "content": content}}
-            nodes.append(node)
-
-        sent_any = False
-        # send to groups
-        for gid in group_ids:
-            try:
-                ok = self.obot_client.send_group_forward(int(gid), nodes)
-                sent_any = sent_any or bool(ok)
-            except Exception as e:
-                self._log("发送 group forward 错误: %s" % e)
-        for uid in user_ids:
-            try:
-                ok = self.obot_client.send_private_forward(int(uid), nodes)
-                sent_any = sent_any or bool(ok)
-            except Exception as e:
-                self._log("发送 private forward 错误: %s" % e)
-
-        if sent_any:
-            messagebox.showinfo("全部推送", "已发出全部推送（合并转发）")
-        else:
-            messagebox.showerror("推送失败", "发送失败，请检查 OneBot 日志")
+    def _push_all_worker(self, cfg):
+        try:
+            sent_any = self.hub.push_all(cfg)
+            if sent_any:
+                self.root.after(0, lambda: messagebox.showinfo("全部推送", "全部推送（合并转发）已被 OneBot 接收"))
+            else:
+                self.root.after(0, lambda: messagebox.showerror("推送失败", "发送失败，请检查 OneBot 日志"))
+        except Exception as e:
+            self._log("全部推送异常: %s" % e)
+        finally:
+            self._push_all_busy = False
 
     # logging
     def _log(self, msg):
-        ts = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        try:
-            self.log_text.insert(tk.END, "%s %s\n" % (ts, msg))
-            self.log_text.see(tk.END)
-            self.root.update_idletasks()
-        except Exception:
-            print(ts, msg)
+        self.logsink(msg)
 
-    def shutdown(self):
-        for m in list(self.monitors.values()):
-            try:
-                m.stop()
-            except Exception:
-                pass
+    def _flush_log(self):
+        """ Move the lines logged since the last flush into the widget, keeping it bounded. """
         try:
-            self.obot_client.stop()
+            lines, dropped = self.logsink.drain()
+            if dropped:
+                lines.insert(0, "... 省略 %d 行（完整记录见日志文件）" % dropped)
+            if lines:
+                at_bottom = self.log_text.yview()[1] >= 0.999
+                self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+                excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.logsink.max_lines
+                if excess > 0:
+                    self.log_text.delete("1.0", "%d.0" % (excess + 1))
+                if at_bottom:
+                    self.log_text.see(tk.END)
         except Exception:
             pass
+        self.root.after(self.log_flush_ms, self._flush_log)
+
+    def shutdown(self):
+        self.ticker.stop()
+        self.hub.shutdown()
+        self.logsink.close()
 
 def main():
     root = tk.Tk()
@@ -1,4 +1,32 @@
-from .single_monitor import SingleMonitor
-from .notifier import OneBotWSClient
+# Exports are imported on first use (PEP 562), so the headless daemon (python -m monitor)
+# and monitor.core never pull in tkinter / matplotlib through SingleMonitor.
+import importlib
 
-__all__ = ["SingleMonitor", "OneBotWSClient"]
+_EXPORTS = {
+    "SingleMonitor": ".single_monitor",
+    "BVMonitor": ".core",
+    "MonitorHub": ".core",
+    "OneBotWSClient": ".notifier",
+    "OneBotError": ".notifier",
+    "XlsxExporter": ".exporter",
+    "MonitorEngine": ".engine",
+    "RateLimiter": ".ratelimit",
+    "PollingScheduler": ".scheduler",
+    "CoverCache": ".cover_cache",
+    "Outbox": ".outbox",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
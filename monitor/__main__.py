@@ -0,0 +1,72 @@
+# monitor/__main__.py
+"""
+Headless daemon: runs the monitors of bili_monitor_config.json without Tk / a display.
+
+    python -m monitor                          # start every BV in monitored_bvs
+    python -m monitor --bv BV1xx --bv BV1yy    # start these BVs instead (config is not changed)
+    python -m monitor --config /etc/bili.json --stats-interval 60
+
+Logs go to stdout and to the rotating log file (log_file, see LogSink). SIGINT / SIGTERM stop
+the monitors, flush journals / XLSX and exit; the daemon also exits once every monitor has
+stopped on its own (e.g. after its last milestone).
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from .config import CONFIG_FILE, load_config, save_config
+from .core import MonitorHub
+from .logsink import LogSink
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m monitor", description="Bilibili 播放量监控（无界面）")
+    ap.add_argument("--config", default=CONFIG_FILE, help="配置文件（默认 %s）" % CONFIG_FILE)
+    ap.add_argument("--bv", action="append", default=[], help="要监控的 BV 号，可重复；默认使用 monitored_bvs")
+    ap.add_argument("--stats-interval", type=float, default=300,
+                    help="每隔多少秒输出一次状态行（0 不输出，默认 300）")
+    args = ap.parse_args(argv)
+
+    cfg = load_config(args.config)
+    log = LogSink.from_config(cfg, echo=True)
+    hub = MonitorHub(cfg, onlog=log, save_config=lambda c: save_config(c, args.config), on_debug=log.debug)
+
+    bvs = args.bv or hub.persisted_bvs()
+    if not bvs:
+        log("没有要监控的 BV（配置 monitored_bvs 或使用 --bv）")
+        hub.shutdown()
+        log.close()
+        return 2
+    for bv in bvs:
+        hub.add(bv, persist=False).start()
+
+    stop = threading.Event()
+
+    def _on_signal(signum, frame):
+        log("收到信号 %d，正在停止" % signum)
+        stop.set()
+
+    signal.signal(signal.SIGINT, _on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _on_signal)
+
+    last_stats = 0.0
+    waited = 0.0
+    while not stop.wait(1):
+        waited += 1
+        if not hub.running():
+            log("所有监控均已结束")
+            break
+        if args.stats_interval and waited - last_stats >= args.stats_interval:
+            last_stats = waited
+            log(hub.status_line())
+
+    hub.shutdown()
+    log("已退出")
+    log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
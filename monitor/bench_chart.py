@@ -0,0 +1,91 @@
+# monitor/bench_chart.py
+"""
+Frames per second of the chart renderer, offscreen (Agg, no display needed).
+
+    python -m monitor.bench_chart                     # windows of 20 / 200 / 2000 points
+    python -m monitor.bench_chart --windows 50 500 --seconds 3
+
+Every frame appends one sample to a full sliding window, like a monitor does after each sample,
+and renders it two ways:
+  full  set_data + relim + autoscale_view + a full figure draw (the previous ChartWidget.update)
+  blit  chart_render.BlitLine: cached background, only the line redrawn, rare re-scales
+A Tk canvas additionally copies the drawn region to the screen, which costs the same for both.
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .chart_render import BlitLine
+
+
+def _figure():
+    # same layout as ChartWidget
+    fig = Figure(figsize=(6, 2.2), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_title("BV - 增量")
+    ax.set_xlabel("样本点")
+    ax.set_ylabel("增量")
+    ax.grid(True)
+    return fig, canvas, ax
+
+
+def _samples(n, seed=1):
+    # a noisy upward trend, like view increments of a growing video
+    rng = np.random.default_rng(seed)
+    return np.maximum(0, 400 + np.cumsum(rng.normal(0, 20, n)) + rng.normal(0, 60, n))
+
+
+def bench_full(window, seconds=2.0):
+    fig, canvas, ax = _figure()
+    line, = ax.plot([], [], marker='.', linestyle='-')
+    data = list(_samples(window))
+    stream = iter(_samples(10 ** 6, seed=2))
+    frames = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        data = data[1:] + [next(stream)]
+        line.set_data(list(range(len(data))), data)
+        ax.relim()
+        ax.autoscale_view()
+        canvas.draw()
+        frames += 1
+    return frames / (time.perf_counter() - t0), frames
+
+
+def bench_blit(window, seconds=2.0):
+    fig, canvas, ax = _figure()
+    plot = BlitLine(canvas, ax, capacity=window, marker='.', linestyle='-')
+    plot.buf.assign(_samples(window))
+    plot.render(force_full=True)
+    stream = iter(_samples(10 ** 6, seed=2))
+    frames = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        plot.append(next(stream))
+        frames += 1
+    fps = frames / (time.perf_counter() - t0)
+    return fps, frames, plot.full_draws
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ChartWidget renderer benchmark (offscreen)")
+    ap.add_argument("--windows", type=int, nargs="+", default=[20, 200, 2000], help="points per window")
+    ap.add_argument("--seconds", type=float, default=2.0, help="duration of each run")
+    args = ap.parse_args()
+    # CJK labels without a CJK font installed only cost a warning per draw
+    warnings.filterwarnings("ignore", message="Glyph")
+
+    print("%8s %12s %12s %8s %14s" % ("window", "full fps", "blit fps", "speedup", "blit redraws"))
+    for window in args.windows:
+        full_fps, _ = bench_full(window, args.seconds)
+        blit_fps, frames, redraws = bench_blit(window, args.seconds)
+        print("%8d %12.1f %12.1f %7.1fx %8d/%d" % (window, full_fps, blit_fps, blit_fps / full_fps, redraws, frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# monitor/chart_render.py
+"""
+Fast line-chart rendering for ChartWidget, independent of Tk so it can be benchmarked offscreen
+(python -m monitor.bench_chart).
+
+The figure background (axes, grid, ticks, labels) is rendered once and cached; a data update
+restores that background and blits only the line. The axes are re-scaled (one full draw) only
+when the data leaves the current limits, or shrinks well inside them.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-size float buffer of the last `capacity` values. Storage is doubled so the current
+    window is always one contiguous slice (no copy, no reallocation per value).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._buf = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._pos = 0   # index of the oldest value
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, value):
+        if self._n < self.capacity:
+            i = self._n
+            self._n += 1
+        else:
+            i = self._pos
+            self._pos = (self._pos + 1) % self.capacity
+        self._buf[i] = self._buf[i + self.capacity] = value
+
+    def assign(self, values):
+        """ Replace the contents with the last `capacity` of values. """
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        n = len(values)
+        self._buf[:n] = values
+        self._buf[self.capacity:self.capacity + n] = values
+        self._pos = 0
+        self._n = n
+
+    def view(self):
+        """ Oldest to newest, as a read-only view into the buffer. """
+        return self._buf[self._pos:self._pos + self._n]
+
+
+class BlitLine:
+    """
+    One animated line on `ax`, drawn by blitting over a cached background.
+
+    canvas must support copy_from_bbox / restore_region / blit (Agg-based canvases do).
+    `margin` is the fraction of the data span added above and below when the y-axis is
+    re-scaled; it is also how far the data may shrink inside the limits before they tighten.
+    """
+
+    MARGIN = 0.1
+
+    def __init__(self, canvas, ax, capacity=20, margin=MARGIN, **line_kw):
+        self.canvas = canvas
+        self.ax = ax
+        self.fig = ax.figure
+        self.margin = float(margin)
+        self.buf = RingBuffer(capacity)
+        self._x = np.arange(self.buf.capacity, dtype=np.float64)
+        self.line, = ax.plot([], [], animated=True, **line_kw)
+        self._background = None
+        self._full_pending = False
+        self.full_draws = 0
+        self.blits = 0
+        ax.set_xlim(0, max(1, self.buf.capacity - 1))
+        self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self._cid)
+
+    def _on_draw(self, event):
+        # a full draw (first show, resize, re-scale) renders the background without the
+        # animated line: keep it, then put the line on top
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._full_pending = False
+        self.full_draws += 1
+        self.ax.draw_artist(self.line)
+
+    # ------------------------------------------------------------------
+    def set_capacity(self, capacity):
+        capacity = max(1, int(capacity))
+        if capacity == self.buf.capacity:
+            return False
+        old = self.buf.view().copy()
+        self.buf = RingBuffer(capacity)
+        self.buf.assign(old)
+        self._x = np.arange(capacity, dtype=np.float64)
+        self.ax.set_xlim(0, max(1, capacity - 1))
+        return True
+
+    def _y_limits(self, y):
+        lo, hi = float(y.min()), float(y.max())
+        span = hi - lo
+        pad = span * self.margin if span > 0 else max(1.0, abs(hi) * self.margin)
+        return lo - pad, hi + pad
+
+    def _needs_rescale(self, y):
+        if not len(y):
+            return False
+        lo, hi = self.ax.get_ylim()
+        y_lo, y_hi = float(y.min()), float(y.max())
+        if y_lo < lo or y_hi > hi:
+            return True
+        # data shrank to a small band: tighten so it stays readable
+        span = (y_hi - y_lo) or max(1.0, abs(y_hi) * self.margin)
+        return span * (1 + 2 * self.margin) * 4 < (hi - lo)
+
+    def assign(self, values):
+        self.buf.assign(values)
+        self.render()
+
+    def append(self, value):
+        self.buf.append(value)
+        self.render()
+
+    def render(self, force_full=False):
+        y = self.buf.view()
+        self.line.set_data(self._x[:len(y)], y)
+        if self._needs_rescale(y):
+            self.ax.set_ylim(*self._y_limits(y))
+            force_full = True
+        if force_full or self._background is None or self._full_pending:
+            # axes changed (or nothing cached yet): full redraw, _on_draw re-caches the background
+            self._full_pending = True
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.fig.bbox)
+        self.blits += 1
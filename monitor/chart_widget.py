@@ -1,11 +1,13 @@
 import tkinter as tk
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from .chart_render import BlitLine
 
 class ChartWidget:
     """
     Encapsulates a matplotlib Figure + Axis + Tk Canvas for one metric.
-    Supports sliding window (keep only last N points) and lightweight redraw.
+    Supports sliding window (keep only last N points) and lightweight redraw: the axes are
+    cached and only the line is blitted, see chart_render.BlitLine.
     """
     def __init__(self, parent, title, ylabel, max_points_var):
         self.parent = parent
@@ -19,24 +21,39 @@ class ChartWidget:
         self.ax.set_xlabel("样本点")
         self.ax.set_ylabel(self.ylabel)
         self.ax.grid(True)
-        self.line, = self.ax.plot([], [], marker='.', linestyle='-')
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.parent)
+        self.plot = BlitLine(self.canvas, self.ax, capacity=self._window(), marker='.', linestyle='-')
+        self.line = self.plot.line
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
+    def _window(self):
+        try:
+            return max(1, int(self.max_points_var.get()))
+        except Exception:
+            return 20
+
     def update(self, data_list):
-        """ data_list: list of numeric values (already window-trimmed) """
-        xs = list(range(len(data_list)))
+        """ data_list: numeric values (already window-trimmed) """
+        try:
+            resized = self.plot.set_capacity(self._window())
+            self.plot.buf.assign(data_list)
+            self.plot.render(force_full=resized)
+        except Exception:
+            pass
+
+    def append(self, value):
+        """ Add one sample to the window (drops the oldest once it is full). """
         try:
-            self.line.set_data(xs, data_list)
-            self.ax.relim(); self.ax.autoscale_view()
-            try:
-                self.canvas.draw_idle()
-            except Exception:
-                self.canvas.draw()
+            self.plot.append(value)
         except Exception:
             pass
 
     def save_png(self, fname):
-        self.fig.savefig(fname)
+        # the blitted line is animated, which savefig would leave out
+        self.line.set_animated(False)
+        try:
+            self.fig.savefig(fname)
+        finally:
+            self.line.set_animated(True)
@@ -0,0 +1,28 @@
+# monitor/config.py
+import json
+import os
+
+CONFIG_FILE = "bili_monitor_config.json"
+DEFAULT_BOT_QQ = 3807093079  # 由你提供或修改为实际值
+
+
+def load_config(path=CONFIG_FILE):
+    cfg = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+        except Exception:
+            cfg = {}
+    # ensure bot qq exists
+    if "onebot_bot_qq" not in cfg or not cfg.get("onebot_bot_qq"):
+        cfg["onebot_bot_qq"] = DEFAULT_BOT_QQ
+    return cfg
+
+
+def save_config(cfg, path=CONFIG_FILE):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=4)
+    except Exception as e:
+        print("保存配置失败:", e)
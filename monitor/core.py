@@ -0,0 +1,911 @@
+# monitor/core.py
+"""
+UI-free monitoring core: sampling, storage, estimation and notifications for one BV
+(BVMonitor), and the services every monitor shares (MonitorHub). Nothing here imports
+tkinter; gui.py and the headless daemon (python -m monitor) are both clients of this module.
+"""
+import asyncio
+import datetime
+import json
+import math
+import os
+import threading
+import time
+import traceback
+
+import pandas as pd
+from bilibili_api import video
+
+from . import http_pool
+from .config import save_config as _save_config
+from .cover_cache import CoverCache
+from .engine import MonitorEngine
+from .estimator import ViewEstimator, parse_time
+from .exporter import XlsxExporter
+from .journal import SampleJournal
+from .manifest import load_manifest, entry_matches, update_manifest
+from .notifier import OneBotWSClient, endpoint_urls
+from .outbox import Outbox
+from .push import push_targets, bot_uin, budget_kb, build_node, build_nodes, send_nodes
+from .ratelimit import RateLimiter, is_risk_control
+from .sample_store import SampleStore
+from .scheduler import PollingScheduler
+
+
+class BVMonitor:
+    """
+    Sampling loop and state of one BV, without any UI.
+
+    A front end observes a monitor through optional callbacks. They are called on the engine
+    loop thread, so a GUI must hand them over to its own thread:
+      on_sample(view_inc, est_date)   a sample was stored (self.data[-1])
+      on_interval()                   get_interval() changed (scheduler / sprint mode)
+      on_cover(paths, downloaded)     the cached cover was checked against the API
+      on_stopped()                    the run ended (stop(), milestone or error)
+    `version` grows with every such event and every start / stop, so a front end that polls
+    many monitors (the overview table) can skip the ones that did not change.
+    """
+
+    LATE_TOLERANCE = 0.2  # a tick this late (fraction of the interval) is still taken, later ones are skipped
+
+    def __init__(self, bv, get_global_interval, on_log=None, obot_client=None, exporter=None,
+                 engine=None, cover_cache=None):
+        self.bv = bv
+        self.get_global_interval = get_global_interval
+        self.on_log = on_log or print
+        self.obot_client = obot_client
+        self.exporter = exporter or XlsxExporter(on_log=on_log)
+        # sampling runs as a task on the shared engine loop, not on a thread of its own
+        self.engine = engine or MonitorEngine.shared()
+        self.cover_cache = cover_cache or CoverCache.shared()
+
+        self.on_sample = None
+        self.on_interval = None
+        self.on_cover = None
+        self.on_stopped = None
+        self.version = 0
+
+        self.is_monitoring = False
+        self._run_id = 0
+        self._wake_event = None
+        self._lock = threading.Lock()
+        self.latest_info = {}
+        self.data = SampleStore()  # columnar; indexing still yields the classic sample dicts
+        self.last_view = None
+        self.first_fetch = True
+        self.check_10m_mode = False
+        self.special_push_done = False
+        self.journal = None
+        # incremental view-target estimator, fed with every stored sample
+        self.estimator = ViewEstimator()
+        self._load_state()  # 距目标≤500播放特殊推送
+
+        # interval sources, in order of precedence: local override, scheduler, global
+        self._local_interval = None
+        self._scheduled_interval = None
+        self._sprint = False
+        self._last_eta = None
+        self._last_remaining = None
+        self._last_fetch_wall = None  # epoch seconds of the previous sample, for inc_per_second
+        self._tick_interval = None    # interval the current tick was laid out with
+
+    def _emit(self, name, *args):
+        self.version += 1
+        cb = getattr(self, name)
+        if cb is not None:
+            try:
+                cb(*args)
+            except Exception as e:
+                self.log("%s 回调失败: %s" % (name, e))
+
+    def log(self, msg):
+        try:
+            self.on_log("[%s] %s" % (self.bv, msg))
+        except Exception:
+            print("[%s] %s" % (self.bv, msg))
+
+    def title(self):
+        title = ""
+        try:
+            if isinstance(self.latest_info, dict):
+                title = self.latest_info.get("title") or self.latest_info.get("name") or ""
+        except Exception:
+            title = ""
+        return title or self.bv
+
+    # ------------------------------------------------------------------
+    # interval
+    def get_interval(self):
+        v = self._local_interval or self._scheduled_interval or self.get_global_interval()
+        if self._sprint:
+            v = min(v, 10)
+        return v
+
+    def set_local_interval(self, seconds):
+        """ Per-monitor interval override (None: scheduler / global interval); applies now. """
+        self._local_interval = int(seconds) if seconds else None
+        self._report_schedule()
+        self._emit("on_interval")
+        self.wake()
+
+    def on_scheduled_interval(self, seconds):
+        """ Called by the PollingScheduler (any thread) when this monitor's share changes. """
+        self._scheduled_interval = int(seconds)
+        self._emit("on_interval")
+
+    def _report_schedule(self):
+        scheduler = self.engine.scheduler
+        if scheduler is not None:
+            scheduler.report(self, self._last_eta, self._last_remaining, self._local_interval)
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    def start(self):
+        """ Start sampling on the engine. Returns False if it is already running. Any thread. """
+        if self.is_monitoring:
+            return False
+        self.is_monitoring = True
+        self._run_id += 1
+        self.version += 1
+        self.engine.start_monitor(self, self._run_id)
+        self.log("开始监控")
+        return True
+
+    def stop(self):
+        """ Ask the current run to end; it finishes its sample and closes the journal. Any thread. """
+        if not self.is_monitoring:
+            return False
+        self.is_monitoring = False
+        self.version += 1
+        self.wake()
+        self.log("已请求停止")
+        return True
+
+    def wake(self):
+        """ Interrupt the current sleep so a stop or an interval change takes effect now. """
+        ev = self._wake_event
+        if ev is not None:
+            try:
+                self.engine.call_soon(ev.set)
+            except Exception:
+                pass
+
+    def _active(self, run_id):
+        return self.is_monitoring and run_id == self._run_id
+
+    def _next_tick(self, since, now, iv):
+        """ -> (next tick on the loop clock, number of whole ticks skipped) """
+        tick = since + iv
+        if self.engine.align_ticks:
+            # put ticks on wall-clock multiples of the interval (e.g. :00 / :15 / :30 / :45)
+            offset = time.time() - now
+            tick = (math.floor((since + offset) / iv + 1e-6) + 1) * iv - offset
+        skipped = 0
+        if now - tick > iv * self.LATE_TOLERANCE:
+            skipped = int(math.ceil((now - tick) / iv))
+            tick += skipped * iv
+        return tick, skipped
+
+    def _reanchor(self, since, now, iv):
+        """
+        First tick after an interval change: `iv` after the last tick, or now if that moment
+        has already passed. The ticks of the new interval before now were never scheduled, so
+        nothing counts as skipped.
+        """
+        tick = self._next_tick(since, since, iv)[0]
+        if tick < now:
+            tick = self._next_tick(now, now, iv)[0] if self.engine.align_ticks else now
+        return tick
+
+    async def _sleep_interval(self, run_id, tick):
+        """
+        Sleep until the tick after `tick` and return it. In fixed-rate mode ticks are laid
+        out on the monotonic loop clock, so fetch / estimate / write time does not add up;
+        ticks that were missed entirely because sampling overran are skipped, never made up
+        in a burst. Otherwise the interval is counted from now, as before. The interval is
+        re-read whenever we are woken; a changed interval re-anchors the ticks (_reanchor).
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        since = tick if self.engine.fixed_rate else now
+        iv = self.get_interval()
+        if iv == self._tick_interval:
+            nxt, skipped = self._next_tick(since, now, iv)
+            if skipped:
+                self.log("采样超时，跳过 %d 个周期" % skipped)
+        else:
+            nxt = self._reanchor(since, now, iv)
+        self._tick_interval = iv
+        while self._active(run_id):
+            remaining = nxt - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            self._wake_event.clear()
+            if self.get_interval() != iv:
+                iv = self._tick_interval = self.get_interval()
+                nxt = self._reanchor(since, loop.time(), iv)
+        return nxt
+
+    async def _run(self, run_id):
+        self._wake_event = asyncio.Event()
+        scheduler = self.engine.scheduler
+        if scheduler is not None:
+            scheduler.register(self)
+            self._report_schedule()
+        try:
+            await self._monitor(run_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log("监控异常: %s\n%s" % (e, traceback.format_exc()))
+            if run_id == self._run_id:
+                self.is_monitoring = False
+        finally:
+            if scheduler is not None and run_id == self._run_id:
+                scheduler.unregister(self)
+                self._scheduled_interval = None
+            if run_id == self._run_id and not self.is_monitoring:
+                self._emit("on_stopped")
+
+    async def _monitor(self, run_id):
+        folder = self.bv
+        os.makedirs(folder, exist_ok=True)
+        json_file = os.path.join(folder, "%s.json" % self.bv)
+        xlsx_file = os.path.join(folder, "%s.xlsx" % self.bv)
+
+        # journal recovery / JSON parsing / consistency check are blocking: keep them off the loop
+        await self.engine.run_blocking(self._load_history, folder, json_file, xlsx_file)
+
+        try:
+            await self._sample_loop(run_id, xlsx_file)
+        finally:
+            try:
+                await self.engine.run_blocking(self.journal.close, self._snapshot_data)
+            except Exception as e:
+                self.log("关闭样本日志失败: %s" % e)
+            # stopping is one of the points where the derived XLSX is brought up to date
+            self.exporter.flush(self.bv)
+
+        self.log("监控结束")
+
+    def _snapshot_data(self):
+        with self._lock:
+            return self.data.snapshot()
+
+    def _load_history(self, folder, json_file, xlsx_file):
+        self.journal = SampleJournal(folder, self.bv, on_log=self.log)
+        try:
+            self.journal.recover()
+        except Exception as e:
+            self.log("恢复样本日志失败: %s" % e)
+
+        consistent, loaded, reason = self.check_data_consistency(json_file, xlsx_file)
+        if loaded:
+            with self._lock:
+                self.data = SampleStore(loaded)
+        if loaded and not consistent:
+            self.log("JSON/XLSX 不一致（%s），将重新导出 XLSX" % reason)
+            self.exporter.schedule(self.bv, xlsx_file, self._snapshot_data)
+        if loaded:
+            self.last_view = self.data[-1].get("view", None)
+            self.first_fetch = False
+            if self.last_view and self.last_view >= 1_000_000:
+                self.check_10m_mode = True
+            try:
+                self._last_fetch_wall = parse_time(self.data[-1].get("time")).timestamp()
+            except Exception:
+                self._last_fetch_wall = None
+            self.log("加载历史 %d 条，last_view=%s" % (len(self.data), str(self.last_view)))
+        self.journal.open(len(self.data))
+        with self._lock:
+            self.estimator.reset()
+            self.estimator.extend(self.data)
+
+    async def _fetch_info(self, v):
+        """ v.get_info() through the process-wide request budget. """
+        limiter = self.engine.limiter
+        waited = await limiter.acquire()
+        if waited >= 1:
+            self.log("API 限速排队 %.1f 秒" % waited)
+        try:
+            info = await v.get_info()
+        except Exception as e:
+            if is_risk_control(e):
+                limiter.penalize(self.bv)
+            raise
+        limiter.success()
+        return info
+
+    async def _refresh_cover(self, info):
+        """ Bring the cached cover up to date with info["pic"]; only downloads when it changed. """
+        pic_url = info.get("pic") or info.get("cover") or info.get("thumbnail")
+        if not pic_url:
+            return
+        try:
+            paths, downloaded = await self.engine.run_blocking(self.cover_cache.ensure, pic_url, self.bv)
+        except Exception as e:
+            self.log("获取封面失败: %s" % str(e))
+            return
+        self._emit("on_cover", paths, downloaded)
+        if downloaded:
+            self.log("封面已自动保存: %s" % os.path.join(self.bv, "cover.jpg"))
+
+    async def _sample_loop(self, run_id, xlsx_file):
+        loop = asyncio.get_running_loop()
+        v = video.Video(bvid=self.bv)
+        tick = loop.time()
+        self._tick_interval = self.get_interval()
+        cover_checked = False
+        while self._active(run_id):
+            # wall-clock time this sample was scheduled for (the tick lives on the loop clock)
+            scheduled = datetime.datetime.fromtimestamp(time.time() - (loop.time() - tick))
+            try:
+                info = await self._fetch_info(v)
+                fetched = time.time()
+                self.latest_info = info or {}
+                if not cover_checked:
+                    # the first sample's info also carries the cover URL: no separate request
+                    cover_checked = True
+                    await self._refresh_cover(self.latest_info)
+            except Exception as e:
+                interval = self.get_interval()
+                self.log("获取失败: %s，%s 秒后重试" % (str(e), interval))
+                tick = await self._sleep_interval(run_id, tick)
+                continue
+
+            stat = info.get("stat", info)
+            view = stat.get("view", 0)
+            coin = stat.get("coin", 0)
+            like = stat.get("like", 0)
+            reply = stat.get("reply", 0)
+            share = stat.get("share", 0)
+            danmaku = stat.get("danmaku", 0)
+            tms = datetime.datetime.fromtimestamp(fetched).strftime("%Y-%m-%d %H:%M:%S")
+
+            # sprint mode / special notify
+            target_view = 10_000_000 if self.check_10m_mode else 1_000_000
+            remaining = target_view - view
+
+            if remaining <= 500 and remaining > 0:
+                if not self._sprint:
+                    self._sprint = True
+                    self._emit("on_interval")
+                    self.log("进入冲刺模式：距离目标 <=500 播放，间隔已临时降至 10 秒")
+                if not self.special_push_done:
+                    self.special_push_done = True
+                    await self.engine.run_blocking(self._notify_special_remaining, remaining, view, target_view)
+                    self._save_state()
+
+            with self._lock:
+                if self.last_view is None:
+                    view_inc = 0
+                else:
+                    view_inc = view - self.last_view
+                self.last_view = view
+                # increments normalized by the real time between fetches, not the nominal interval
+                dt = fetched - self._last_fetch_wall if self._last_fetch_wall else 0
+                inc_per_second = round(view_inc / dt, 4) if dt > 0 else 0.0
+                self._last_fetch_wall = fetched
+
+            est_str, est_date, sc, avg_inc = await self.engine.run_blocking(self.estimator.estimate, view, target_view)
+            # hand the prediction to the scheduler, which decides how soon we sample again
+            self._last_eta = self.estimator.last_seconds
+            self._last_remaining = remaining
+            self._report_schedule()
+
+            rec = {
+                "time": tms,
+                "view": view,
+                "like": like,
+                "coin": coin,
+                "reply": reply,
+                "share": share,
+                "danmaku": danmaku,
+                "favorite": stat.get("favorite", 0),
+                "view_increment": view_inc,
+                "avg_increment_per_interval": avg_inc,
+                "estimated_time": est_str,
+                "estimated_date": est_date,
+                "sample_count": sc,
+                "scheduled_time": scheduled.strftime("%Y-%m-%d %H:%M:%S"),
+                "inc_per_second": inc_per_second
+            }
+
+            with self._lock:
+                self.data.append(rec)
+
+            ok, msg = self.journal.append(rec)
+            if not ok:
+                self.log("写入失败: %s" % msg)
+                with self._lock:
+                    self.data.pop()
+            else:
+                self.estimator.add(rec)
+                self.exporter.schedule(self.bv, xlsx_file, self._snapshot_data)
+                self.journal.maybe_compact(self._snapshot_data)
+
+            self.log("样本: view=%s inc=%s like=%s coin=%s danmaku=%s" % (view, view_inc, like, coin, danmaku))
+            self._emit("on_sample", view_inc, est_date)
+
+            # milestone
+            if self.first_fetch:
+                self.first_fetch = False
+                if view >= 1_000_000:
+                    self.check_10m_mode = True
+                    self.log("首次 >=100万，进入1000万模式")
+                    await self.engine.run_blocking(self._notify_milestone, 1_000_000, view)
+            else:
+                if self.check_10m_mode and view >= 10_000_000:
+                    self.log("突破1000万")
+                    await self.engine.run_blocking(self._notify_milestone, 10_000_000, view)
+                    self.stop()
+                    break
+                elif not self.check_10m_mode and view >= 1_000_000:
+                    self.log("突破100万")
+                    await self.engine.run_blocking(self._notify_milestone, 1_000_000, view)
+                    self.stop()
+                    break
+
+            tick = await self._sleep_interval(run_id, tick)
+
+    # ------------------------------------------------------------------
+    # history
+    def check_data_consistency(self, json_file, xlsx_file):
+        json_exists = os.path.exists(json_file)
+        xlsx_exists = os.path.exists(xlsx_file)
+        if not json_exists and not xlsx_exists:
+            return True, [], "无历史"
+        if json_exists and not xlsx_exists:
+            try:
+                with open(json_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                return False, data, "仅 JSON"
+            except Exception as e:
+                return False, [], "JSON 读错: %s" % e
+        if not json_exists and xlsx_exists:
+            try:
+                df = pd.read_excel(xlsx_file)
+                return False, df.to_dict("records"), "仅 XLSX"
+            except Exception as e:
+                return False, [], "XLSX 读错: %s" % e
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                jdata = json.load(f)
+            j_last = str(jdata[-1].get("time", "")) if jdata else ""
+
+            # fast path: the manifest describes the XLSX as long as the file is unchanged,
+            # so its record count / last timestamp can be compared without parsing it
+            folder = os.path.dirname(xlsx_file) or "."
+            x_entry = load_manifest(folder).get("xlsx")
+            if entry_matches(x_entry, xlsx_file):
+                if x_entry.get("records") != len(jdata):
+                    return False, jdata, "长度不一致"
+                if x_entry.get("last_time") != j_last:
+                    return False, jdata, "末条不一致"
+                return True, jdata, "一致"
+
+            df = pd.read_excel(xlsx_file)
+            xdata = df.to_dict("records")
+            if len(jdata) != len(xdata):
+                return False, jdata, "长度不一致"
+            for i, (ja, xa) in enumerate(zip(jdata, xdata)):
+                if ja.get("view") != xa.get("view") or ja.get("time") != xa.get("time"):
+                    return False, jdata, "第%d条不一致" % (i+1)
+            # record the verified XLSX so the next start takes the fast path
+            try:
+                update_manifest(folder, "xlsx", xlsx_file, xdata)
+            except Exception:
+                pass
+            return True, jdata, "一致"
+        except Exception as e:
+            return False, jdata if 'jdata' in locals() else [], "检查失败: %s" % e
+
+    def calculate_estimated_time(self, data, current_view, target_view):
+        """
+        从头计算一次预测（不影响 self.estimator 的增量状态），
+        返回 (人类可读耗时, 预计日期, 有效采样点数, 平均增量)。
+        """
+        return ViewEstimator(data).estimate(current_view, target_view)
+
+    def _save_state(self):
+        try:
+            folder = self.bv
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "state.json"), "w", encoding="utf-8") as f:
+                json.dump({"special_push_done": self.special_push_done}, f)
+        except:
+            pass
+
+    def _load_state(self):
+        try:
+            p = os.path.join(self.bv, "state.json")
+            if os.path.exists(p):
+                with open(p, "r", encoding="utf-8") as f:
+                    d = json.load(f)
+                self.special_push_done = d.get("special_push_done", False)
+        except:
+            pass
+
+    # ------------------------------------------------------------------
+    # pushes
+    def get_cover_candidates(self):
+        """ Push images from preferred to smallest: push profile image, thumbnail (from the cache). """
+        cached = self.cover_cache.lookup_bv(self.bv, with_push=True)
+        if cached:
+            return [cached["push"], cached["thumb"]]
+        p = self.get_cover_path()
+        return [p] if p else []
+
+    def get_cover_path(self):
+        """ Cover for pushes: the cached push-size image, else the full <BV>/cover.jpg. """
+        cached = self.cover_cache.lookup_bv(self.bv, with_push=True)
+        if cached:
+            return cached["push"]
+        p = os.path.join(self.bv, "cover.jpg")
+        if os.path.exists(p):
+            return p
+        return None
+
+    def push_status(self, cfg):
+        """
+        Manual push of the latest sample with its estimate. Blocking: waits for NapCat's answer
+        to every target, so call it from a worker thread. Returns True if any target accepted it.
+        """
+        with self._lock:
+            last = self.data[-1]
+        view = last.get("view", 0)
+        like = last.get("like", 0)
+        coin = last.get("coin", 0)
+        reply = last.get("reply", 0)
+        share = last.get("share", 0)
+        danmaku = last.get("danmaku", 0)
+        view_inc = last.get("view_increment", 0)
+        sampling_time = last.get("time", "")
+        favorite = last.get("favorite", 0)
+
+        target = 10_000_000 if self.check_10m_mode else 1_000_000
+        est_str, est_date, valid_count, avg_inc = self.estimator.estimate(view, target)
+
+        text = (
+            "视频标题:%s\n"
+            "视频bv号:%s\n"
+            "播放数: %s\n"
+            "点赞: %s\n"
+            "硬币: %s\n"
+            "评论: %s\n"
+            "收藏: %s\n"
+            "分享: %s\n"
+            "弹幕: %s\n"
+            "播放量增量: %s\n"
+            "平均增量(每采样间隔): %s\n"
+            "预计达到目标时间: %s\n"
+            "预计达到目标日期: %s\n"
+            "数据采样时间: %s\n"
+            "(基于%d个有效采样点)"
+        ) % (self.title(), self.bv, view, like, coin, reply, favorite, share, danmaku, view_inc, avg_inc, est_str, est_date, sampling_time, valid_count)
+
+        group_ids, user_ids = push_targets(cfg)
+        node = build_nodes(bot_uin(cfg), [(text, self.get_cover_candidates())],
+                           budget_kb(cfg), on_log=self.log)[0]
+        return send_nodes(self.obot_client, group_ids, user_ids, [node], on_log=self.log, wait=True)
+
+    def _notify_milestone(self, target, view):
+        """
+        里程碑推送：内容格式完全与手动推送一致
+        唯一区别：预计达成 → 已达成
+        """
+        try:
+            if not self.obot_client:
+                return
+            cfg = self.obot_client.get_config() or {}
+            if not cfg.get("onebot_enabled", False):
+                return
+
+            # ---- 取推送目标 ----
+            group_ids, user_ids = push_targets(cfg)
+            bot_qq = str(cfg.get("onebot_bot_qq") or 0)
+
+            # ---- 读取最新数据 ----
+            with self._lock:
+                last = self.data[-1] if self.data else None
+
+            if not last:
+                return
+
+            title = ""
+            try:
+                title = (
+                    self.latest_info.get("title")
+                    if isinstance(self.latest_info, dict)
+                    else self.bv
+                )
+            except:
+                title = self.bv
+
+            like = last.get("like", 0)
+            coin = last.get("coin", 0)
+            reply = last.get("reply", 0)
+            share = last.get("share", 0)
+            danmaku = last.get("danmaku", 0)
+            favorite = last.get("favorite", 0)
+            sampling_time = last.get("time", "-")
+            view_inc = last.get("view_increment", 0)
+            avg_inc = last.get("avg_increment_per_interval", 0)
+            sample_count = last.get("sample_count", 0)
+
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            # ---- 里程碑推送文本（完全与手动一致，但“预计”→“已达成”）----
+            text = (
+                       "【里程碑已达成】\n"
+                       "视频标题:%s\n"
+                       "视频bv号:%s\n"
+                       "播放数: %s\n"
+                       "点赞: %s\n"
+                       "硬币: %s\n"
+                       "评论: %s\n"
+                       "收藏: %s\n"
+                       "分享: %s\n"
+                       "弹幕: %s\n"
+                       "播放量增量: %s\n"
+                       "平均增量(每采样间隔): %s\n"
+                       "已达成目标时间: %s\n"
+                       "已达成目标日期: %s\n"
+                       "数据采样时间: %s\n"
+                       "(基于%d个有效采样点)"
+                   ) % (
+                       title, self.bv, view, like, coin, reply, favorite,
+                       share, danmaku, view_inc, avg_inc,
+                       now, now, sampling_time, sample_count
+                   )
+
+            # ---- 封面 + 推送 ----
+            node = build_nodes(bot_qq, [(text, self.get_cover_candidates())],
+                               budget_kb(cfg), on_log=self.log)[0]
+            send_nodes(self.obot_client, group_ids, user_ids, [node],
+                       key="milestone:%s:%d" % (self.bv, target))
+
+            self.log("里程碑推送已发送")
+
+        except Exception as e:
+            self.log("里程碑通知失败: %s" % e)
+
+    def _notify_special_remaining(self, remaining, view, target):
+        try:
+            if not self.obot_client:
+                return
+            cfg = self.obot_client.get_config() or {}
+            if not cfg.get("onebot_enabled", False):
+                return
+
+            group_ids, user_ids = push_targets(cfg)
+
+            bot_qq = str(cfg.get("onebot_bot_qq") or 0)
+
+            text = (
+                f"[冲刺提醒]\n"
+                f"BV {self.bv}\n"
+                f"当前播放: {view}\n"
+                f"目标: {target}\n"
+                f"距离目标还有 {remaining} 播放！\n"
+                f"已自动切换到 10 秒采样间隔。"
+            )
+
+            node = build_node(bot_qq, text)
+            send_nodes(self.obot_client, group_ids, user_ids, [node],
+                       key="sprint:%s:%d" % (self.bv, target))
+
+            self.log("已发送冲刺模式提醒推送")
+
+        except Exception as e:
+            self.log("冲刺推送失败: %s" % e)
+
+
+class MonitorHub:
+    """
+    The services every monitor shares, built from the config dict: HTTP pool settings, OneBot
+    client + outbox, XLSX exporter, API rate limiter, polling scheduler, engine and cover cache.
+    It also owns the BVMonitor of every watched BV and the persisted BV list (monitored_bvs).
+
+    save_config(cfg) persists config changes (monitored_bvs, default_interval); pass None to
+    keep them in memory only. on_debug receives the OneBot client's per-frame messages.
+    """
+
+    def __init__(self, config, on_log=None, save_config=_save_config, on_debug=None):
+        self.config = config
+        self.on_log = on_log or print
+        self._save_config = save_config
+        self.default_interval = int(self.config.get("default_interval", 75))
+        self.monitors = {}  # bv -> BVMonitor
+        cfg = self.config
+
+        # one keep-alive pool (per-host limits / timeouts from config) for covers and API calls
+        http_pool.configure(cfg)
+
+        # queued pushes are kept on disk until NapCat acknowledges them
+        self.outbox = Outbox(folder=cfg.get("onebot_outbox_dir", ".outbox"),
+                             max_items=cfg.get("onebot_outbox_max", 500),
+                             overflow=cfg.get("onebot_outbox_overflow", "drop_oldest"),
+                             on_log=self.on_log)
+        self.obot_client = OneBotWSClient(lambda: self.config, on_log=self.on_log, outbox=self.outbox,
+                                          on_debug=on_debug)
+        if cfg.get("onebot_enabled", False) and endpoint_urls(cfg):
+            try:
+                self.obot_client.start()
+            except Exception:
+                pass
+
+        # one background writer for every <BV>.xlsx
+        self.exporter = XlsxExporter(on_log=self.on_log,
+                                     export_interval=int(cfg.get("xlsx_export_interval", 300)))
+        # every bilibili API request of every monitor draws from this budget
+        self.limiter = RateLimiter(rate=float(cfg.get("api_rate_limit", RateLimiter.DEFAULT_RATE)),
+                                   burst=int(cfg.get("api_burst", RateLimiter.DEFAULT_BURST)),
+                                   on_log=self.on_log)
+        # spends the request budget on the videos closest to their milestone
+        self.scheduler = None
+        if cfg.get("adaptive_polling", True):
+            self.scheduler = PollingScheduler(budget_rpm=float(cfg.get("poll_budget_rpm", 40)),
+                                              min_interval=int(cfg.get("poll_min_interval", 5)),
+                                              max_interval=int(cfg.get("poll_max_interval", 600)),
+                                              get_default_interval=lambda: self.default_interval,
+                                              on_log=self.on_log)
+        # one event loop + a small worker pool shared by every monitor
+        self.engine = MonitorEngine(on_log=self.on_log, max_workers=int(cfg.get("monitor_workers", 4)),
+                                    limiter=self.limiter, scheduler=self.scheduler,
+                                    fixed_rate=bool(cfg.get("fixed_rate_sampling", True)),
+                                    align_ticks=bool(cfg.get("align_sample_ticks", False)))
+
+        # covers keyed by content hash, with prebuilt thumbnail / push sizes
+        self.cover_cache = CoverCache(root=cfg.get("cover_cache_dir", ".covers"), on_log=self.on_log,
+                                      push_profile={"max_side": cfg.get("push_image_max_side"),
+                                                    "format": cfg.get("push_image_format"),
+                                                    "quality": cfg.get("push_image_quality"),
+                                                    "max_kb": cfg.get("push_image_max_kb")})
+
+    def log(self, msg):
+        try:
+            self.on_log(msg)
+        except Exception:
+            print(msg)
+
+    def save_config(self):
+        if self._save_config is not None:
+            self._save_config(self.config)
+
+    def get_interval(self):
+        return self.default_interval
+
+    # ------------------------------------------------------------------
+    # monitors
+    def persisted_bvs(self):
+        bvs = self.config.get("monitored_bvs", []) or []
+        return list(bvs) if isinstance(bvs, (list, tuple)) else []
+
+    def add(self, bv, get_global_interval=None, persist=True):
+        """ BVMonitor for bv (created on first use, not started); persist adds it to monitored_bvs. """
+        monitor = self.monitors.get(bv)
+        if monitor is None:
+            monitor = BVMonitor(bv, get_global_interval or self.get_interval, self.on_log,
+                                obot_client=self.obot_client, exporter=self.exporter,
+                                engine=self.engine, cover_cache=self.cover_cache)
+            self.monitors[bv] = monitor
+        if persist:
+            try:
+                bvs = self.persisted_bvs()
+                if bv not in bvs:
+                    bvs.append(bv)
+                    self.config["monitored_bvs"] = bvs
+                    self.save_config()
+            except Exception as e:
+                self.log("保存 monitored_bvs 失败: %s" % e)
+        return monitor
+
+    def remove(self, bv):
+        """ Stop bv and forget it, including in monitored_bvs. """
+        monitor = self.monitors.pop(bv, None)
+        if monitor is not None:
+            monitor.stop()
+        try:
+            bvs = self.persisted_bvs()
+            if bv in bvs:
+                bvs.remove(bv)
+                self.config["monitored_bvs"] = bvs
+                self.save_config()
+        except Exception as e:
+            self.log("从配置移除 %s 失败: %s" % (bv, e))
+
+    def running(self):
+        return [m for m in self.monitors.values() if m.is_monitoring]
+
+    # ------------------------------------------------------------------
+    def push_all(self, cfg=None):
+        """
+        One merged forward with the latest sample of every monitor. Blocking (waits for NapCat),
+        so call it from a worker thread. Returns True if any target accepted it.
+        """
+        cfg = cfg or self.config
+        group_ids, user_ids = push_targets(cfg)
+        bot_qq = str(cfg.get("onebot_bot_qq") or 0)
+        # build a list of forward nodes once: each monitor becomes a node (text + image if available)
+        items = []
+        for bv, mon in list(self.monitors.items()):
+            # get last sample
+            with mon._lock:
+                if not mon.data:
+                    continue
+                last = mon.data[-1]
+            view = last.get("view", 0)
+            like = last.get("like", 0)
+            coin = last.get("coin", 0)
+            reply = last.get("reply", 0)
+            share = last.get("share", 0)
+            danmaku = last.get("danmaku", 0)
+            view_inc = last.get("view_increment", 0)
+            sampling_time = last.get("time", "")
+            favorite = last.get("favorite", 0)
+            text = (
+                "视频标题:%s\n"
+                "视频bv号:%s\n"
+                "播放数: %s\n"
+                "点赞: %s\n"
+                "硬币: %s\n"
+                "评论: %s\n"
+                "收藏: %s\n"
+                "分享: %s\n"
+                "弹幕: %s\n"
+                "播放量增量: %s\n"
+                "数据采样时间: %s"
+            ) % (mon.latest_info.get("title") if isinstance(mon.latest_info, dict) else bv, bv, view, like, coin, reply, favorite, share, danmaku, view_inc, sampling_time)
+
+            items.append((text, mon.get_cover_candidates()))
+
+        # images are shrunk / dropped so the merged forward message stays within the budget
+        nodes = build_nodes(bot_qq, items, budget_kb(cfg), on_log=self.log)
+        return send_nodes(self.obot_client, group_ids, user_ids, nodes, on_log=self.log, wait=True)
+
+    def status_line(self):
+        """ One-line summary of the API budget, scheduler and OneBot delivery. """
+        st = self.limiter.stats()
+        text = "API %.2f/s  排队 %d  平均等待 %.1fs  风控 %d" % (
+            st["rate"], st["waiting"], st["avg_wait"], st["penalties"])
+        if self.scheduler is not None:
+            sc = self.scheduler.stats()
+            text += "  调度 %.0f/%.0f 次/分" % (sc["planned_rpm"], sc["budget_rpm"])
+        ob = self.obot_client.stats()
+        if ob["sent"]:
+            text += "  推送 成功%d 失败%d 超时%d" % (ob["ok"], ob["failed"], ob["timeout"])
+            if ob["latency_avg"] is not None:
+                text += " 延迟%.1fs" % ob["latency_avg"]
+        if len(ob["endpoints"]) > 1:
+            text += "  连接 %d/%d" % (ob["healthy"], len(ob["endpoints"]))
+        if ob["queued"]:
+            text += "  限速排队 %d（最长等待 %.0fs）" % (ob["queued"], ob["wait_max"] or 0)
+        if ob["outbox"]:
+            text += "  待发 %d" % ob["outbox"]
+        return text
+
+    def shutdown(self):
+        for m in list(self.monitors.values()):
+            try:
+                m.stop()
+            except Exception:
+                pass
+        try:
+            # let running monitors close their journals before the loop goes away
+            self.engine.shutdown()
+        except Exception:
+            pass
+        try:
+            self.obot_client.stop()
+        except Exception:
+            pass
+        try:
+            self.exporter.shutdown()
+        except Exception:
+            pass
+        http_pool.close()
@@ -0,0 +1,261 @@
+# monitor/cover_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from . import http_pool
+
+
+class CoverCache:
+    """
+    Content-addressed cover store shared by every monitor.
+
+    Images are keyed by the sha1 of the original bytes: <root>/<sha1>/orig.jpg plus the
+    derivatives, built once each: thumb.jpg (THUMB_WIDTH wide, for the GUI and as the small
+    fallback for pushes) and one push image per push profile (push-<profile>.jpg/.webp, see
+    PUSH_PROFILE). index.json maps each cover URL to its hash and HTTP validators, and each BV
+    to its last known URL.
+
+    A BV whose pic URL has not changed is served from disk with no request at all. A changed
+    URL that the index already knows is revalidated with If-None-Match / If-Modified-Since.
+    Only an unknown or modified image is downloaded and resized.
+    """
+
+    THUMB_WIDTH = 240
+    INDEX_NAME = "index.json"
+
+    # push image profile: longest side, format ("jpeg" / "webp"), quality and a per-image cap;
+    # quality and then size are stepped down until the encoded image fits max_kb
+    PUSH_PROFILE = {"max_side": 720, "format": "jpeg", "quality": 80, "max_kb": 80}
+    MIN_QUALITY = 40
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root=".covers", on_log=None, push_profile=None):
+        self.root = root
+        self.on_log = on_log or (lambda m: print(m))
+        self.push_profile = self._normalize_profile(push_profile)
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._index = self._load_index()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _log(self, msg):
+        try:
+            self.on_log(msg)
+        except Exception:
+            print(msg)
+
+    def _normalize_profile(self, profile):
+        p = dict(self.PUSH_PROFILE)
+        for k, v in (profile or {}).items():
+            if k in p and v not in (None, ""):
+                p[k] = type(self.PUSH_PROFILE[k])(v)
+        p["format"] = p["format"].lower()
+        if p["format"] not in ("jpeg", "webp"):
+            p["format"] = "jpeg"
+        if p["format"] == "webp":
+            try:
+                from PIL import features
+                if not features.check("webp"):
+                    p["format"] = "jpeg"
+            except Exception:
+                p["format"] = "jpeg"
+        p["quality"] = max(self.MIN_QUALITY, min(95, p["quality"]))
+        return p
+
+    def _push_name(self):
+        p = self.push_profile
+        ext = "webp" if p["format"] == "webp" else "jpg"
+        return "push-%d-%s-q%d-%dk.%s" % (p["max_side"], p["format"], p["quality"], p["max_kb"], ext)
+
+    # ------------------------------------------------------------------
+    # index
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.root, self.INDEX_NAME), "r", encoding="utf-8") as f:
+                d = json.load(f)
+            if isinstance(d, dict):
+                d.setdefault("urls", {})
+                d.setdefault("bvs", {})
+                return d
+        except Exception:
+            pass
+        return {"urls": {}, "bvs": {}}
+
+    def _save_index_locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        p = os.path.join(self.root, self.INDEX_NAME)
+        tmp = p + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, p)
+
+    # ------------------------------------------------------------------
+    # paths
+    def _dir(self, digest):
+        return os.path.join(self.root, digest)
+
+    def paths(self, digest):
+        d = self._dir(digest)
+        return {
+            "hash": digest,
+            "orig": os.path.join(d, "orig.jpg"),
+            "thumb": os.path.join(d, "thumb.jpg"),
+            "push": os.path.join(d, self._push_name()),
+        }
+
+    def _complete(self, digest):
+        if not digest:
+            return False
+        p = self.paths(digest)
+        return os.path.exists(p["orig"]) and os.path.exists(p["thumb"])
+
+    def lookup_bv(self, bv, with_push=False):
+        """
+        Cached cover of bv from a previous run (paths dict), or None. No network.
+        with_push=True also builds the push image for the current profile if it is missing
+        (a one-time resize, so only ask for it off the Tk thread).
+        """
+        with self._lock:
+            url = self._index["bvs"].get(bv)
+            meta = self._index["urls"].get(url) if url else None
+        if meta and self._complete(meta.get("hash")):
+            paths = self.paths(meta["hash"])
+            if with_push:
+                try:
+                    self._ensure_push(paths)
+                except Exception as e:
+                    self._log("生成推送图失败: %s" % e)
+                    return None
+            return paths
+        return None
+
+    # ------------------------------------------------------------------
+    # fetching
+    def _url_lock(self, url):
+        with self._lock:
+            lk = self._url_locks.get(url)
+            if lk is None:
+                lk = self._url_locks[url] = threading.Lock()
+            return lk
+
+    def ensure(self, url, bv=None):
+        """
+        Make sure the cover at url is cached. Blocking; call from a worker thread.
+        Returns (paths dict, downloaded) where downloaded is True only when bytes were fetched.
+        """
+        with self._url_lock(url):
+            with self._lock:
+                meta = dict(self._index["urls"].get(url) or {})
+                known_url = bv is not None and self._index["bvs"].get(bv) == url
+            digest = meta.get("hash")
+            downloaded = False
+
+            if not (known_url and self._complete(digest)):
+                headers = {}
+                if self._complete(digest):
+                    if meta.get("etag"):
+                        headers["If-None-Match"] = meta["etag"]
+                    if meta.get("last_modified"):
+                        headers["If-Modified-Since"] = meta["last_modified"]
+                r = http_pool.get(url, headers=headers)
+                if r.status_code != 304 or not headers:
+                    r.raise_for_status()
+                    digest = hashlib.sha1(r.content).hexdigest()
+                    if not self._complete(digest):
+                        self._build(digest, r.content)
+                    self._ensure_push(self.paths(digest))
+                    downloaded = True
+                meta = {
+                    "hash": digest,
+                    "etag": r.headers.get("ETag") or meta.get("etag"),
+                    "last_modified": r.headers.get("Last-Modified") or meta.get("last_modified"),
+                    "checked": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                with self._lock:
+                    self._index["urls"][url] = meta
+                    if bv is not None:
+                        self._index["bvs"][bv] = url
+                    self._save_index_locked()
+
+        paths = self.paths(digest)
+        if bv is not None:
+            self._export_bv_copy(bv, paths)
+        return paths, downloaded
+
+    def _build(self, digest, content):
+        """ Store the original and the GUI thumbnail (the only other place covers are resized). """
+        d = self._dir(digest)
+        os.makedirs(d, exist_ok=True)
+        p = self.paths(digest)
+        img = Image.open(BytesIO(content)).convert("RGB")
+
+        w, h = img.size
+        thumb = img.resize((self.THUMB_WIDTH, max(1, int(h * self.THUMB_WIDTH / w))), Image.LANCZOS)
+        tmp = p["thumb"] + ".tmp"
+        thumb.save(tmp, format="JPEG", quality=90)
+        os.replace(tmp, p["thumb"])
+        # orig last: its presence marks the entry complete
+        tmp = p["orig"] + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, p["orig"])
+
+    def _ensure_push(self, paths):
+        """ Build the push image for the current profile once; later pushes read it from disk. """
+        if os.path.exists(paths["push"]):
+            return
+        with Image.open(paths["orig"]) as src:
+            img = src.convert("RGB")
+        data = self.encode_push(img, self.push_profile)
+        tmp = paths["push"] + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, paths["push"])
+
+    @classmethod
+    def encode_push(cls, img, profile):
+        """ Encode img per profile: resize to max_side, then lower quality / size until <= max_kb. """
+        fmt = "WEBP" if profile["format"] == "webp" else "JPEG"
+        cap = int(profile["max_kb"] * 1024)
+        img = img.copy()
+        img.thumbnail((profile["max_side"], profile["max_side"]), Image.LANCZOS)
+        quality = profile["quality"]
+        while True:
+            buf = BytesIO()
+            img.save(buf, format=fmt, quality=quality, optimize=fmt == "JPEG")
+            data = buf.getvalue()
+            if len(data) <= cap or cap <= 0:
+                return data
+            if quality > cls.MIN_QUALITY:
+                quality = max(cls.MIN_QUALITY, quality - 10)
+                continue
+            w, h = img.size
+            if max(w, h) <= 64:
+                return data
+            img = img.resize((max(1, int(w * 0.8)), max(1, int(h * 0.8))), Image.LANCZOS)
+
+    def _export_bv_copy(self, bv, paths):
+        """ Keep <BV>/cover.jpg (user-facing copy) in sync without re-downloading. """
+        target = os.path.join(bv, "cover.jpg")
+        try:
+            if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(paths["orig"]):
+                return
+            os.makedirs(bv, exist_ok=True)
+            shutil.copyfile(paths["orig"], target)
+        except Exception as e:
+            self._log("保存封面失败: %s" % e)
@@ -1,6 +1,3 @@
-import threading
-from io import BytesIO
-import requests
 from PIL import Image, ImageTk
 import tkinter as tk
 
@@ -10,6 +7,7 @@ class CoverWidget:
         self.on_log = on_log or (lambda m: print(m))
         self._cover_photo = None
         self._cover_image_pil = None
+        self._cover_path = None
 
         self.cover_label = tk.Label(parent_frame, text="封面加载中...", anchor="center")
         self.cover_label.pack(fill=tk.BOTH, expand=False)
@@ -21,32 +19,40 @@ class CoverWidget:
         except Exception:
             print(msg)
 
-    def load_from_url(self, url, thumb_w=240):
-        def _worker():
+    def show_cached(self, paths):
+        """
+        Display a CoverCache entry. The thumbnail is prebuilt, so this is a small JPEG decode
+        on the Tk thread and no resize; the original is only opened when it is needed.
+        """
+        if not paths:
+            return
+
+        def set_img():
+            try:
+                photo = ImageTk.PhotoImage(Image.open(paths["thumb"]))
+                self._cover_photo = photo
+                self._cover_path = paths["orig"]
+                self._cover_image_pil = None
+                self.cover_label.config(image=photo, text="")
+            except Exception as e:
+                self._log(f"加载封面失败: {e}")
+                self.cover_label.config(text="封面加载失败")
+        try:
+            self.parent_frame.after(0, set_img)
+        except Exception:
+            pass
+
+    def get_image(self):
+        """ Full-size PIL image (opened from the cache on first use), or None. """
+        if self._cover_image_pil is None and self._cover_path:
             try:
-                r = requests.get(url, timeout=10)
-                r.raise_for_status()
-                img = Image.open(BytesIO(r.content)).convert("RGB")
-                self._cover_image_pil = img.copy()
-                w, h = img.size
-                ratio = thumb_w / w
-                new_h = int(h * ratio)
-                thumb = img.resize((thumb_w, new_h), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(thumb)
-                def set_img():
-                    try:
-                        self._cover_photo = photo
-                        self.cover_label.config(image=photo, text="")
-                    except Exception:
-                        pass
-                self.parent_frame.after(0, set_img)
+                self._cover_image_pil = Image.open(self._cover_path).convert("RGB")
             except Exception as e:
                 self._log(f"加载封面失败: {e}")
-                self.parent_frame.after(0, lambda: self.cover_label.config(text="封面加载失败"))
-        threading.Thread(target=_worker, daemon=True).start()
+        return self._cover_image_pil
 
     def open_cover_big(self):
-        if not self._cover_image_pil:
+        if not self.get_image():
             try:
                 tk.messagebox.showinfo("提示", "封面尚未加载")
             except Exception:
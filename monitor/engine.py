@@ -0,0 +1,147 @@
+# monitor/engine.py
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from .ratelimit import RateLimiter
+from . import http_pool
+
+
+class MonitorEngine:
+    """
+    One asyncio event loop, in one background thread, that runs the sampling task of every
+    monitor. Start / stop / interval changes coming from the GUI thread are routed into the
+    loop with call_soon_threadsafe, and blocking work (history loading, estimation) goes to a
+    small fixed thread pool, so the thread count stays constant no matter how many BVs are
+    watched. All bilibili_api calls share the loop, and therefore its HTTP session, and go
+    through one RateLimiter so the fleet as a whole stays under the request budget.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, on_log=None, max_workers=4, limiter=None, scheduler=None,
+                 fixed_rate=True, align_ticks=False):
+        self.on_log = on_log or (lambda m: print("[Engine]", m))
+        self.limiter = limiter or RateLimiter(on_log=on_log)
+        # optional PollingScheduler; without one monitors poll at their fixed interval
+        self.scheduler = scheduler
+        # fixed_rate: ticks are spaced on the monotonic clock instead of "interval after the
+        # previous sample finished"; align_ticks additionally puts them on wall-clock multiples
+        self.fixed_rate = fixed_rate
+        self.align_ticks = align_ticks
+        self._thread = None
+        self._loop = None
+        self._ready = threading.Event()
+        self._tasks = {}  # monitor -> asyncio.Task of its current run
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="monitor-worker")
+
+    @classmethod
+    def shared(cls):
+        """ Process-wide default engine for monitors created without an explicit one. """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def log(self, msg):
+        try:
+            self.on_log("[Engine] " + str(msg))
+        except Exception:
+            print("[Engine]", msg)
+
+    # ----------------------------------------------------------------
+    # lifecycle
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run_loop, name="monitor-engine", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+
+    def _run_loop(self):
+        try:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.set_default_executor(self._executor)
+            # every bilibili_api call on this loop goes through the shared connection pool
+            self._loop.run_until_complete(http_pool.install_bilibili_session(self.log))
+            self._ready.set()
+            self._loop.run_forever()
+        except Exception as e:
+            self.log("engine loop error: %s\n%s" % (e, traceback.format_exc()))
+        finally:
+            try:
+                if self._loop and not self._loop.is_closed():
+                    self._loop.run_until_complete(http_pool.close_async())
+                    self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+                    self._loop.close()
+            except Exception:
+                pass
+            self._loop = None
+            self._ready.clear()
+
+    def shutdown(self, timeout=10):
+        """ Give running monitors up to timeout seconds to finish (flush journals), then stop. """
+        loop = self._loop
+        if not loop:
+            return
+
+        async def _drain():
+            tasks = [t for t in self._tasks.values() if not t.done()]
+            if tasks:
+                await asyncio.wait(tasks, timeout=timeout)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_drain(), loop).result(timeout + 1)
+        except Exception:
+            pass
+        try:
+            loop.call_soon_threadsafe(loop.stop)
+        except Exception:
+            pass
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    # ----------------------------------------------------------------
+    # cross-thread entry points
+    def submit(self, coro):
+        """ Run coro on the engine loop; returns a concurrent.futures.Future. """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def call_soon(self, fn, *args):
+        self.start()
+        self._loop.call_soon_threadsafe(fn, *args)
+
+    async def run_blocking(self, fn, *args):
+        """ Await fn(*args) on the worker pool (for use inside monitor coroutines). """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def run_in_worker(self, fn, *args):
+        """ fn(*args) on the worker pool from any thread (e.g. Tk callbacks); returns a Future. """
+        return self._executor.submit(fn, *args)
+
+    def start_monitor(self, monitor, run_id):
+        """
+        Schedule monitor._run(run_id). A previous run of the same monitor is allowed to finish
+        first so its journal is closed before the next run reloads the history.
+        """
+        async def _start():
+            old = self._tasks.get(monitor)
+            if old is not None and not old.done():
+                monitor.wake()
+                await asyncio.wait([old])
+            task = asyncio.ensure_future(monitor._run(run_id))
+            self._tasks[monitor] = task
+
+            def _done(t, monitor=monitor):
+                if self._tasks.get(monitor) is t:
+                    del self._tasks[monitor]
+            task.add_done_callback(_done)
+
+        return self.submit(_start())
+
+    def running_count(self):
+        return sum(1 for t in list(self._tasks.values()) if not t.done())
@@ -0,0 +1,526 @@
+# monitor/estimator.py
+import datetime
+import math
+import threading
+from statistics import median
+import numpy as np
+from sklearn.linear_model import RANSACRegressor, LinearRegression
+from .sample_store import SampleStore
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def parse_time(tstr):
+    return datetime.datetime.strptime(str(tstr), "%Y-%m-%d %H:%M:%S")
+
+
+def _segment_sse(cnt, sx, sy, sxx, sxy, syy):
+    """
+    一组线段的最小二乘 SSE（向量化）：SSE = Vyy - Vxy² / Vxx，
+    其中 V** 为去均值后的二阶矩。x 全部相同（Vxx≈0）时退化为 Vyy，与 lstsq 的最小范数解一致。
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vxx = sxx - sx * sx / cnt
+        vxy = sxy - sx * sy / cnt
+        vyy = syy - sy * sy / cnt
+        sse = np.where(vxx > 1e-12 * np.maximum(sxx, 1.0), vyy - vxy * vxy / vxx, vyy)
+    return np.maximum(sse, 0.0)
+
+
+def _best_split(n, cx, cy, cxx, cxy, cyy):
+    """ 在前缀和上为 20% ~ 80% 的所有候选分段点打分，返回最佳 k（无候选时为 None） """
+    ks = np.arange(int(n * 0.2), int(n * 0.8))
+    ks = ks[ks > 0]
+    if len(ks) == 0:
+        return None
+    left = _segment_sse(ks, cx[ks], cy[ks], cxx[ks], cxy[ks], cyy[ks])
+    right = _segment_sse(n - ks,
+                         cx[n] - cx[ks], cy[n] - cy[ks],
+                         cxx[n] - cxx[ks], cxy[n] - cxy[ks], cyy[n] - cyy[ks])
+    total = left + right
+    if not np.isfinite(total).any():
+        return None
+    # argmin 取第一个最小值，与原先 “sse < best_sse” 的遍历顺序一致
+    return int(ks[int(np.nanargmin(total))])
+
+
+def _lstsq_line(xs, ys):
+    A = np.vstack([xs, np.ones(len(xs))]).T
+    return np.linalg.lstsq(A, ys, rcond=None)[0]
+
+
+def _prefix(v):
+    return np.concatenate(([0.0], np.cumsum(v)))
+
+
+def best_segment_fit(xs, ys):
+    """
+    分段线性回归：在 20% ~ 80% 之间寻找使两段直线总误差（SSE）最小的分段点 k。
+
+    所有候选 k 通过前缀和（Σx, Σy, Σxy, Σx², Σy²）一次向量化打分，复杂度 O(n)；
+    只对最佳 k 调用一次 lstsq 求两段参数，因此 p1/p2 与逐点 lstsq 搜索的结果相同。
+    返回 (k, p1, p2)，没有候选分段点时返回 (None, None, None)。
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    n = len(xs)
+
+    # 平移到均值附近，减小大数相减的精度损失（SSE 对平移不变）
+    x = xs - xs.mean() if n else xs
+    y = ys - ys.mean() if n else ys
+    k = _best_split(n, _prefix(x), _prefix(y), _prefix(x * x), _prefix(x * y), _prefix(y * y))
+    if k is None:
+        return None, None, None
+    try:
+        p1 = _lstsq_line(xs[:k], ys[:k])
+        p2 = _lstsq_line(xs[k:], ys[k:])
+    except Exception:
+        return None, None, None
+    return k, p1, p2
+
+
+class _Buf:
+    """ Growable 1-D numpy buffer with amortized O(1) append. """
+
+    def __init__(self, dtype=float, capacity=64):
+        self._a = np.empty(capacity, dtype=dtype)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, v):
+        if self._n == len(self._a):
+            grown = np.empty(len(self._a) * 2, dtype=self._a.dtype)
+            grown[:self._n] = self._a[:self._n]
+            self._a = grown
+        self._a[self._n] = v
+        self._n += 1
+
+    def set(self, values):
+        values = np.asarray(values, dtype=self._a.dtype)
+        if len(values) > len(self._a):
+            self._a = np.empty(max(64, 2 * len(values)), dtype=self._a.dtype)
+        self._a[:len(values)] = values
+        self._n = len(values)
+
+    def view(self):
+        return self._a[:self._n]
+
+    def last(self, default=None):
+        return self._a[self._n - 1] if self._n else default
+
+
+class ViewEstimator:
+    """
+    Incremental state behind BVMonitor's "time to target" estimate.
+
+    The model is the one calculate_estimated_time always used (slope/MAD outlier filter,
+    RANSAC main model, best two-segment fit, exponential-decay correction, weighted fusion),
+    but instead of rebuilding everything from the records on every tick this object keeps:
+      * the parsed time axis and the raw slopes,
+      * the filter's median/MAD, refreshed only when the slope count grew by FILTER_REFRESH,
+      * prefix sums over the filtered samples (segment search, std, increments),
+      * the last RANSAC consensus set as running least-squares sums.
+    A new sample that is an inlier of the current consensus is folded in in O(1); full
+    refits only happen when the filtered set or the consensus set changed materially.
+    """
+
+    MIN_POINTS = 6
+    SMALL = 64              # below this many points everything is recomputed every time
+    FILTER_REFRESH = 0.10   # recompute median/MAD after 10% more slopes
+    SEGMENT_REFRESH = 0.10  # re-search the breakpoint after 10% more filtered points
+    REFIT_GROWTH = 0.25     # refit RANSAC after 25% more filtered points ...
+    REFIT_OUTLIERS = 0.10   # ... or when new outliers exceed 10% of the consensus set
+    REFIT_THRESHOLD = 0.25  # ... or when std(y)*0.8 moved 25% away from the fitted threshold
+
+    def __init__(self, records=None):
+        self._lock = threading.RLock()
+        self.reset()
+        if records:
+            self.extend(records)
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+            self._t0 = None
+            self._t0_bad = False
+            self._y0 = 0.0
+            # raw valid samples
+            self._rx, self._ry = _Buf(), _Buf()
+            self._slopes = _Buf()
+            self._mask = _Buf(dtype=bool)
+            self._med = None
+            self._thr = None
+            self._filter_n = 0
+            self._reset_filtered()
+            self.last_seconds = None
+
+    def _reset_filtered(self):
+        self._fx, self._fy = _Buf(), _Buf()
+        # prefix sums of (x, y - y0) over the filtered samples, each starting with 0
+        self._cx, self._cy = _Buf(), _Buf()
+        self._cxx, self._cxy, self._cyy = _Buf(), _Buf(), _Buf()
+        for b in (self._cx, self._cy, self._cxx, self._cxy, self._cyy):
+            b.append(0.0)
+        self._inc_sum = 0.0
+        self._inc_cnt = 0
+        self._model = None
+        self._seg = None
+
+    def __len__(self):
+        return self._count
+
+    # ------------------------------------------------------------------
+    # folding in samples
+    def extend(self, records):
+        if not isinstance(records, SampleStore):
+            records = SampleStore(records)
+        times = records.time_seconds()
+        views = records.window(len(records), ("view",))["view"].astype(np.float64)
+        with self._lock:
+            if self._count == 0:
+                self._load(times, views)
+                return
+            for t, v in zip(times.tolist(), views.tolist()):
+                self._add_sample(None if t != t else t, v)
+
+    def _load(self, secs, ys):
+        """ Vectorized equivalent of _add_sample() over a whole history (fresh state only). """
+        self._count = len(secs)
+        if not self._count:
+            return
+        if np.isnan(secs[0]):
+            self._t0_bad = True
+            return
+        self._t0 = float(secs[0])
+        xs = secs - self._t0
+        with np.errstate(invalid="ignore"):
+            valid = ~np.isnan(xs) & (xs >= 0) & (ys >= 0)
+        xs, ys = xs[valid], ys[valid]
+        if not len(xs):
+            return
+        self._y0 = float(ys[0])
+        self._rx.set(xs)
+        self._ry.set(ys)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.diff(ys) / np.diff(xs)
+        self._slopes.set(slopes)
+        if len(slopes) >= 5:
+            med = median(slopes)
+            mad = median(abs(slopes - med)) or 1
+            self._med, self._thr, self._filter_n = med, mad * 6, len(slopes)
+            self._mask.set(np.concatenate(([True], np.abs(slopes - med) <= self._thr)))
+        else:
+            self._mask.set(np.ones(len(xs), dtype=bool))
+        self._rebuild_filtered()
+
+    def add(self, rec):
+        try:
+            secs = (parse_time(rec["time"]) - _EPOCH).total_seconds()
+        except Exception:
+            secs = None
+        self._add_sample(secs, rec.get("view", 0))
+
+    def _add_sample(self, secs, y):
+        with self._lock:
+            self._count += 1
+            if secs is None:
+                if self._count == 1:
+                    self._t0_bad = True
+                return
+            if self._t0 is None:
+                if self._t0_bad:
+                    return
+                self._t0 = secs
+            x = secs - self._t0
+            try:
+                y = float(y)
+            except Exception:
+                return
+            if x >= 0 and y >= 0:
+                self._add_raw(float(x), y)
+
+    def _add_raw(self, x, y):
+        if not len(self._rx):
+            self._y0 = y
+        px, py = self._rx.last(), self._ry.last()
+        self._rx.append(x)
+        self._ry.append(y)
+        if px is None:
+            self._mask.append(True)
+            self._append_filtered(x, y)
+            return
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sl = np.float64(y - py) / np.float64(x - px)
+        self._slopes.append(sl)
+        ns = len(self._slopes)
+        if ns < 5:
+            # too few slopes for the filter: every sample counts
+            self._mask.append(True)
+            self._append_filtered(x, y)
+            return
+
+        if self._med is None or ns < self.SMALL or ns >= self._filter_n * (1 + self.FILTER_REFRESH):
+            self._refresh_filter()
+            return
+
+        keep = bool(abs(sl - self._med) <= self._thr)
+        self._mask.append(keep)
+        if keep:
+            self._append_filtered(x, y)
+
+    def _refresh_filter(self):
+        """ Recompute median/MAD; only rebuild the filtered set if the mask actually changed. """
+        slopes = self._slopes.view()
+        med = median(slopes)
+        mad = median(abs(slopes - med)) or 1
+        thr = mad * 6
+        self._med, self._thr, self._filter_n = med, thr, len(slopes)
+
+        mask = np.concatenate(([True], np.abs(slopes - med) <= thr))
+        old = self._mask.view()
+        if len(old) == len(mask) - 1 and np.array_equal(old, mask[:-1]):
+            self._mask.append(bool(mask[-1]))
+            if mask[-1]:
+                self._append_filtered(self._rx.last(), self._ry.last())
+            return
+
+        self._mask.set(mask)
+        self._rebuild_filtered()
+
+    def _rebuild_filtered(self):
+        mask = self._mask.view()
+        xs = self._rx.view()[mask]
+        ys = self._ry.view()[mask]
+        self._reset_filtered()
+        self._fx.set(xs)
+        self._fy.set(ys)
+        yc = ys - self._y0
+        self._cx.set(_prefix(xs))
+        self._cy.set(_prefix(yc))
+        self._cxx.set(_prefix(xs * xs))
+        self._cxy.set(_prefix(xs * yc))
+        self._cyy.set(_prefix(yc * yc))
+        incs = np.diff(ys)
+        pos = incs[incs >= 0]
+        self._inc_sum = float(pos.sum())
+        self._inc_cnt = len(pos)
+
+    def _append_filtered(self, x, y):
+        py = self._fy.last()
+        self._fx.append(x)
+        self._fy.append(y)
+        yc = y - self._y0
+        self._cx.append(self._cx.last() + x)
+        self._cy.append(self._cy.last() + yc)
+        self._cxx.append(self._cxx.last() + x * x)
+        self._cxy.append(self._cxy.last() + x * yc)
+        self._cyy.append(self._cyy.last() + yc * yc)
+        if py is not None and y - py >= 0:
+            self._inc_sum += y - py
+            self._inc_cnt += 1
+
+        m = self._model
+        if m is None:
+            return
+        if abs(y - (m["a"] * x + m["b"])) <= m["thr"]:
+            # new inlier: RANSAC's final model is least squares over the consensus set
+            m["n"] += 1
+            m["sx"] += x
+            m["sy"] += y
+            m["sxx"] += x * x
+            m["sxy"] += x * y
+            line = self._line(m["n"], m["sx"], m["sy"], m["sxx"], m["sxy"])
+            if line is not None:
+                m["a"], m["b"] = line
+        else:
+            m["outliers"] += 1
+
+    # ------------------------------------------------------------------
+    # models
+    @staticmethod
+    def _line(n, sx, sy, sxx, sxy):
+        vxx = sxx - sx * sx / n
+        if n < 2 or vxx <= 1e-12 * max(sxx, 1.0):
+            return None
+        a = (sxy - sx * sy / n) / vxx
+        return a, (sy - a * sx) / n
+
+    def _std_y(self):
+        n = len(self._fy)
+        sy, syy = self._cy.last(), self._cyy.last()
+        return math.sqrt(max(syy / n - (sy / n) ** 2, 0.0))
+
+    def _needs_refit(self):
+        m = self._model
+        n = len(self._fx)
+        if m is None or n < self.SMALL:
+            return True
+        if n >= m["fit_n"] * (1 + self.REFIT_GROWTH):
+            return True
+        if m["outliers"] > self.REFIT_OUTLIERS * m["n"]:
+            return True
+        thr = self._std_y() * 0.8
+        return abs(thr - m["thr"]) > self.REFIT_THRESHOLD * max(m["thr"], 1e-9)
+
+    def _refit(self):
+        xs, ys = self._fx.view(), self._fy.view()
+        thr = np.std(ys) * 0.8
+        ransac = RANSACRegressor(
+            LinearRegression(fit_intercept=True),
+            min_samples=max(4, len(xs) // 5),
+            residual_threshold=thr,
+            max_trials=100
+        )
+        ransac.fit(xs.reshape(-1, 1), ys)
+        inl = ransac.inlier_mask_
+        ix, iy = xs[inl], ys[inl]
+        self._model = {
+            "a": float(ransac.estimator_.coef_[0]),
+            "b": float(ransac.estimator_.intercept_),
+            "thr": float(thr),
+            "fit_n": len(xs),
+            "n": int(inl.sum()),
+            "outliers": 0,
+            "sx": float(ix.sum()), "sy": float(iy.sum()),
+            "sxx": float((ix * ix).sum()), "sxy": float((ix * iy).sum()),
+        }
+
+    def _segment_slope(self):
+        """ 第二段（最近一段）直线 (a, b)；断点每增长 SEGMENT_REFRESH 才重新搜索 """
+        n = len(self._fx)
+        prefix = (self._cx.view(), self._cy.view(), self._cxx.view(), self._cxy.view(), self._cyy.view())
+        if self._seg is None or n < self.SMALL or n >= self._seg["n"] * (1 + self.SEGMENT_REFRESH):
+            k = _best_split(n, *prefix)
+            self._seg = {"k": k, "n": n}
+        k = self._seg["k"]
+        if k is None:
+            return None
+        cx, cy, cxx, cxy, _ = prefix
+        cnt = n - k
+        line = self._line(cnt, cx[n] - cx[k], cy[n] - cy[k], cxx[n] - cxx[k], cxy[n] - cxy[k])
+        if line is None:
+            try:
+                a, b = _lstsq_line(self._fx.view()[k:], self._fy.view()[k:])
+                return a, b
+            except Exception:
+                return None
+        a, b = line
+        return a, b + self._y0
+
+    # ------------------------------------------------------------------
+    def estimate(self, current_view, target_view):
+        """
+        增强版预测模型：
+        1. RANSAC 回归（主模型）
+        2. 分段线性回归（自动寻找最佳分段点）
+        3. 指数衰减增量预测（对未来增量趋势进行校正）
+        4. 动态权重融合
+        5. 基于局部“斜率”而非增量(diff)的异常过滤
+        返回 (人类可读耗时, 预计日期, 有效采样点数, 平均增量)；数值结果同时保存在 self.last_seconds。
+        """
+        with self._lock:
+            self.last_seconds = None
+            if self._count < self.MIN_POINTS:
+                return "数据不足", "数据不足", self._count, 0
+            if self._t0_bad:
+                return "时间格式错误", "时间格式错误", 0, 0
+            if len(self._rx) < self.MIN_POINTS:
+                return "有效数据不足", "有效数据不足", len(self._rx), 0
+            n = len(self._fx)
+            if n < self.MIN_POINTS:
+                return "有效数据不足", "有效数据不足", n, self._med
+
+            # 2. RANSAC（主模型）
+            try:
+                if self._needs_refit():
+                    self._refit()
+                a_r = self._model["a"]
+            except Exception:
+                self._model = None
+                return "RANSAC失败", "RANSAC失败", n, 0
+
+            if a_r <= 0:
+                return "增量非正", "增量非正", n, 0
+
+            # 3. 分段线性回归：使用第二段斜率作为“局部趋势”
+            seg = self._segment_slope()
+            a_seg = seg[0] if seg is not None else a_r
+            if a_seg <= 0:
+                a_seg = a_r
+
+            # 4. 指数衰减模型（预测未来增量下降趋势）
+            tail = self._fy.view()[-7:]
+            incs = np.diff(tail)
+            if n - 1 > 5:
+                # 最近 5 个增量的衰减速度
+                recent = incs[-5:]
+                ratios = []
+                for i in range(1, len(recent)):
+                    if recent[i - 1] > 0:
+                        ratios.append(recent[i] / recent[i - 1])
+
+                decay = np.median(ratios) if ratios else 1.0
+                decay = max(0.80, min(decay, 1.0))  # 限制在 0.80~1.0 比较稳健
+            else:
+                decay = 1.0
+
+            # 当前增量估计
+            current_inc = incs[-1] if len(incs) else 0
+            if current_inc <= 0:
+                current_inc = a_r  # fallback
+
+            # 预估达成需要的时间（指数衰减积分）
+            remain = target_view - current_view
+            if remain <= 0:
+                return "已达成", "已达成", n, current_inc
+
+            # 指数衰减求解：sum(current_inc * decay^t) >= remain
+            try:
+                if decay < 0.999:
+                    est_exp = math.log(1 - remain * (1 - decay) / current_inc) / math.log(decay)
+                    est_exp = max(est_exp, 0)
+                else:
+                    est_exp = remain / current_inc
+            except Exception:
+                est_exp = remain / max(current_inc, 1)
+
+            # 5. 三模型融合（动态权重）
+            est_r = (target_view - current_view) / a_r
+            est_s = (target_view - current_view) / a_seg
+            est_e = est_exp
+
+            # RANSAC权重随内点比例变化；分段线性在“后期”趋势明显时更重；指数衰减防止后期过度乐观
+            inlier_ratio = min(1.0, self._model["n"] / n)
+            slope_stab = 1 / (np.std(incs[-5:]) + 1e-6)
+            w_r = min(0.85, 0.4 + inlier_ratio)
+            w_s = min(0.4, slope_stab * 0.25)
+            w_e = max(0.05, 1 - w_r - w_s)
+
+            est_seconds = w_r * est_r + w_s * est_s + w_e * est_e
+
+            if not math.isfinite(est_seconds):
+                return "预测失败", "预测失败", n, current_inc
+            if est_seconds < 0:
+                return "已达成", "已达成", n, current_inc
+            self.last_seconds = float(est_seconds)
+
+            # 6. 输出格式化
+            est_dt = datetime.datetime.now() + datetime.timedelta(seconds=est_seconds)
+            est_date = est_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+            if est_seconds < 60:
+                human = f"约{int(est_seconds)}秒"
+            elif est_seconds < 3600:
+                human = f"约{est_seconds / 60:.1f}分钟"
+            elif est_seconds < 86400:
+                human = f"约{est_seconds / 3600:.1f}小时"
+            else:
+                human = f"约{est_seconds / 86400:.1f}天"
+
+            # 平均增量
+            avg_inc = self._inc_sum / self._inc_cnt if self._inc_cnt else 0
+
+            return human, est_date, n, avg_inc
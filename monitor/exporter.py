@@ -0,0 +1,150 @@
+# monitor/exporter.py
+import os
+import threading
+import time
+import traceback
+from openpyxl import Workbook
+from .manifest import update_manifest
+
+
+class XlsxExporter:
+    """
+    Background XLSX exporter shared by all monitors.
+
+    The XLSX file is a derived artifact: monitors only call schedule() after each sample,
+    which coalesces requests per BV. A single worker thread writes each BV at most once
+    every EXPORT_INTERVAL seconds (or immediately on flush()), streaming rows through a
+    write-only openpyxl workbook so memory stays flat for large histories.
+    """
+
+    EXPORT_INTERVAL = 300  # seconds between two exports of the same BV
+
+    def __init__(self, on_log=None, export_interval=None):
+        self.on_log = on_log or (lambda m: print(m))
+        if export_interval is not None:
+            self.EXPORT_INTERVAL = export_interval
+        self._cond = threading.Condition()
+        self._pending = {}      # bv -> (xlsx_file, snapshot callable)
+        self._due = {}          # bv -> monotonic time at which the export may run
+        self._last_export = {}  # bv -> monotonic time of the last export
+        self._busy = set()      # bv currently being written
+        self._thread = None
+        self._stopping = False
+
+    def log(self, msg):
+        try:
+            self.on_log("[XLSX] " + str(msg))
+        except Exception:
+            print("[XLSX]", msg)
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def schedule(self, bv, xlsx_file, snapshot):
+        """
+        Request an export of bv. snapshot() -> list of records; it is called by the worker at
+        write time, so only the latest state is written no matter how many samples arrived.
+        """
+        self.start()
+        with self._cond:
+            self._pending[bv] = (xlsx_file, snapshot)
+            if bv not in self._due:
+                last = self._last_export.get(bv)
+                if bv in self._busy:
+                    self._due[bv] = time.monotonic() + self.EXPORT_INTERVAL
+                elif last is None:
+                    self._due[bv] = time.monotonic()
+                else:
+                    self._due[bv] = last + self.EXPORT_INTERVAL
+            self._cond.notify_all()
+
+    def flush(self, bv=None, wait=False, timeout=None):
+        """ Export bv (or every pending BV) as soon as possible, optionally waiting for it. """
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            now = time.monotonic()
+            for key in list(self._pending):
+                if bv is None or key == bv:
+                    self._due[key] = now
+            self._cond.notify_all()
+            if not wait:
+                return True
+            while any((bv is None or key == bv) for key in list(self._pending) + list(self._busy)):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=30):
+        """ Write everything still pending, then stop the worker. """
+        ok = self.flush(wait=True, timeout=timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        return ok
+
+    # ----------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                job = None
+                while job is None:
+                    if self._stopping and not self._pending:
+                        return
+                    now = time.monotonic()
+                    ready = [k for k, d in self._due.items() if d <= now and k in self._pending]
+                    if ready:
+                        bv = min(ready, key=lambda k: self._due[k])
+                        job = (bv,) + self._pending.pop(bv)
+                        self._due.pop(bv, None)
+                        self._busy.add(bv)
+                        break
+                    waits = [d - now for k, d in self._due.items() if k in self._pending]
+                    self._cond.wait(min(waits) if waits else None)
+
+            bv, xlsx_file, snapshot = job
+            try:
+                self.export(xlsx_file, snapshot())
+            except Exception as e:
+                self.log("%s 导出失败: %s\n%s" % (bv, e, traceback.format_exc()))
+            finally:
+                with self._cond:
+                    self._busy.discard(bv)
+                    self._last_export[bv] = time.monotonic()
+                    if bv in self._pending and bv not in self._due:
+                        self._due[bv] = self._last_export[bv] + self.EXPORT_INTERVAL
+                    self._cond.notify_all()
+
+    @staticmethod
+    def export(xlsx_file, records):
+        """
+        Stream records into xlsx_file (header = keys in first-seen order, like
+        pd.DataFrame(records).to_excel(index=False)). Written to a temp file and
+        swapped in, so readers never see a half-written workbook. The manifest next to it is
+        updated so the next startup can verify the file without parsing it.
+        """
+        columns = []
+        seen = set()
+        for rec in records:
+            for k in rec:
+                if k not in seen:
+                    seen.add(k)
+                    columns.append(k)
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(columns)
+        for rec in records:
+            ws.append([rec.get(k) for k in columns])
+
+        tmp = xlsx_file + ".tmp.xlsx"
+        wb.save(tmp)
+        os.replace(tmp, xlsx_file)
+        update_manifest(os.path.dirname(xlsx_file) or ".", "xlsx", xlsx_file, records)
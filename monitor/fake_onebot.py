@@ -0,0 +1,206 @@
+# monitor/fake_onebot.py
+"""
+Local stand-in for a NapCat OneBot v11 WebSocket endpoint, so pushes, pacing and failover can
+be tried without QQ.
+
+    python -m monitor.fake_onebot --port 3001     # serve ws://127.0.0.1:3001 until Ctrl+C
+    python -m monitor.fake_onebot --failover      # measure failover between two fake endpoints
+
+FakeOneBot answers every action with the same echo. get_status reports `online`. Actions
+listed in fail_actions are answered with status "failed"; those in hang_actions are never
+answered. go_down() drops every connection and refuses new ones until go_up(). hang() keeps
+the sockets open but stops answering, like a stuck instance. Every received action is
+recorded in `received` with its arrival time.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import tempfile
+import threading
+import time
+
+import websockets
+
+
+class FakeOneBot:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_actions=(), hang_actions=(), online=True,
+                 name="fake"):
+        self.host = host
+        self.port = port
+        self.latency = float(latency)
+        self.fail_actions = set(fail_actions)
+        self.hang_actions = set(hang_actions)
+        self.online = online
+        self.name = name
+        self.hanging = False
+        self.received = []  # [(time.monotonic(), action, params)]
+
+        self._msg_ids = itertools.count(1)
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return "ws://%s:%d" % (self.host, self.port)
+
+    def log(self, msg):
+        print("[%s] %s" % (self.name, msg))
+
+    # ------------------------------------------------------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        self.go_up()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self.go_down()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_forever()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(10)
+
+    def go_up(self):
+        """ (Re)start serving on the same port. """
+        async def up():
+            if self._server is None:
+                self._server = await websockets.serve(self._handler, self.host, self.port)
+                self.port = self._server.sockets[0].getsockname()[1]
+        self._call(up())
+
+    def go_down(self):
+        """ Drop every connection and refuse new ones. """
+        async def down():
+            if self._server is not None:
+                self._server.close()
+                await self._server.wait_closed()
+                self._server = None
+        self._call(down())
+
+    def hang(self, flag=True):
+        self.hanging = flag
+
+    def count(self, action=None):
+        return sum(1 for _, a, _ in self.received if action is None or a == action)
+
+    # ------------------------------------------------------------------
+    async def _handler(self, ws, path=None):
+        try:
+            await self._serve(ws)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _serve(self, ws):
+        async for raw in ws:
+            try:
+                req = json.loads(raw)
+            except Exception:
+                continue
+            action, params = req.get("action"), req.get("params") or {}
+            self.received.append((time.monotonic(), action, params))
+            if self.hanging or action in self.hang_actions:
+                continue
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            await ws.send(json.dumps(self._answer(action, req.get("echo"))))
+
+    def _answer(self, action, echo):
+        if action in self.fail_actions:
+            return {"status": "failed", "retcode": 100, "data": None, "wording": "fake failure", "echo": echo}
+        if action == "get_status":
+            data = {"online": bool(self.online), "good": bool(self.online)}
+        elif action == "get_login_info":
+            data = {"user_id": 10000, "nickname": self.name}
+        else:
+            data = {"message_id": next(self._msg_ids)}
+        return {"status": "ok", "retcode": 0, "data": data, "echo": echo}
+
+
+def measure_failover(messages=40, interval=0.1, kill_after=10):
+    """
+    Push `messages` forwards at `interval` through a client with two fake endpoints (failover
+    mode, outbox on) and take the primary down after `kill_after` of them. Returns a dict with
+    the delivery gap around the outage and the per-endpoint counts.
+    """
+    from .notifier import OneBotWSClient
+    from .outbox import Outbox
+
+    primary = FakeOneBot(name="primary").start()
+    backup = FakeOneBot(name="backup").start()
+    cfg = {
+        "onebot_enabled": True,
+        "onebot_ws_urls": [primary.url, backup.url],
+        "onebot_target_rate_per_min": 60000,
+        "onebot_coalesce_window": 0,
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        client = OneBotWSClient(lambda: cfg, on_log=lambda m: None, outbox=Outbox(folder, on_log=lambda m: None))
+        client.start()
+        deadline = time.monotonic() + 10
+        while client.stats()["healthy"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        killed_at = None
+        for i in range(messages):
+            if i == kill_after:
+                primary.go_down()
+                killed_at = time.monotonic()
+            client.send_group_forward(1, [{"type": "node", "data": {"content": "msg %d" % i}}])
+            time.sleep(interval)
+        deadline = time.monotonic() + 30
+        while len(client.outbox) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        left = len(client.outbox)
+        client.stop()
+
+    first_backup = min((t for t, a, _ in backup.received if a == "send_group_forward_msg"), default=None)
+    result = {
+        "primary": primary.count("send_group_forward_msg"),
+        "backup": backup.count("send_group_forward_msg"),
+        "undelivered": left,
+        "failover_seconds": (first_backup - killed_at) if first_backup and killed_at else None,
+    }
+    primary.stop()
+    backup.stop()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake NapCat OneBot v11 WebSocket endpoint")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=3001)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds before each answer")
+    ap.add_argument("--fail", action="append", default=[], help="action to answer with status failed")
+    ap.add_argument("--failover", action="store_true", help="measure failover between two fake endpoints")
+    args = ap.parse_args()
+
+    if args.failover:
+        r = measure_failover()
+        print("primary %(primary)d / backup %(backup)d / undelivered %(undelivered)d" % r)
+        if r["failover_seconds"] is not None:
+            print("first send on backup %.2fs after the primary went down" % r["failover_seconds"])
+        return
+
+    bot = FakeOneBot(args.host, args.port, latency=args.latency, fail_actions=args.fail).start()
+    bot.log("listening on %s" % bot.url)
+    try:
+        while True:
+            time.sleep(5)
+            bot.log("%d actions received" % bot.count())
+    except KeyboardInterrupt:
+        bot.stop()
+
+
+if __name__ == "__main__":
+    main()
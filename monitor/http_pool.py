@@ -0,0 +1,138 @@
+# monitor/http_pool.py
+"""
+Process-wide HTTP connection pools.
+
+Sync face: one keep-alive requests.Session used by every cover download (CoverCache.ensure on
+the engine's worker pool). Its adapter is bounded per host (pool_block), so a cold
+start of many monitors reuses a handful of connections instead of opening one per request.
+
+Async face: one aiohttp.ClientSession per event loop (in practice the engine loop) with the
+same limits; install_bilibili_session() hands it to bilibili_api so all API calls share it.
+"""
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:  # bilibili_api brings aiohttp; without it only the sync face is available
+    aiohttp = None
+
+DEFAULTS = {
+    "http_pool_per_host": 8,      # keep-alive connections per host
+    "http_pool_total": 32,        # async face: connections over all hosts
+    "http_timeout": 10.0,         # seconds, whole request
+    "http_connect_timeout": 5.0,  # seconds, TCP + TLS handshake
+}
+
+_lock = threading.Lock()
+_settings = dict(DEFAULTS)
+_session = None
+_async_sessions = {}  # loop -> aiohttp.ClientSession
+
+
+def configure(cfg=None, **kw):
+    """ Apply http_* settings (from bili_monitor_config.json or keyword args). Resets the pools. """
+    merged = {}
+    for k in DEFAULTS:
+        if cfg and cfg.get(k) not in (None, ""):
+            merged[k] = cfg.get(k)
+    merged.update({k: v for k, v in kw.items() if k in DEFAULTS and v is not None})
+    global _session
+    with _lock:
+        for k, v in merged.items():
+            _settings[k] = type(DEFAULTS[k])(v)
+        old, _session = _session, None
+    if old is not None:
+        old.close()
+
+
+def settings():
+    with _lock:
+        return dict(_settings)
+
+
+def timeout():
+    """ (connect, read) timeout tuple for requests. """
+    with _lock:
+        return (_settings["http_connect_timeout"], _settings["http_timeout"])
+
+
+# ----------------------------------------------------------------------
+# sync face
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            per_host = int(_settings["http_pool_per_host"])
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=per_host, pool_maxsize=per_host, pool_block=True)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+def get(url, **kw):
+    """ requests.get through the shared pool, with the configured timeouts by default. """
+    kw.setdefault("timeout", timeout())
+    return get_session().get(url, **kw)
+
+
+def close():
+    global _session
+    with _lock:
+        old, _session = _session, None
+    if old is not None:
+        old.close()
+
+
+# ----------------------------------------------------------------------
+# async face
+def get_async_session():
+    """ The aiohttp session of the running loop (created on first use). Call from a coroutine. """
+    if aiohttp is None:
+        raise RuntimeError("aiohttp is not installed")
+    loop = asyncio.get_event_loop()
+    with _lock:
+        s = _async_sessions.get(loop)
+        if s is None or s.closed:
+            st = dict(_settings)
+            connector = aiohttp.TCPConnector(limit=int(st["http_pool_total"]),
+                                             limit_per_host=int(st["http_pool_per_host"]))
+            s = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=st["http_timeout"], connect=st["http_connect_timeout"]))
+            _async_sessions[loop] = s
+        return s
+
+
+async def install_bilibili_session(on_log=None):
+    """
+    Make bilibili_api use the shared aiohttp session on the running loop. Returns False when
+    the installed bilibili_api cannot take an external aiohttp session (it then keeps its own
+    per-loop client, which is still shared because all monitors run on one loop).
+    """
+    if aiohttp is None:
+        return False
+    try:
+        from bilibili_api.utils import network
+        get_selected = getattr(network, "get_selected_client", None)
+        if get_selected is not None and get_selected()[0] != "aiohttp":
+            return False
+        network.set_session(get_async_session())
+        return True
+    except Exception as e:
+        if on_log:
+            on_log("无法共享 bilibili_api 会话: %s" % e)
+        return False
+
+
+async def close_async():
+    loop = asyncio.get_event_loop()
+    with _lock:
+        s = _async_sessions.pop(loop, None)
+    if s is not None and not s.closed:
+        await s.close()
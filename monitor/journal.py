@@ -0,0 +1,223 @@
+# monitor/journal.py
+import json
+import os
+import threading
+import time
+
+
+class SampleJournal:
+    """
+    Append-only sample journal for one BV.
+
+    Every sample is appended as one JSON line ({"seq": n, "rec": {...}}) to <BV>/<BV>.jsonl,
+    so a new sample costs a constant amount of I/O no matter how long the history is.
+    Lines are flushed immediately and fsync'd in batches. The journal is periodically
+    compacted in a background thread into <BV>/<BV>.json (same list-of-records layout as
+    before), which keeps old tooling working.
+    """
+
+    FSYNC_EVERY = 20        # fsync after this many appended records
+    FSYNC_INTERVAL = 5.0    # ... or when the oldest unsynced record is this old (seconds)
+    COMPACT_INTERVAL = 600  # seconds between background compactions
+
+    def __init__(self, folder, bv, on_log=None):
+        self.folder = folder
+        self.bv = bv
+        self.on_log = on_log or (lambda m: print(m))
+        self.json_file = os.path.join(folder, "%s.json" % bv)
+        self.journal_file = os.path.join(folder, "%s.jsonl" % bv)
+        self.rotated_file = self.journal_file + ".compacting"
+
+        self._lock = threading.Lock()
+        self._fp = None
+        self._seq = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._last_compact = time.monotonic()
+        self._compact_thread = None
+
+    def _log(self, msg):
+        try:
+            self.on_log(msg)
+        except Exception:
+            print(msg)
+
+    # ------------------------------------------------------------------
+    # recovery
+    def _read_journal(self, path):
+        out = []
+        if not os.path.exists(path):
+            return out
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    out.append((int(entry["seq"]), entry["rec"]))
+                except Exception:
+                    # torn last line after a crash; everything before it is intact
+                    continue
+        return out
+
+    def recover(self):
+        """
+        Fold any journal left over from a previous run (crash, kill, interrupted compaction)
+        into <BV>.json. Does nothing when there is no pending journal.
+        Returns the number of records recovered from the journal.
+        """
+        pending = []
+        for path in (self.rotated_file, self.journal_file):
+            pending.extend(self._read_journal(path))
+        if not pending:
+            for path in (self.rotated_file, self.journal_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            return 0
+
+        records = []
+        if os.path.exists(self.json_file):
+            with open(self.json_file, "r", encoding="utf-8") as f:
+                records = json.load(f)
+
+        recovered = 0
+        for seq, rec in sorted(pending, key=lambda e: e[0]):
+            # entries already compacted into <BV>.json are skipped
+            if seq < len(records):
+                continue
+            records.append(rec)
+            recovered += 1
+
+        self._write_json(records)
+        for path in (self.rotated_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+        if recovered:
+            self._log("从日志恢复 %d 条样本" % recovered)
+        return recovered
+
+    # ------------------------------------------------------------------
+    # appending
+    def open(self, base_count):
+        """ base_count: number of records already persisted (len of the loaded history) """
+        with self._lock:
+            self._seq = int(base_count)
+            self._last_compact = time.monotonic()
+
+    def append(self, rec):
+        """ Append one record. Returns (ok, msg) like the other writers. """
+        with self._lock:
+            try:
+                if self._fp is None:
+                    os.makedirs(self.folder, exist_ok=True)
+                    self._fp = open(self.journal_file, "a", encoding="utf-8")
+                line = json.dumps({"seq": self._seq, "rec": rec}, ensure_ascii=False)
+                self._fp.write(line + "\n")
+                self._fp.flush()
+                self._seq += 1
+                self._unsynced += 1
+                now = time.monotonic()
+                if self._unsynced >= self.FSYNC_EVERY or now - self._last_sync >= self.FSYNC_INTERVAL:
+                    self._sync_locked()
+                return True, "ok"
+            except Exception as e:
+                return False, "写入日志失败: %s" % e
+
+    def _sync_locked(self):
+        if self._fp is None:
+            return
+        try:
+            os.fsync(self._fp.fileno())
+        except Exception:
+            pass
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_fp_locked(self):
+        if self._fp is None:
+            return
+        self._sync_locked()
+        try:
+            self._fp.close()
+        except Exception:
+            pass
+        self._fp = None
+
+    # ------------------------------------------------------------------
+    # compaction
+    def _write_json(self, records):
+        if not isinstance(records, list):
+            # e.g. a SampleStore snapshot: materialize the classic list of dicts
+            records = list(records)
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = self.json_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.json_file)
+
+    def _rotate_locked(self):
+        """ Move the active journal aside so appends can continue while compacting. """
+        self._close_fp_locked()
+        if not os.path.exists(self.journal_file):
+            return
+        if not os.path.exists(self.rotated_file):
+            os.replace(self.journal_file, self.rotated_file)
+            return
+        # a previous compaction failed: keep its entries and add the new ones after them
+        with open(self.journal_file, "r", encoding="utf-8") as src, \
+                open(self.rotated_file, "a", encoding="utf-8") as dst:
+            dst.write(src.read())
+        os.remove(self.journal_file)
+
+    def _compact(self, records):
+        try:
+            self._write_json(records)
+            if os.path.exists(self.rotated_file):
+                os.remove(self.rotated_file)
+        except Exception as e:
+            self._log("日志压缩失败: %s" % e)
+
+    def compacting(self):
+        t = self._compact_thread
+        return bool(t and t.is_alive())
+
+    def maybe_compact(self, snapshot):
+        """
+        snapshot() -> full list of records, taken together with the last append.
+        Starts a background compaction when COMPACT_INTERVAL has elapsed.
+        """
+        if self.compacting():
+            return False
+        if time.monotonic() - self._last_compact < self.COMPACT_INTERVAL:
+            return False
+        with self._lock:
+            try:
+                self._rotate_locked()
+            except Exception as e:
+                self._log("日志轮转失败: %s" % e)
+                return False
+            records = snapshot()
+            self._last_compact = time.monotonic()
+        self._compact_thread = threading.Thread(target=self._compact, args=(records,), daemon=True)
+        self._compact_thread.start()
+        return True
+
+    def close(self, snapshot=None):
+        """ Flush the journal and, if a snapshot is given, compact synchronously. """
+        t = self._compact_thread
+        if t and t.is_alive():
+            t.join()
+        with self._lock:
+            if snapshot is None:
+                self._close_fp_locked()
+                return
+            try:
+                self._rotate_locked()
+            except Exception as e:
+                self._log("日志轮转失败: %s" % e)
+                return
+            records = snapshot()
+        self._compact(records)
@@ -0,0 +1,146 @@
+# monitor/logsink.py
+import collections
+import fnmatch
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+
+_SOURCE_RE = re.compile(r"^\[([^\]]+)\]")
+
+
+def parse_level(value, default=logging.INFO):
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    return level if isinstance(level, int) else default
+
+
+class LogSink:
+    """
+    Thread-safe log pipeline shared by the GUI, the daemon and every component's on_log.
+
+    write() (also the instance itself, so it can be passed as on_log) only stamps the line,
+    filters it and appends it to bounded in-memory buffers; it never touches Tk:
+      - tail()    the last max_lines shown lines (ring buffer)
+      - drain()   lines shown since the previous drain, for a batched flush to a widget on a
+                  timer (bounded too: if nobody drains, the oldest are dropped and counted)
+    The source of a line is its leading "[...]" tag ("BV1xx", "OneBotWS", "Outbox"; "app"
+    without one). levels maps source patterns (fnmatch, e.g. "BV*") to the minimum level
+    shown for them, "*" being the default. The rotating file, written by a background thread,
+    keeps the full history at file_level regardless of the per-source levels.
+    """
+
+    def __init__(self, max_lines=5000, levels=None, file_path=None, file_max_kb=5120, file_backups=5,
+                 file_level=logging.DEBUG, echo=False):
+        self.max_lines = max(100, int(max_lines))
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._tail = collections.deque(maxlen=self.max_lines)
+        self._pending = collections.deque(maxlen=self.max_lines)
+        self.dropped = 0
+        self.set_levels(levels)
+
+        self._listener = None
+        self._file_logger = None
+        self._file_handler = None
+        if file_path:
+            self._open_file(file_path, file_max_kb, file_backups, file_level)
+
+    @classmethod
+    def from_config(cls, cfg, echo=False):
+        return cls(max_lines=cfg.get("log_max_lines", 5000),
+                   levels=cfg.get("log_levels"),
+                   file_path=cfg.get("log_file", os.path.join("logs", "monitor.log")),
+                   file_max_kb=cfg.get("log_file_max_kb", 5120),
+                   file_backups=cfg.get("log_file_backups", 5),
+                   file_level=parse_level(cfg.get("log_file_level", "DEBUG"), logging.DEBUG),
+                   echo=echo)
+
+    def _open_file(self, path, max_kb, backups, level):
+        try:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=int(max_kb) * 1024,
+                                                           backupCount=int(backups), encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+        except Exception as e:
+            print("打开日志文件失败:", e)
+            return
+        q = queue.SimpleQueue()
+        logger = logging.getLogger("bili_monitor.%x" % id(self))
+        logger.propagate = False
+        logger.setLevel(level)
+        logger.addHandler(logging.handlers.QueueHandler(q))
+        self._listener = logging.handlers.QueueListener(q, handler)
+        self._listener.start()
+        self._file_logger = logger
+        self._file_handler = handler
+
+    # ------------------------------------------------------------------
+    def set_levels(self, levels):
+        """ {source pattern: level name or number}; "*" is the default (INFO). """
+        levels = dict(levels or {})
+        self._default_level = parse_level(levels.pop("*", logging.INFO))
+        self._levels = [(pat, parse_level(lv)) for pat, lv in levels.items()]
+        self._level_cache = {}
+
+    def level_for(self, source):
+        level = self._level_cache.get(source)
+        if level is None:
+            level = next((lv for pat, lv in self._levels if fnmatch.fnmatchcase(source, pat)),
+                         self._default_level)
+            self._level_cache[source] = level
+        return level
+
+    def write(self, msg, level=logging.INFO):
+        msg = str(msg)
+        m = _SOURCE_RE.match(msg)
+        source = m.group(1) if m else "app"
+        ts = time.strftime("[%Y-%m-%d %H:%M:%S]")
+        line = "%s %s" % (ts, msg)
+        if self._file_logger is not None:
+            self._file_logger.log(level, "%s %-7s %s" % (ts, logging.getLevelName(level), msg))
+        if level < self.level_for(source):
+            return
+        with self._lock:
+            self._tail.append(line)
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(line)
+        if self.echo:
+            print(line, flush=True)
+
+    __call__ = write
+
+    def debug(self, msg):
+        self.write(msg, logging.DEBUG)
+
+    def warning(self, msg):
+        self.write(msg, logging.WARNING)
+
+    def drain(self):
+        """ -> (lines shown since the last drain, lines dropped because nobody drained). """
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+    def tail(self, n=None):
+        with self._lock:
+            lines = list(self._tail)
+        return lines[-n:] if n else lines
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()   # writes out whatever is still queued
+            self._listener = None
+            for h in list(self._file_logger.handlers):
+                self._file_logger.removeHandler(h)
+            self._file_logger = None
+            self._file_handler.close()
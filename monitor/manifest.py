@@ -0,0 +1,65 @@
+# monitor/manifest.py
+import json
+import os
+import threading
+
+MANIFEST_NAME = "manifest.json"
+
+# the XLSX exporter and the startup consistency check update the manifest from different threads
+_lock = threading.Lock()
+
+
+def file_entry(path, records):
+    """ Manifest entry describing path, which holds the given records. """
+    st = os.stat(path)
+    last_time = ""
+    if records:
+        try:
+            last_time = str(records[-1].get("time", ""))
+        except Exception:
+            last_time = ""
+    return {
+        "records": len(records),
+        "last_time": last_time,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def load_manifest(folder):
+    p = os.path.join(folder, MANIFEST_NAME)
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            d = json.load(f)
+        return d if isinstance(d, dict) else {}
+    except Exception:
+        return {}
+
+
+def update_manifest(folder, kind, path, records):
+    """ Record that path (kind: "xlsx") now holds records. """
+    entry = file_entry(path, records)
+    with _lock:
+        d = load_manifest(folder)
+        d[kind] = entry
+        p = os.path.join(folder, MANIFEST_NAME)
+        tmp = p + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(d, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, p)
+    return entry
+
+
+def entry_matches(entry, path):
+    """
+    True when path is still the file described by entry: same size and mtime (O(1), the file
+    is never read). A copied or touched file does not match; the caller then verifies it the
+    slow way and records it again.
+    """
+    if not entry or not os.path.exists(path):
+        return False
+    try:
+        st = os.stat(path)
+        return st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns")
+    except Exception:
+        return False
@@ -2,24 +2,157 @@
 import asyncio
 import threading
 import traceback
+import itertools
 import json
+import reprlib
 import websockets
 import time
+from collections import deque
+from concurrent.futures import Future
+
+from .ratelimit import KeyedRateLimiter
+
+_brief = reprlib.Repr()
+_brief.maxstring = 80
+_brief.maxother = 80
+_brief.maxlist = 4
+_brief.maxdict = 6
+_brief.maxlevel = 4
+
+
+def brief(params):
+    """ Short repr for logs: str(params) would copy every base64 image of a bulk push. """
+    return _brief.repr(params)[:200]
+
+
+FORWARD_ACTIONS = ("send_group_forward_msg", "send_private_forward_msg")
+
+
+def target_of(action, params):
+    """ "group:<id>" / "private:<id>" for message actions, None for anything else. """
+    if not isinstance(params, dict):
+        return None
+    if "group_id" in params:
+        return "group:%s" % params["group_id"]
+    if "user_id" in params:
+        return "private:%s" % params["user_id"]
+    return None
+
+
+def endpoint_urls(cfg):
+    """ onebot_ws_urls (list) or onebot_ws_url (one URL, or several separated by commas), deduplicated. """
+    urls = cfg.get("onebot_ws_urls") or cfg.get("onebot_ws_url") or []
+    if isinstance(urls, str):
+        urls = urls.replace("，", ",").split(",")
+    return list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+
+
+class _Endpoint:
+    """ One NapCat WebSocket endpoint and its connection state (loop thread only). """
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.healthy = False
+        self.inflight = set()   # echoes sent on the current socket and not answered yet
+        self.connects = 0
+        self.failures = 0
+        self.sent = 0
+
+
+class OneBotError(Exception):
+    """ An action failed: NapCat answered status=failed, or no answer came before the timeout. """
+    def __init__(self, msg, response=None):
+        super().__init__(msg)
+        self.response = response
+
 
 class OneBotWSClient:
     """
     OneBot WebSocket client with basic send queue and forward-message support for NapCat.
     get_config_callable() -> dict   (should include onebot_enabled, onebot_ws_url, onebot_bot_qq, onebot_group_ids, onebot_user_ids)
     on_log -> callable for logging
+
+    Several endpoints (bot accounts / NapCat instances) may be configured: onebot_ws_urls, or
+    comma-separated URLs in onebot_ws_url. Each keeps its own connection and reconnect backoff,
+    and is health-checked every HEALTH_INTERVAL seconds (ping + get_status). Sends go to the
+    first healthy endpoint (onebot_balance "failover", the default) or rotate over the healthy
+    ones ("round_robin"). When a socket fails, its unanswered actions fail at once and a send
+    moves on to the next endpoint.
+
+    Every action carries an echo id. The matching response resolves the Future returned by
+    send_async(), so callers (send_and_wait, the *_forward_async helpers) know whether NapCat
+    accepted the message. Actions without a response within their timeout, counted from when
+    they were queued, fail with OneBotError and are not sent afterwards. stats() reports
+    delivery counts and latency.
+
+    Sends are paced per target (group / user) so a burst to one group cannot trip QQ flood
+    control: each target has its own lane and token bucket (onebot_target_rate_per_min,
+    onebot_target_burst), and a busy lane does not hold up the others. Forward messages that
+    wait in the same lane within onebot_coalesce_window seconds are merged into one forward
+    (at most onebot_coalesce_max_nodes nodes). A single response then settles every merged
+    action.
+
+    With an Outbox, fire-and-forget sends (send_msg, send_*_forward) are stored on disk first
+    and delivered in order per target until NapCat acknowledges each one. Retries back off up
+    to OUTBOX_MAX_BACKOFF seconds. An entry that NapCat rejects OUTBOX_MAX_ATTEMPTS times is
+    dropped.
     """
-    def __init__(self, get_config_callable, on_log=None):
+
+    DEFAULT_TIMEOUT = 15.0
+    ACTION_TIMEOUTS = {
+        "send_group_forward_msg": 30.0,
+        "send_private_forward_msg": 30.0,
+    }
+    LATENCY_WINDOW = 200
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_MAX_BACKOFF = 30
+    OUTBOX_BATCH = 10              # entries of one target peeked at once (for a run of forwards to merge)
+
+    CONNECT_TIMEOUT = 10
+    HEALTH_INTERVAL = 15
+    HEALTH_TIMEOUT = 5
+
+    TARGET_RATE_PER_MIN = 20.0
+    TARGET_BURST = 3
+    COALESCE_WINDOW = 1.5          # seconds a forward waits for company before it is sent
+    COALESCE_MAX_NODES = 50
+
+    def __init__(self, get_config_callable, on_log=None, outbox=None, on_debug=None):
         self.get_config = get_config_callable
         self.on_log = on_log or (lambda m: print("[OneBotWS]", m))
+        self.on_debug = on_debug  # per-frame chatter (queued / sent / recv); on_log if not given
         self._thread = None
         self._loop = None
         self._stop_event = threading.Event()
+        self._ready_lock = threading.Lock()
+        self._ready_fut = Future()
+        self._backlog = []      # actions submitted before the loop was up
+        self._restart = False
+        self._config_event = None
         self._send_queue = None
-        self._ws = None
+        self._endpoints = {}    # url -> _Endpoint
+        self._order = []        # configured endpoint order (failover priority)
+        self._balance = "failover"
+        self._rr = -1
+        self._pinned = {}       # echo -> _Endpoint for actions that must use one endpoint
+        self._healthy_event = None
+        self.outbox = outbox
+        self._outbox_event = None
+
+        self._echo_seq = itertools.count(1)
+        self._pending = {}  # echo -> (Future, action, enqueue time, timeout), loop thread only
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._counts = {"sent": 0, "ok": 0, "failed": 0, "timeout": 0, "coalesced": 0}
+
+        self._pacer = KeyedRateLimiter(self.TARGET_RATE_PER_MIN / 60.0, self.TARGET_BURST)
+        self._coalesce_window = self.COALESCE_WINDOW
+        self._coalesce_max_nodes = self.COALESCE_MAX_NODES
+        self._lanes = {}    # target -> deque[(action, params, echo, enqueue time)], loop thread only
+        self._merged = {}   # echo of a merged forward -> echoes of the actions it carries
+        self._member_of = {}  # echo of a merged action -> echo of the forward carrying it
+        self._waits = deque(maxlen=self.LATENCY_WINDOW)  # queue time before the actual send
 
     def log(self, msg):
         try:
@@ -27,14 +160,63 @@ class OneBotWSClient:
         except Exception:
             print("[OneBotWS]", msg)
 
+    def debug(self, msg):
+        if self.on_debug is None:
+            return self.log(msg)
+        try:
+            self.on_debug("[OneBotWS] " + str(msg))
+        except Exception:
+            pass
+
     def start(self):
-        if self._thread and self._thread.is_alive():
-            return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._run_loop, daemon=True)
-        self._thread.start()
+        """ Start the client thread and return at once; see when_ready(). """
+        with self._ready_lock:
+            if self._thread and self._thread.is_alive():
+                if self._stop_event.is_set():
+                    # still shutting down: start again as soon as the old loop is gone
+                    self._restart = True
+                return
+            self._stop_event.clear()
+            if self._ready_fut.done():
+                self._ready_fut = Future()
+            self._thread = threading.Thread(target=self._run_loop, daemon=True)
+            self._thread.start()
         self.log("started")
 
+    def when_ready(self, callback=None):
+        """
+        concurrent.futures.Future resolved (True) once the client loop accepts actions; await it
+        with asyncio.wrap_future(). callback(future) runs on the client thread at that point, or
+        right away if the client is already up. Never blocks.
+        """
+        with self._ready_lock:
+            fut = self._ready_fut
+        if callback is not None:
+            fut.add_done_callback(callback)
+        return fut
+
+    def is_connected(self):
+        return any(ep.ws is not None and ep.healthy for ep in list(self._endpoints.values()))
+
+    def reload_config(self):
+        """
+        Apply changed OneBot settings in place: endpoints whose URL is gone are closed, new ones
+        connected, pacing re-read. Queued and outbox messages are kept. Targets and the bot QQ are
+        read from the config at push time. Starts the client if it is enabled but not running.
+        """
+        cfg = self.get_config() or {}
+        running = self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+        if not running:
+            if cfg.get("onebot_enabled", False) and endpoint_urls(cfg):
+                self.start()
+            return
+        loop = self._loop
+        if loop is not None and self._config_event is not None:
+            try:
+                loop.call_soon_threadsafe(self._config_event.set)
+            except RuntimeError:
+                pass
+
     def stop(self):
         self._stop_event.set()
         if self._loop:
@@ -44,40 +226,174 @@ class OneBotWSClient:
                 pass
         self.log("stopping")
 
-    def send_msg(self, action, params):
+    def send_msg(self, action, params, key=None):
         """
-        Generic enqueue of a OneBot action (e.g. send_group_msg).
+        Generic enqueue of a OneBot action (e.g. send_group_msg), fire-and-forget.
+        With an outbox the action is persisted first (key: optional dedup key).
         Returns True if enqueued, False otherwise.
         """
-        if not self._loop or not self._thread or not self._thread.is_alive():
-            self.log("ws not running, starting")
-            self.start()
-            # slight delay to let loop come up
-            time.sleep(0.1)
-        if self._loop and self._send_queue:
-            try:
-                asyncio.run_coroutine_threadsafe(self._send_queue.put((action, params)), self._loop)
-                self.log("enqueued %s %s" % (action, str(params)[:200]))
-                return True
-            except Exception as e:
-                self.log("enqueue failed: %s" % e)
+        if self.outbox is not None:
+            ok, reason = self.outbox.put(action, params, key, target_of(action, params))
+            if not ok:
+                self.log("outbox refused %s (%s)" % (action, reason))
                 return False
-        else:
-            self.log("loop/queue not ready")
+            self.debug("queued %s %s" % (action, brief(params)))
+            if not self._thread or not self._thread.is_alive():
+                self.start()
+            return True
+        fut = self.send_async(action, params)
+        return not (fut.done() and fut.exception() is not None)
+
+    def send_async(self, action, params, timeout=None):
+        """
+        Enqueue an action; returns a concurrent.futures.Future resolved with the response dict
+        once NapCat answers with the same echo, or failed with OneBotError (status failed,
+        timeout, client not running).
+        """
+        fut = Future()
+        if timeout is None:
+            timeout = self.ACTION_TIMEOUTS.get(action, self.DEFAULT_TIMEOUT)
+        echo = "bvm-%d" % next(self._echo_seq)
+        with self._ready_lock:
+            if self._stop_event.is_set() and not self._restart and self._thread is not None and self._thread.is_alive():
+                fut.set_exception(OneBotError("client stopping"))
+                return fut
+            loop = self._loop if self._ready_fut.done() and not self._stop_event.is_set() else None
+            if loop is None:
+                # handed to the loop as soon as it is up (see _run_loop); never wait here
+                self._backlog.append((action, params, echo, fut, timeout))
+        if loop is None:
+            self.log("ws not running, starting (queued %s)" % action)
+            self.start()
+            return fut
+        try:
+            asyncio.run_coroutine_threadsafe(self._enqueue(action, params, echo, fut, timeout), loop)
+            self.debug("enqueued %s %s" % (action, brief(params)))
+        except Exception as e:
+            self.log("enqueue failed: %s" % e)
+            fut.set_exception(OneBotError("enqueue failed: %s" % e))
+        return fut
+
+    def send_and_wait(self, action, params, timeout=None):
+        """ Blocking send_async(); returns the response dict or raises OneBotError. Not for the loop thread. """
+        if timeout is None:
+            timeout = self.ACTION_TIMEOUTS.get(action, self.DEFAULT_TIMEOUT)
+        fut = self.send_async(action, params, timeout)
+        try:
+            # the loop expires the echo at `timeout`; the margin covers queueing across threads
+            return fut.result(timeout + 5)
+        except OneBotError:
+            raise
+        except Exception as e:
+            raise OneBotError("no response: %s" % e)
+
+    async def _request(self, action, params, timeout=None, endpoint=None):
+        """ send_async() for coroutines on the client loop; endpoint pins the action to one connection. """
+        if timeout is None:
+            timeout = self.ACTION_TIMEOUTS.get(action, self.DEFAULT_TIMEOUT)
+        fut = Future()
+        echo = "bvm-%d" % next(self._echo_seq)
+        if endpoint is not None:
+            self._pinned[echo] = endpoint
+        await self._enqueue(action, params, echo, fut, timeout)
+        return await asyncio.wrap_future(fut)
+
+    async def _enqueue(self, action, params, echo, fut, timeout):
+        # the deadline runs from here, so the future settles within `timeout` even while the
+        # action waits for its lane or for a healthy endpoint; once expired it is never sent
+        self._pending[echo] = (fut, action, time.monotonic(), timeout)
+        asyncio.get_running_loop().call_later(timeout, self._expire, echo)
+        await self._send_queue.put((action, params, echo))
+
+    def _expire(self, echo):
+        item = self._pending.pop(echo, None)
+        if item is None:
+            return
+        fut, action = item[:2]
+        self._pinned.pop(echo, None)
+        merged = self._member_of.pop(echo, None)
+        if merged is not None and not self._is_live(merged):
+            # the last member of a merged forward timed out: no response will settle it
+            self._drop_merged(merged)
+        with self._stats_lock:
+            self._counts["timeout"] += 1
+        self.log("%s (%s) 未收到响应，已超时" % (action, echo))
+        if not fut.done():
+            fut.set_exception(OneBotError("%s timed out" % action))
+
+    def _is_live(self, echo):
+        """ Whether a response to `echo` (a plain or a merged one) still has an action to settle. """
+        return any(m in self._pending for m in self._merged.get(echo, (echo,)))
+
+    def _drop_merged(self, echo):
+        members = self._merged.pop(echo, None) or []
+        for m in members:
+            self._member_of.pop(m, None)
+        return members
+
+    def _resolve(self, resp):
+        echo = resp.get("echo")
+        members = self._drop_merged(echo) if echo in self._merged else None
+        if members is not None:
+            for m in members:
+                self._resolve(dict(resp, echo=m))
+            return True
+        item = self._pending.pop(echo, None) if echo is not None else None
+        if item is None:
             return False
+        fut, action, t0, _ = item
+        ok = resp.get("status") == "ok" or resp.get("retcode") == 0
+        with self._stats_lock:
+            self._latencies.append(time.monotonic() - t0)
+            self._counts["ok" if ok else "failed"] += 1
+        if fut.done():
+            return True
+        if ok:
+            fut.set_result(resp)
+        else:
+            self.log("%s 失败: retcode=%s %s" % (action, resp.get("retcode"), resp.get("wording") or resp.get("msg") or ""))
+            fut.set_exception(OneBotError("%s failed: retcode=%s" % (action, resp.get("retcode")), resp))
+        return True
+
+    def stats(self):
+        """ Delivery counters and end-to-end latency (enqueue -> response) in seconds. """
+        with self._stats_lock:
+            lat = sorted(self._latencies)
+            out = dict(self._counts)
+            waits = list(self._waits)
+        out["pending"] = len(self._pending)
+        out["queued"] = sum(len(lane) for lane in list(self._lanes.values()))
+        out["lanes"] = sum(1 for lane in list(self._lanes.values()) if lane)
+        out["wait_avg"] = (sum(waits) / len(waits)) if waits else None
+        out["wait_max"] = max(waits) if waits else None
+        out["outbox"] = len(self.outbox) if self.outbox is not None else 0
+        eps = list(self._endpoints.values())
+        out["endpoints"] = [{"url": ep.url, "connected": ep.ws is not None, "healthy": ep.healthy,
+                             "connects": ep.connects, "failures": ep.failures, "sent": ep.sent} for ep in eps]
+        out["healthy"] = sum(1 for ep in eps if ep.ws is not None and ep.healthy)
+        out["latency_avg"] = (sum(lat) / len(lat)) if lat else None
+        out["latency_p95"] = lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else None
+        out["latency_max"] = lat[-1] if lat else None
+        return out
 
     # convenience wrappers to send forward messages (NapCat)
-    def send_group_forward(self, group_id, nodes):
+    def send_group_forward(self, group_id, nodes, key=None):
         """
         nodes: list of forward nodes: each node is dict: {"type":"node", "data": {"name":..., "uin":..., "content": [...]} }
         NapCat expects key "messages" for send_group_forward_msg
         """
         params = {"group_id": int(group_id), "messages": nodes}
-        return self.send_msg("send_group_forward_msg", params)
+        return self.send_msg("send_group_forward_msg", params, key)
 
-    def send_private_forward(self, user_id, nodes):
+    def send_private_forward(self, user_id, nodes, key=None):
         params = {"user_id": int(user_id), "messages": nodes}
-        return self.send_msg("send_private_forward_msg", params)
+        return self.send_msg("send_private_forward_msg", params, key)
+
+    def send_group_forward_async(self, group_id, nodes, timeout=None):
+        return self.send_async("send_group_forward_msg", {"group_id": int(group_id), "messages": nodes}, timeout)
+
+    def send_private_forward_async(self, user_id, nodes, timeout=None):
+        return self.send_async("send_private_forward_msg", {"user_id": int(user_id), "messages": nodes}, timeout)
 
     # ----------------------------------------------------------------
     def _run_loop(self):
@@ -85,10 +401,30 @@ class OneBotWSClient:
             self._loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self._loop)
             self._send_queue = asyncio.Queue()
+            self._outbox_event = asyncio.Event()
+            self._config_event = asyncio.Event()
+            if self.outbox is not None:
+                loop = self._loop
+                self.outbox.on_put = lambda: loop.call_soon_threadsafe(self._outbox_event.set)
+            # hand over the backlog until it stays empty; the ready future is set under the same
+            # lock as that last check, so a concurrent send_async either lands in a backlog we
+            # still drain or sees the loop ready and schedules on it directly
+            while True:
+                with self._ready_lock:
+                    backlog, self._backlog = self._backlog, []
+                    if not backlog:
+                        self._ready_fut.set_result(True)
+                        break
+                for item in backlog:
+                    self._loop.run_until_complete(self._enqueue(*item))
             self._loop.run_until_complete(self._main())
         except Exception as e:
             self.log("ws loop error: %s\n%s" % (e, traceback.format_exc()))
         finally:
+            for echo in list(self._pending):
+                fut = self._pending.pop(echo)[0]
+                if not fut.done():
+                    fut.set_exception(OneBotError("client stopped"))
             try:
                 if self._loop and not self._loop.is_closed():
                     self._loop.run_until_complete(self._loop.shutdown_asyncgens())
@@ -99,71 +435,361 @@ class OneBotWSClient:
                     self._loop.close()
             except Exception:
                 pass
-            self._loop = None
+            with self._ready_lock:
+                self._loop = None
+                self._ready_fut = Future()
+                backlog, self._backlog = self._backlog, []
+                restart, self._restart = self._restart, False
             self.log("ws loop exited")
+            if restart:
+                with self._ready_lock:
+                    self._thread = None
+                    self._backlog[:0] = backlog
+                self.start()
+            else:
+                for item in backlog:
+                    if not item[3].done():
+                        item[3].set_exception(OneBotError("client stopped"))
 
     async def _shutdown(self):
         self._stop_event.set()
-        if self._ws:
-            try:
-                await self._ws.close()
-            except Exception:
-                pass
+        for ep in list(self._endpoints.values()):
+            if ep.ws is not None:
+                try:
+                    await ep.ws.close()
+                except Exception:
+                    pass
 
     async def _main(self):
+        """ Keep one connection task per configured endpoint; lanes and the outbox run across them. """
+        self._healthy_event = asyncio.Event()
+        tasks = {}
+        send_task = asyncio.create_task(self._send_loop())
+        outbox_task = asyncio.create_task(self._outbox_loop()) if self.outbox is not None else None
+        try:
+            while not self._stop_event.is_set():
+                cfg = self.get_config() or {}
+                urls = endpoint_urls(cfg) if cfg.get("onebot_enabled", False) else []
+                self._apply_config(cfg)
+                for url in urls:
+                    if url not in tasks:
+                        ep = self._endpoints[url] = _Endpoint(url)
+                        tasks[url] = asyncio.create_task(self._endpoint_loop(ep))
+                for url in [u for u in tasks if u not in urls]:
+                    ep = self._endpoints.pop(url, None)
+                    if ep is not None and ep.ws is not None:
+                        try:
+                            await ep.ws.close()
+                        except Exception:
+                            pass
+                    tasks.pop(url).cancel()
+                    self.log("endpoint removed: %s" % url)
+                self._order = urls
+                self._config_event.clear()
+                try:
+                    await asyncio.wait_for(self._config_event.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for t in list(tasks.values()) + [send_task, outbox_task]:
+                if t is not None:
+                    t.cancel()
+            self._lanes.clear()
+            self._endpoints.clear()
+        self.log("ws main exit")
+
+    async def _endpoint_loop(self, ep):
+        """ Connect to one endpoint, serve its responses and health checks, reconnect with backoff. """
         reconnect_delay = 1
         while not self._stop_event.is_set():
-            cfg = self.get_config() or {}
-            ws_url = cfg.get("onebot_ws_url")
-            enabled = cfg.get("onebot_enabled", False)
-            if not enabled or not ws_url:
-                await asyncio.sleep(1)
-                continue
+            since = None
             try:
-                self.log("connect %s" % ws_url)
-                async with websockets.connect(ws_url) as ws:
-                    self._ws = ws
-                    self.log("connected")
-                    reconnect_delay = 1
-                    send_task = asyncio.create_task(self._send_loop(ws))
-                    recv_task = asyncio.create_task(self._recv_loop(ws))
-                    done, pending = await asyncio.wait([send_task, recv_task],
-                                                       return_when=asyncio.FIRST_EXCEPTION)
+                self.log("connect %s" % ep.url)
+                async with websockets.connect(ep.url, open_timeout=self.CONNECT_TIMEOUT) as ws:
+                    ep.ws = ws
+                    ep.healthy = True
+                    ep.connects += 1
+                    self._healthy_event.set()
+                    self.log("connected %s" % ep.url)
+                    since = time.monotonic()
+                    tasks = [asyncio.create_task(self._recv_loop(ep)), asyncio.create_task(self._health_loop(ep))]
+                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
                     for t in pending:
                         t.cancel()
+                    for t in done:
+                        if not t.cancelled() and t.exception() is not None:
+                            self.log("ws task error (%s): %s" % (ep.url, t.exception()))
+                self.log("disconnected %s" % ep.url)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                self.log("ws error: %s" % e)
-                await asyncio.sleep(reconnect_delay)
-                reconnect_delay = min(60, reconnect_delay * 2)
+                self.log("ws error (%s): %s" % (ep.url, e))
             finally:
-                self._ws = None
-        self.log("ws main exit")
+                ep.ws = None
+                ep.healthy = False
+                # responses to actions sent on this socket can no longer arrive
+                self._fail_inflight(ep.inflight, "connection lost (%s)" % ep.url)
+                ep.inflight.clear()
+            # a connection that stayed healthy for a while starts the backoff over
+            if since is not None and time.monotonic() - since > 2 * self.HEALTH_INTERVAL:
+                reconnect_delay = 1
+            self.log("%d 秒后重连 %s" % (reconnect_delay, ep.url))
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(60, reconnect_delay * 2)
 
-    async def _send_loop(self, ws):
+    async def _health_loop(self, ep):
+        """ Ping the endpoint and ask NapCat whether its bot is online; returns when it is not healthy. """
         while not self._stop_event.is_set():
             try:
-                action, params = await self._send_queue.get()
-                payload = {"action": action, "params": params}
-                try:
-                    await ws.send(json.dumps(payload, ensure_ascii=False))
-                    self.log("sent: %s %s" % (action, str(params)[:200]))
-                except Exception as e:
-                    self.log("send error: %s" % e)
-                    # if send fails, try to requeue with small delay
-                    await asyncio.sleep(1)
-                    try:
-                        await self._send_queue.put((action, params))
-                    except Exception:
-                        pass
+                pong = await ep.ws.ping()
+                await asyncio.wait_for(pong, self.HEALTH_TIMEOUT)
+                resp = await self._request("get_status", {}, self.HEALTH_TIMEOUT, endpoint=ep)
+                online = (resp.get("data") or {}).get("online", True)
             except Exception as e:
-                self.log("send loop exception: %s" % e)
-                await asyncio.sleep(1)
+                self.log("health check failed (%s): %s" % (ep.url, e))
+                online = False
+            if online is False:
+                ep.healthy = False
+                ep.failures += 1
+                self.log("endpoint unhealthy: %s" % ep.url)
+                return
+            await asyncio.sleep(self.HEALTH_INTERVAL)
 
-    async def _recv_loop(self, ws):
+    def _apply_config(self, cfg):
+        """ Pacing, coalescing and balancing settings; re-read every second by _main. """
+        try:
+            self._pacer.configure(float(cfg.get("onebot_target_rate_per_min", self.TARGET_RATE_PER_MIN)) / 60.0,
+                                  int(cfg.get("onebot_target_burst", self.TARGET_BURST)))
+            self._coalesce_window = max(0.0, float(cfg.get("onebot_coalesce_window", self.COALESCE_WINDOW)))
+            self._coalesce_max_nodes = max(1, int(cfg.get("onebot_coalesce_max_nodes", self.COALESCE_MAX_NODES)))
+        except Exception as e:
+            self.log("invalid pacing config: %s" % e)
+        self._balance = "round_robin" if cfg.get("onebot_balance") == "round_robin" else "failover"
+
+    def _healthy(self):
+        return [self._endpoints[u] for u in self._order
+                if u in self._endpoints and self._endpoints[u].ws is not None and self._endpoints[u].healthy]
+
+    async def _pick_endpoint(self, pinned=None):
+        """ Healthy endpoint for the next send: the first one (failover) or the next in turn (round_robin). """
+        while True:
+            if pinned is not None:
+                if pinned.ws is not None and pinned.healthy:
+                    return pinned
+                raise OneBotError("endpoint %s not connected" % pinned.url)
+            healthy = self._healthy()
+            if healthy:
+                if self._balance == "round_robin":
+                    self._rr = (self._rr + 1) % len(healthy)
+                    return healthy[self._rr]
+                return healthy[0]
+            self._healthy_event.clear()
+            await self._healthy_event.wait()
+
+    def _fail_inflight(self, echoes, reason):
+        for echo in list(echoes):
+            for m in self._drop_merged(echo) or [echo]:
+                self._pinned.pop(m, None)
+                item = self._pending.pop(m, None)
+                if item is not None and not item[0].done():
+                    item[0].set_exception(OneBotError("%s: %s" % (item[1], reason)))
+
+    async def _send_loop(self):
+        """ Sort queued actions into per-target lanes; each lane is drained by its own task. """
+        workers = {}
+        try:
+            while not self._stop_event.is_set():
+                action, params, echo = await self._send_queue.get()
+                target = target_of(action, params)
+                self._lanes.setdefault(target, deque()).append((action, params, echo, time.monotonic()))
+                t = workers.get(target)
+                if t is None or t.done():
+                    workers[target] = asyncio.create_task(self._lane_loop(target))
+        finally:
+            for t in workers.values():
+                t.cancel()
+
+    def _take_batch(self, lane):
+        """
+        Pop the lane head plus the forwards right behind it that can ride in the same message.
+        -> (action, [(params, echo, enqueue time)])
+        """
+        action, params, echo, t0 = lane.popleft()
+        items = [(params, echo, t0)]
+        if action in FORWARD_ACTIONS:
+            count = len(params.get("messages") or [])
+            while lane and lane[0][0] == action and count + len(lane[0][1].get("messages") or []) <= self._coalesce_max_nodes:
+                a, p, e, t = lane.popleft()
+                if e not in self._pending:
+                    continue
+                count += len(p.get("messages") or [])
+                items.append((p, e, t))
+        return action, items
+
+    def _batch_message(self, action, items):
+        """ -> (echo, params) of the message carrying items; several forwards become one merged forward. """
+        if len(items) == 1:
+            params, echo, _ = items[0]
+            return echo, params
+        echo = "bvm-m%d" % next(self._echo_seq)
+        self._merged[echo] = [e for _, e, _ in items]
+        for _, e, _ in items:
+            self._member_of[e] = echo
+        nodes = []
+        for p, _, _ in items:
+            nodes.extend(p.get("messages") or [])
+        return echo, dict(items[0][0], messages=nodes)
+
+    async def _lane_loop(self, target):
+        lane = self._lanes[target]
+        while lane and not self._stop_event.is_set():
+            # drop actions that already failed while waiting: do not send late
+            while lane and lane[0][2] not in self._pending:
+                lane.popleft()
+            if not lane:
+                break
+            if target is not None:
+                delay = self._pacer.reserve(target)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if lane and lane[0][0] in FORWARD_ACTIONS:
+                    hold = lane[0][3] + self._coalesce_window - time.monotonic()
+                    if hold > 0:
+                        await asyncio.sleep(hold)
+                while lane and lane[0][2] not in self._pending:
+                    lane.popleft()
+                if not lane:
+                    break
+            pinned = self._pinned.pop(lane[0][2], None)
+            action, items = self._take_batch(lane)
+            await self._send_batch(action, items, pinned)
+
+    async def _send_batch(self, action, items, pinned=None):
+        """
+        Send one (possibly merged) action, moving to the next healthy endpoint if the socket fails.
+        items: [(params, echo, enqueue time)] as returned by _take_batch.
+        """
+        tried = set()
+        while True:
+            try:
+                ep = await self._pick_endpoint(pinned)
+            except OneBotError as e:
+                self._fail_inflight([it[1] for it in items], str(e))
+                return
+            # waiting for an endpoint may have outlived some deadlines: those callers were told
+            # the action failed, so it must not go out now
+            items = [it for it in items if it[1] in self._pending]
+            if not items:
+                return
+            if ep.url in tried:
+                self._fail_inflight([it[1] for it in items], "send failed on every endpoint")
+                return
+            tried.add(ep.url)
+            echo, params = self._batch_message(action, items)
+            data = json.dumps({"action": action, "params": params, "echo": echo}, ensure_ascii=False)
+            try:
+                await ep.ws.send(data)
+                break
+            except Exception as e:
+                # the socket is gone: try the next endpoint instead of re-queueing at the back
+                # (which reordered messages); outbox entries are retried in order by _outbox_loop
+                self.log("send error (%s): %s" % (ep.url, e))
+                ep.healthy = False
+                ep.failures += 1
+                self._drop_merged(echo)  # the next attempt merges whatever is still live
+                if pinned is not None:
+                    self._fail_inflight([it[1] for it in items], "send failed: %s" % e)
+                    return
+        ep.inflight.add(echo)
+        if len(ep.inflight) > 1000:
+            ep.inflight = {e for e in ep.inflight if self._is_live(e)}
+        now = time.monotonic()
+        ep.sent += 1
+        with self._stats_lock:
+            self._counts["sent"] += 1
+            self._counts["coalesced"] += len(items) - 1
+            self._waits.extend(now - t for _, _, t in items)
+        if len(items) > 1:
+            self.debug("sent: %s %s (合并 %d 条) -> %s" % (action, brief(params), len(items), ep.url))
+        else:
+            self.debug("sent: %s %s -> %s" % (action, brief(params), ep.url))
+
+    async def _outbox_loop(self):
+        """ Run one delivery task per target with queued outbox entries. """
+        loop = asyncio.get_running_loop()
+        workers = {}
+        try:
+            while not self._stop_event.is_set():
+                self._outbox_event.clear()
+                for target in await loop.run_in_executor(None, self.outbox.targets):
+                    t = workers.get(target)
+                    if t is None or t.done():
+                        workers[target] = asyncio.create_task(self._outbox_target(target))
+                await self._outbox_event.wait()
+        finally:
+            for t in workers.values():
+                t.cancel()
+
+    def _outbox_unit(self, items):
+        """ The leading entries that go out as one message: a run of forwards the lane merges, or one entry. """
+        first = items[0]
+        n = 1
+        if first["action"] in FORWARD_ACTIONS:
+            count = len(first["params"].get("messages") or [])
+            for it in items[1:]:
+                count += len(it["params"].get("messages") or [])
+                if it["action"] != first["action"] or count > self._coalesce_max_nodes:
+                    break
+                n += 1
+        return items[:n]
+
+    async def _outbox_target(self, target):
+        """ Deliver the outbox entries of one target in order; each stays queued until acknowledged. """
+        loop = asyncio.get_running_loop()
+        backoff = 1
+        while not self._stop_event.is_set():
+            items = await loop.run_in_executor(None, self.outbox.peek_target, target, self.OUTBOX_BATCH)
+            if not items:
+                break
+            # one message at a time, so a later entry never reaches NapCat before an earlier one;
+            # a run of forwards is queued together so the send lane merges it into that message
+            unit = self._outbox_unit(items)
+            results = await asyncio.gather(*(self._request(it["action"], it["params"]) for it in unit),
+                                           return_exceptions=True)
+            failed = False
+            for it, res in zip(unit, results):
+                if not isinstance(res, Exception):
+                    await loop.run_in_executor(None, self.outbox.ack, it["seq"])
+                    continue
+                attempts = await loop.run_in_executor(None, self.outbox.retry, it["seq"])
+                if isinstance(res, OneBotError) and res.response is not None and attempts >= self.OUTBOX_MAX_ATTEMPTS:
+                    self.log("outbox #%d 被拒绝 %d 次，已丢弃: %s" % (it["seq"], attempts, res))
+                    await loop.run_in_executor(None, self.outbox.drop, it["seq"])
+                    continue
+                self.log("outbox #%d 发送失败（第 %d 次），%d 秒后重试: %s" % (it["seq"], attempts, backoff, res))
+                # the entries behind it stay queued even if they got through (the lane split the
+                # run): they go out again after it rather than being acked out of order
+                failed = True
+                break
+            if failed:
+                await asyncio.sleep(backoff)
+                backoff = min(self.OUTBOX_MAX_BACKOFF, backoff * 2)
+            else:
+                backoff = 1
+        # wake the dispatcher: entries may have arrived for this target after the last peek
+        self._outbox_event.set()
+
+    async def _recv_loop(self, ep):
         while not self._stop_event.is_set():
             try:
-                msg = await ws.recv()
-                self.log("recv: %s" % str(msg)[:400])
+                msg = await ep.ws.recv()
             except Exception as e:
-                self.log("recv error: %s" % e)
+                self.log("recv error (%s): %s" % (ep.url, e))
                 break
+            try:
+                data = json.loads(msg)
+            except Exception:
+                data = None
+            if isinstance(data, dict) and self._resolve(data):
+                continue
+            self.debug("recv: %s" % str(msg)[:400])
@@ -0,0 +1,206 @@
+# monitor/outbox.py
+import json
+import os
+import threading
+import time
+
+
+class Outbox:
+    """
+    Persistent, ordered outbox for OneBot actions (at-least-once delivery).
+
+    Each queued action is one file <folder>/<seq>.json, written atomically and fsync'd before
+    put() returns, so it survives disconnects, client restarts (saving the OneBot settings)
+    and process exits. Every entry may name a target (e.g. "group:<id>"); the client sends the
+    oldest entries of each target (peek_target) and only ack() deletes an entry once NapCat has
+    confirmed it. Entries are therefore delivered in order per target and at least once.
+
+    Optional dedup keys (e.g. "milestone:<BV>:1000000:group:<id>") are rejected while an
+    entry with the same key is queued, or once one was delivered (delivered.json keeps the
+    last DELIVERED_KEYS keys).
+
+    The outbox holds at most max_items entries. On overflow, "drop_oldest" discards the
+    oldest entry without a dedup key (keyed notifications are never dropped by overflow)
+    and "reject" refuses the new entry.
+    """
+
+    DELIVERED_NAME = "delivered.json"
+    DELIVERED_KEYS = 2000
+    OVERFLOW_POLICIES = ("drop_oldest", "reject")
+
+    def __init__(self, folder=".outbox", max_items=500, overflow="drop_oldest", on_log=None):
+        self.folder = folder
+        self.max_items = max(1, int(max_items))
+        self.overflow = overflow if overflow in self.OVERFLOW_POLICIES else "drop_oldest"
+        self.on_log = on_log or (lambda m: print("[Outbox]", m))
+        self.on_put = None  # callback (any thread) fired after a successful put()
+
+        self._lock = threading.Lock()
+        self._entries = []      # [{"seq", "key", "action", "target", "attempts"}] in send order
+        self._keys = set()      # keys of queued entries
+        self._delivered = []    # recently delivered keys, oldest first
+        self._seq = 0
+        self._load()
+
+    def log(self, msg):
+        try:
+            self.on_log("[Outbox] " + str(msg))
+        except Exception:
+            print("[Outbox]", msg)
+
+    # ------------------------------------------------------------------
+    # storage
+    def _path(self, seq):
+        return os.path.join(self.folder, "%012d.json" % seq)
+
+    def _load(self):
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            with open(os.path.join(self.folder, self.DELIVERED_NAME), "r", encoding="utf-8") as f:
+                d = json.load(f)
+            if isinstance(d, list):
+                self._delivered = [str(k) for k in d][-self.DELIVERED_KEYS:]
+        except Exception:
+            self._delivered = []
+
+        for name in sorted(os.listdir(self.folder)):
+            if not name.endswith(".json") or name == self.DELIVERED_NAME:
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    item = json.load(f)
+                seq = int(item["seq"])
+            except Exception:
+                # torn write from a crash: the put() never returned, so nobody relies on it
+                self.log("丢弃损坏的待发消息: %s" % name)
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
+                continue
+            self._entries.append({"seq": seq, "key": item.get("key"), "action": item.get("action"),
+                                  "target": item.get("target"), "attempts": 0})
+            if item.get("key"):
+                self._keys.add(item["key"])
+            self._seq = max(self._seq, seq + 1)
+        if self._entries:
+            self.log("恢复 %d 条待发送消息" % len(self._entries))
+
+    def _write(self, path, obj):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _remove_locked(self, entry):
+        self._entries.remove(entry)
+        if entry["key"]:
+            self._keys.discard(entry["key"])
+        try:
+            os.remove(self._path(entry["seq"]))
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    def put(self, action, params, key=None, target=None):
+        """ Queue an action durably. Returns (ok, reason); reason is "duplicate" / "full" on refusal. """
+        with self._lock:
+            if key and (key in self._keys or key in self._delivered):
+                return False, "duplicate"
+            if len(self._entries) >= self.max_items:
+                victim = None
+                if self.overflow == "drop_oldest":
+                    victim = next((e for e in self._entries if not e["key"]), None)
+                if victim is None:
+                    self.log("待发队列已满（%d），拒绝 %s" % (self.max_items, action))
+                    return False, "full"
+                self._remove_locked(victim)
+                self.log("待发队列已满，丢弃最早的消息 #%d (%s)" % (victim["seq"], victim["action"]))
+            seq = self._seq
+            self._seq += 1
+            self._write(self._path(seq), {"seq": seq, "key": key, "action": action, "target": target,
+                                          "params": params, "created": time.strftime("%Y-%m-%d %H:%M:%S")})
+            self._entries.append({"seq": seq, "key": key, "action": action, "target": target, "attempts": 0})
+            if key:
+                self._keys.add(key)
+        cb = self.on_put
+        if cb:
+            try:
+                cb()
+            except Exception:
+                pass
+        return True, "ok"
+
+    def _read(self, entry):
+        """ The stored entry with its params, or None (unreadable files are dropped). """
+        try:
+            with open(self._path(entry["seq"]), "r", encoding="utf-8") as f:
+                item = json.load(f)
+        except Exception as e:
+            self.log("读取待发消息 #%d 失败: %s" % (entry["seq"], e))
+            self.drop(entry["seq"])
+            return None
+        item["attempts"] = entry["attempts"]
+        return item
+
+    def peek(self):
+        """ Head entry with its params loaded from disk, or None. """
+        while True:
+            with self._lock:
+                if not self._entries:
+                    return None
+                entry = self._entries[0]
+            item = self._read(entry)
+            if item is not None:
+                return item
+
+    def targets(self):
+        """ Distinct targets with queued entries, oldest first. """
+        with self._lock:
+            return list(dict.fromkeys(e["target"] for e in self._entries))
+
+    def peek_target(self, target, limit=1):
+        """ Up to limit oldest entries of target, params loaded from disk. """
+        with self._lock:
+            entries = [e for e in self._entries if e["target"] == target][:limit]
+        return [item for item in (self._read(e) for e in entries) if item is not None]
+
+    def _find_locked(self, seq):
+        return next((e for e in self._entries if e["seq"] == seq), None)
+
+    def ack(self, seq):
+        """ NapCat confirmed entry seq: delete it and remember its dedup key. """
+        with self._lock:
+            entry = self._find_locked(seq)
+            if entry is None:
+                return
+            self._remove_locked(entry)
+            if entry["key"]:
+                self._delivered.append(entry["key"])
+                del self._delivered[:-self.DELIVERED_KEYS]
+                try:
+                    self._write(os.path.join(self.folder, self.DELIVERED_NAME), self._delivered)
+                except Exception as e:
+                    self.log("保存已送达记录失败: %s" % e)
+
+    def retry(self, seq):
+        """ Count a failed attempt; returns the attempt count so far. """
+        with self._lock:
+            entry = self._find_locked(seq)
+            if entry is None:
+                return 0
+            entry["attempts"] += 1
+            return entry["attempts"]
+
+    def drop(self, seq):
+        with self._lock:
+            entry = self._find_locked(seq)
+            if entry is not None:
+                self._remove_locked(entry)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
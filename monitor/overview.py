@@ -0,0 +1,206 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+
+
+class OverviewTable:
+    """
+    One table for every monitored BV, on a virtualized ttk.Treeview: the tree only holds as
+    many item rows as fit on screen, and scrolling re-fills those rows from the model instead of
+    moving thousands of items. sync() rebuilds only the rows whose BVMonitor.version changed
+    and rewrites only the visible items whose values differ.
+    """
+
+    COLUMNS = (
+        # id, heading, width, anchor
+        ("bv", "BV", 120, tk.W),
+        ("title", "标题", 260, tk.W),
+        ("view", "播放数", 90, tk.E),
+        ("inc", "增量", 70, tk.E),
+        ("avg", "平均增量", 80, tk.E),
+        ("eta", "预计耗时", 140, tk.W),
+        ("date", "预计日期", 140, tk.W),
+        ("interval", "间隔(秒)", 70, tk.E),
+        ("state", "状态", 60, tk.CENTER),
+    )
+    ROW_HEIGHT = 20
+
+    def __init__(self, parent, on_open=None):
+        self.parent = parent
+        self.on_open = on_open  # callback(bv) on double click
+
+        self._rows = {}       # bv -> (display values, sort keys)
+        self._versions = {}   # bv -> BVMonitor.version shown
+        self._order = []      # bvs in display order
+        self._order_dirty = False
+        self._sort_col = None
+        self._sort_reverse = False
+        self._offset = 0
+        self._rendered_offset = 0
+        self._slots = []      # item ids of the visible rows
+        self._shown = {}      # item id -> values currently in the tree
+
+        self.frame = ttk.Frame(parent)
+        self.frame.pack(fill=tk.BOTH, expand=True)
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(self.frame, textvariable=self.summary_var).pack(fill=tk.X, padx=4, pady=(4, 2))
+
+        body = ttk.Frame(self.frame)
+        body.pack(fill=tk.BOTH, expand=True)
+        ids = [c[0] for c in self.COLUMNS]
+        self.tree = ttk.Treeview(body, columns=ids, show="headings", selectmode="browse", height=1)
+        for cid, text, width, anchor in self.COLUMNS:
+            self.tree.heading(cid, text=text, command=lambda c=cid: self.sort_by(c))
+            self.tree.column(cid, width=width, anchor=anchor, stretch=(cid == "title"))
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Double-1>", self._on_double)
+
+    # ------------------------------------------------------------------
+    # model
+    @staticmethod
+    def _row(core):
+        with core._lock:
+            last = core.data[-1] if core.data else None
+        last = last or {}
+        eta = core._last_eta
+        view = last.get("view")
+        inc = last.get("view_increment")
+        avg = last.get("avg_increment_per_interval")
+        interval = core.get_interval()
+        state = "运行" if core.is_monitoring else "停止"
+        values = (core.bv, core.title(), "-" if view is None else view, "-" if inc is None else inc,
+                  "-" if avg is None else avg, last.get("estimated_time", "-"), last.get("estimated_date", "-"),
+                  interval, state)
+
+        def num(v):
+            try:
+                f = float(v)
+                return f if not math.isnan(f) else -math.inf
+            except (TypeError, ValueError):
+                return -math.inf
+
+        keys = {"bv": core.bv, "title": values[1], "view": num(view), "inc": num(inc), "avg": num(avg),
+                "eta": eta if eta is not None else math.inf, "date": str(values[6]),
+                "interval": interval, "state": state}
+        return tuple(str(v) for v in values), keys
+
+    def sync(self, monitors):
+        """ Bring the table up to date with {bv: BVMonitor}; only changed monitors are read. """
+        changed = 0
+        for bv in [b for b in self._rows if b not in monitors]:
+            del self._rows[bv]
+            self._versions.pop(bv, None)
+            self._order_dirty = True
+        for bv, core in list(monitors.items()):
+            version = core.version
+            if self._versions.get(bv) == version and bv in self._rows:
+                continue
+            self._versions[bv] = version
+            new = self._row(core)
+            old = self._rows.get(bv)
+            self._rows[bv] = new
+            changed += 1
+            if old is None or (self._sort_col and old[1][self._sort_col] != new[1][self._sort_col]):
+                self._order_dirty = True
+        if self._order_dirty:
+            self._resort()
+        self._render()
+        running = sum(1 for r in self._rows.values() if r[1]["state"] == "运行")
+        self.summary_var.set("共 %d 个 BV，运行中 %d" % (len(self._rows), running))
+        return changed
+
+    def sort_by(self, column):
+        if self._sort_col == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_col, self._sort_reverse = column, column in ("view", "inc", "avg")
+        for cid, text, _, _ in self.COLUMNS:
+            mark = (" ▼" if self._sort_reverse else " ▲") if cid == column else ""
+            self.tree.heading(cid, text=text + mark)
+        self._resort()
+        self._render()
+
+    def _resort(self):
+        if self._sort_col is None:
+            order = list(self._rows)   # insertion order: the order BVs were added
+        else:
+            col = self._sort_col
+            order = sorted(self._rows, key=lambda bv: self._rows[bv][1][col], reverse=self._sort_reverse)
+        self._order = order
+        self._order_dirty = False
+
+    # ------------------------------------------------------------------
+    # virtual viewport
+    def _visible_count(self):
+        return len(self._slots)
+
+    def _row_height(self):
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight")) or self.ROW_HEIGHT
+        except (tk.TclError, ValueError):
+            return self.ROW_HEIGHT
+
+    def _on_resize(self, event=None):
+        # item rows for the height the tree got, less one row for the headings
+        row_height = self._row_height()
+        rows = max(1, int(self.tree.winfo_height() / row_height) - 1)
+        if rows == len(self._slots):
+            return
+        while len(self._slots) < rows:
+            self._slots.append(self.tree.insert("", tk.END, values=()))
+        while len(self._slots) > rows:
+            iid = self._slots.pop()
+            self.tree.delete(iid)
+            self._shown.pop(iid, None)
+        self._render()
+
+    def scroll(self, rows):
+        self._offset += rows
+        self._render()
+
+    def _unselect(self):
+        # the selection belongs to an item slot, not a BV: drop it when the rows shift
+        self.tree.selection_remove(self.tree.selection())
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        total, n = len(self._order), self._visible_count()
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = int(args[1]) * (n if args[2] == "pages" else 1)
+            self._offset += step
+        self._render()
+
+    def _render(self):
+        total, n = len(self._order), self._visible_count()
+        offset = max(0, min(self._offset, total - n))
+        if offset != self._rendered_offset:
+            self._unselect()
+        self._offset = self._rendered_offset = offset
+        for i, iid in enumerate(self._slots):
+            idx = self._offset + i
+            values = self._rows[self._order[idx]][0] if idx < total else ()
+            if self._shown.get(iid) != values:
+                self.tree.item(iid, values=values)
+                self._shown[iid] = values
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + n) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_double(self, event):
+        iid = self.tree.identify_row(event.y)
+        values = self._shown.get(iid)
+        if values and self.on_open:
+            self.on_open(values[0])
@@ -0,0 +1,199 @@
+# monitor/push.py
+"""
+Shared building blocks for OneBot pushes (manual push, milestone / sprint notices, 全部推送).
+
+Images are encoded once: encode_image() memoizes the "base64://..." string per file and
+revalidates it by size + mtime, so pushing the same cover to several targets (or pushing 300
+BVs at once) reads and encodes each file a single time. Nodes are built once and the same
+list is handed to every target.
+
+build_nodes() keeps a whole forward message under a byte budget: every image comes with a
+list of candidate files (push-size, then thumbnail), and while the message is too large the
+biggest image is swapped for its next smaller candidate, or dropped when none is left.
+"""
+import base64
+import os
+import threading
+from collections import OrderedDict
+
+NODE_NAME = "监控器"
+
+_lock = threading.Lock()
+_encoded = OrderedDict()  # path -> (size, mtime_ns, "base64://...")
+MAX_ENCODED = 512
+
+WAIT_TIMEOUT = 60  # upper bound for send_nodes(wait=True); the client expires actions earlier
+MESSAGE_BUDGET_KB = 4096  # default total size of one forward message (base64 images + text)
+
+
+def normalize_targets(x):
+    """ "1, 2" / [1, "2"] / 3 / None -> [1, 2] / [1, 2] / [3] / [] """
+    if x is None:
+        return []
+    if isinstance(x, (list, tuple)):
+        out = []
+        for i in x:
+            try:
+                if str(i).strip():
+                    out.append(int(i))
+            except Exception:
+                continue
+        return out
+    s = str(x).strip()
+    if not s:
+        return []
+    out = []
+    for p in (p.strip() for p in s.split(",")):
+        if not p:
+            continue
+        try:
+            out.append(int(p))
+        except Exception:
+            continue
+    return out
+
+
+def push_targets(cfg):
+    """ -> (group_ids, user_ids) from the OneBot config (plural keys win over the legacy ones) """
+    group_ids = cfg.get("onebot_group_ids") or cfg.get("onebot_group_id") or []
+    user_ids = cfg.get("onebot_user_ids") or cfg.get("onebot_user_id") or []
+    return normalize_targets(group_ids), normalize_targets(user_ids)
+
+
+def bot_uin(cfg):
+    return str(cfg.get("onebot_bot_qq") or cfg.get("bot_qq") or 0)
+
+
+def encode_image(path):
+    """ "base64://..." for the file at path, memoized until its size or mtime changes. """
+    st = os.stat(path)
+    key = (st.st_size, st.st_mtime_ns)
+    with _lock:
+        hit = _encoded.get(path)
+        if hit and hit[:2] == key:
+            _encoded.move_to_end(path)
+            return hit[2]
+    with open(path, "rb") as f:
+        data = "base64://" + base64.b64encode(f.read()).decode()
+    with _lock:
+        _encoded[path] = key + (data,)
+        _encoded.move_to_end(path)
+        while len(_encoded) > MAX_ENCODED:
+            _encoded.popitem(last=False)
+    return data
+
+
+def _encoded_size(path):
+    """ Length of the base64:// string encode_image(path) would return. """
+    return len("base64://") + (os.path.getsize(path) + 2) // 3 * 4
+
+
+def build_node(uin, text, image_path=None, on_log=None):
+    """ One forward node: a text segment plus the image at image_path when it exists. """
+    content = [{"type": "text", "data": {"text": text}}]
+    if image_path and os.path.exists(image_path):
+        try:
+            content.append({"type": "image", "data": {"file": encode_image(image_path)}})
+        except Exception as e:
+            if on_log:
+                on_log("读取封面失败: %s" % e)
+    return {"type": "node", "data": {"name": NODE_NAME, "uin": uin, "content": content}}
+
+
+def build_nodes(uin, items, budget_kb=MESSAGE_BUDGET_KB, on_log=None):
+    """
+    items: [(text, candidates)], candidates = image paths from preferred to smallest
+    (a single path or None is fine too). Returns the node list, with images downsized or
+    dropped as needed so the whole message stays within budget_kb.
+    """
+    entries = []
+    for text, cands in items:
+        if isinstance(cands, str):
+            cands = [cands]
+        cands = [c for c in (cands or []) if c and os.path.exists(c)]
+        sizes = []
+        for c in cands:
+            try:
+                sizes.append(_encoded_size(c))
+            except OSError:
+                sizes.append(None)
+        opts = [(c, n) for c, n in zip(cands, sizes) if n is not None]
+        entries.append({"text": text, "opts": opts, "level": 0})
+
+    budget = int(budget_kb * 1024) if budget_kb else 0
+    if budget > 0:
+        def cur(e):
+            return e["opts"][e["level"]][1] if e["level"] < len(e["opts"]) else 0
+        total = sum(len(e["text"].encode("utf-8")) + cur(e) for e in entries)
+        downsized = dropped = 0
+        while total > budget:
+            e = max(entries, key=cur)
+            if cur(e) == 0:
+                break
+            before = cur(e)
+            e["level"] += 1
+            total -= before - cur(e)
+            if e["level"] >= len(e["opts"]):
+                dropped += 1
+                if e["level"] > 1:
+                    downsized -= 1
+            elif e["level"] == 1:
+                downsized += 1
+        if (downsized or dropped) and on_log:
+            on_log("推送超出 %d KB 预算：%d 张封面已缩小，%d 张已省略" % (budget_kb, downsized, dropped))
+
+    nodes = []
+    for e in entries:
+        path = e["opts"][e["level"]][0] if e["level"] < len(e["opts"]) else None
+        nodes.append(build_node(uin, e["text"], path, on_log=on_log))
+    return nodes
+
+
+def budget_kb(cfg):
+    """ Per-message size budget from the config (push_message_budget_kb, 0 = unlimited). """
+    try:
+        return float(cfg.get("push_message_budget_kb", MESSAGE_BUDGET_KB))
+    except Exception:
+        return MESSAGE_BUDGET_KB
+
+
+def send_nodes(client, group_ids, user_ids, nodes, on_log=None, wait=False, key=None):
+    """
+    Send the same forward node list to every target.
+    wait=False: returns True if any send was enqueued (safe on an event loop thread). key is an
+    optional dedup key for the client's outbox, made unique per target ("<key>:group:<id>").
+    wait=True: all targets are sent concurrently and the call blocks until NapCat answered
+    each one; returns True if any was accepted. Failures are logged per target.
+    """
+    if not wait or not hasattr(client, "send_group_forward_async"):
+        sent_any = False
+        for gid in group_ids:
+            try:
+                k = "%s:group:%s" % (key, gid) if key else None
+                sent_any = bool(client.send_group_forward(int(gid), nodes, key=k)) or sent_any
+            except Exception as e:
+                if on_log:
+                    on_log("发送 group forward 失败: %s" % e)
+        for uid in user_ids:
+            try:
+                k = "%s:private:%s" % (key, uid) if key else None
+                sent_any = bool(client.send_private_forward(int(uid), nodes, key=k)) or sent_any
+            except Exception as e:
+                if on_log:
+                    on_log("发送 private forward 失败: %s" % e)
+        return sent_any
+
+    futures = []
+    for gid in group_ids:
+        futures.append(("group %s" % gid, client.send_group_forward_async(int(gid), nodes)))
+    for uid in user_ids:
+        futures.append(("private %s" % uid, client.send_private_forward_async(int(uid), nodes)))
+    delivered = False
+    for target, fut in futures:
+        try:
+            fut.result(WAIT_TIMEOUT)
+            delivered = True
+        except Exception as e:
+            if on_log:
+                on_log("推送到 %s 失败: %s" % (target, e))
+    return delivered
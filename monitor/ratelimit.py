@@ -0,0 +1,232 @@
+# monitor/ratelimit.py
+import asyncio
+import re
+import threading
+import time
+
+
+RISK_CONTROL_CODES = (-352, -412, 412)
+_RISK_RE = re.compile(r"(?<![\d-])(-352|-412|412)(?!\d)")
+
+
+def is_risk_control(exc):
+    """ True when exc looks like bilibili risk control (HTTP 412 / code -352 / -412). """
+    for attr in ("code", "status", "status_code"):
+        try:
+            if int(getattr(exc, attr)) in RISK_CONTROL_CODES:
+                return True
+        except Exception:
+            pass
+    return bool(_RISK_RE.search(str(exc)))
+
+
+class RateLimiter:
+    """
+    Process-wide token bucket for bilibili API requests.
+
+    `rate` tokens per second are added up to `burst`. acquire() reserves a token and sleeps
+    until it is due, so waiters are served in arrival order and nobody polls. The limiter keeps
+    its state behind a plain lock and measures time with time.monotonic(), so it can be shared
+    by coroutines on any loop.
+
+    When a request hits risk control, penalize() halves the rate and pushes every reservation
+    made after it back by a cooldown (doubling on repeated hits); waiters already sleeping
+    keep the slot they reserved. After RECOVER_AFTER quiet seconds each successful request
+    raises the rate again by RECOVER_STEP of the base rate. Monitors therefore sample less
+    often for a while instead of all failing together.
+    """
+
+    DEFAULT_RATE = 1.0        # requests / second
+    DEFAULT_BURST = 5
+    MIN_RATE = 0.05
+    BACKOFF_FACTOR = 0.5
+    COOLDOWN = 30.0           # seconds, first penalty
+    MAX_COOLDOWN = 600.0
+    PENALTY_GRACE = 5.0       # further hits within this window count as the same event
+    RECOVER_AFTER = 60.0      # seconds without penalty before the rate starts recovering
+    RECOVER_STEP = 0.1        # fraction of the base rate regained per successful request
+
+    def __init__(self, rate=None, burst=None, on_log=None):
+        self.on_log = on_log or (lambda m: print("[RateLimit]", m))
+        self._lock = threading.Lock()
+        self._base_rate = self.DEFAULT_RATE
+        self._rate = self.DEFAULT_RATE
+        self._burst = self.DEFAULT_BURST
+        self._tokens = float(self._burst)
+        self._stamp = time.monotonic()
+        self._cooldown = self.COOLDOWN
+        self._last_penalty = None
+
+        self._waiting = 0
+        self._max_waiting = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._penalties = 0
+        self.configure(rate, burst)
+
+    def log(self, msg):
+        try:
+            self.on_log("[RateLimit] " + str(msg))
+        except Exception:
+            print("[RateLimit]", msg)
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            self._refill_locked(time.monotonic())
+            if rate is not None:
+                rate = max(self.MIN_RATE, float(rate))
+                self._base_rate = rate
+                self._rate = min(self._rate, rate) if self._last_penalty is not None else rate
+            if burst is not None:
+                self._burst = max(1, int(burst))
+                self._tokens = min(self._tokens, float(self._burst))
+
+    def _refill_locked(self, now):
+        self._tokens = min(float(self._burst), self._tokens + (now - self._stamp) * self._rate)
+        self._stamp = now
+
+    # ------------------------------------------------------------------
+    def _reserve(self):
+        """ Take one token (possibly going into debt); returns the seconds until it is due. """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self._tokens -= 1.0
+            delay = 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+            self._acquired += 1
+            self._total_wait += delay
+            self._max_wait = max(self._max_wait, delay)
+            if delay > 0:
+                self._waiting += 1
+                self._max_waiting = max(self._max_waiting, self._waiting)
+            return delay
+
+    async def acquire(self):
+        """ Wait for a request slot. Returns the time spent waiting (seconds). """
+        delay = self._reserve()
+        if delay <= 0:
+            return 0.0
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        return delay
+
+    def penalize(self, reason=""):
+        """ A request hit risk control: slow everybody down. """
+        with self._lock:
+            now = time.monotonic()
+            self._penalties += 1
+            # requests already in flight when the first one failed report the same event
+            if self._last_penalty is not None and now - self._last_penalty < self.PENALTY_GRACE:
+                return
+            self._refill_locked(now)
+            self._rate = max(self.MIN_RATE, self._rate * self.BACKOFF_FACTOR)
+            if self._last_penalty is not None and now - self._last_penalty < self.RECOVER_AFTER + self._cooldown:
+                self._cooldown = min(self.MAX_COOLDOWN, self._cooldown * 2)
+            else:
+                self._cooldown = self.COOLDOWN
+            # push every future reservation back by the cooldown
+            self._tokens = min(self._tokens, 0.0) - self._cooldown * self._rate
+            self._last_penalty = now
+            rate, cooldown = self._rate, self._cooldown
+        self.log("触发风控%s，请求速率降至 %.2f/s，暂停 %.0f 秒" % (
+            ("（%s）" % reason) if reason else "", rate, cooldown))
+
+    def success(self):
+        """ A request went through: recover the rate once the last penalty is old enough. """
+        with self._lock:
+            if self._last_penalty is None or self._rate >= self._base_rate:
+                return
+            now = time.monotonic()
+            if now - self._last_penalty < self.RECOVER_AFTER:
+                return
+            self._refill_locked(now)
+            self._rate = min(self._base_rate, self._rate + self._base_rate * self.RECOVER_STEP)
+            if self._rate >= self._base_rate:
+                self._last_penalty = None
+                self._cooldown = self.COOLDOWN
+
+    def stats(self):
+        with self._lock:
+            self._refill_locked(time.monotonic())
+            n = self._acquired
+            return {
+                "rate": self._rate,
+                "base_rate": self._base_rate,
+                "burst": self._burst,
+                "tokens": self._tokens,
+                "waiting": self._waiting,
+                "max_waiting": self._max_waiting,
+                "acquired": n,
+                "avg_wait": (self._total_wait / n) if n else 0.0,
+                "max_wait": self._max_wait,
+                "penalties": self._penalties,
+            }
+
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key, e.g. per QQ group / user for OneBot sends.
+
+    reserve(key) takes a token from that key's bucket and returns the seconds until it is due,
+    so one busy key is paced without holding up the others. Buckets refill at `rate` tokens per
+    second up to `burst`; full buckets idle for IDLE_TTL seconds are forgotten.
+    """
+
+    IDLE_TTL = 600.0
+
+    def __init__(self, rate=1 / 3.0, burst=3):
+        self._lock = threading.Lock()
+        self._rate = self._burst = None
+        self._buckets = {}  # key -> [tokens, stamp]
+        self._reserved = 0
+        self._delayed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            if rate is not None:
+                self._rate = max(0.001, float(rate))
+            if burst is not None:
+                self._burst = max(1, int(burst))
+
+    def reserve(self, key):
+        with self._lock:
+            now = time.monotonic()
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [float(self._burst), now]
+            b[0] = min(float(self._burst), b[0] + (now - b[1]) * self._rate) - 1.0
+            b[1] = now
+            delay = 0.0 if b[0] >= 0 else -b[0] / self._rate
+            self._reserved += 1
+            if delay > 0:
+                self._delayed += 1
+                self._total_wait += delay
+                self._max_wait = max(self._max_wait, delay)
+            if len(self._buckets) > 64:
+                self._forget_idle_locked(now)
+            return delay
+
+    def _forget_idle_locked(self, now):
+        for k in [k for k, (tokens, stamp) in self._buckets.items()
+                  if now - stamp > self.IDLE_TTL and tokens + (now - stamp) * self._rate >= self._burst]:
+            del self._buckets[k]
+
+    def stats(self):
+        with self._lock:
+            n = self._reserved
+            return {
+                "rate": self._rate,
+                "burst": self._burst,
+                "keys": len(self._buckets),
+                "reserved": n,
+                "delayed": self._delayed,
+                "avg_wait": (self._total_wait / n) if n else 0.0,
+                "max_wait": self._max_wait,
+            }
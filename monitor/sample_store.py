@@ -0,0 +1,307 @@
+# monitor/sample_store.py
+import threading
+import numpy as np
+
+TIME_FMT_LEN = len("2024-01-01 00:00:00")
+
+# column kinds
+INT, FLOAT, TEXT, TIME = "int", "float", "text", "time"
+
+# sentinels meaning "this record has no such key"
+MISSING_INT = np.iinfo(np.int64).min
+MISSING_TIME = np.iinfo(np.int64).min
+# TIME columns hold epoch seconds; strings that are not "%Y-%m-%d %H:%M:%S" timestamps
+# (e.g. "数据不足" in estimated_date) are interned and stored as TEXT_BASE + code
+TEXT_BASE = -(1 << 62)
+
+_ABSENT = object()
+
+
+class SampleStore:
+    """
+    Compact columnar store for the samples of one BV.
+
+    Each field of the classic sample dict lives in a typed numpy column (epoch seconds for
+    timestamps, int64 for counters, float64 for averages, interned codes for the short
+    status strings), so a sample costs ~100 bytes instead of a dict of boxed objects.
+    Appending is amortized O(1); window() returns numpy views for charts and estimation.
+
+    For existing callers the store behaves like the old list of dicts: len(), truthiness,
+    store[-1] / store[i] / store[a:b] and iteration yield plain dicts built on demand, with
+    exactly the keys the original record had. Keys outside FIELDS and values that do not fit
+    their column are kept verbatim in a sparse side table.
+    """
+
+    FIELDS = (
+        ("time", TIME),
+        ("view", INT),
+        ("like", INT),
+        ("coin", INT),
+        ("reply", INT),
+        ("share", INT),
+        ("danmaku", INT),
+        ("favorite", INT),
+        ("view_increment", INT),
+        ("avg_increment_per_interval", FLOAT),
+        ("estimated_time", TEXT),
+        ("estimated_date", TIME),
+        ("sample_count", INT),
+        ("scheduled_time", TIME),
+        ("inc_per_second", FLOAT),
+    )
+
+    def __init__(self, records=None, capacity=64):
+        self._lock = threading.RLock()
+        self._kinds = dict(self.FIELDS)
+        self._names = [k for k, _ in self.FIELDS]
+        self._n = 0
+        self._cols = {k: self._empty(kind, capacity) for k, kind in self.FIELDS}
+        self._texts = []       # interned strings shared by all TEXT / TIME columns
+        self._text_codes = {}
+        self._extras = {}      # row -> {key: raw value} for keys / values outside the columns
+        self._order = {}       # row -> key order when it differs from FIELDS order
+        if records:
+            self.extend(records)
+
+    @staticmethod
+    def _empty(kind, capacity):
+        if kind == FLOAT:
+            return np.empty(capacity, dtype=np.float64)
+        if kind == TEXT:
+            return np.empty(capacity, dtype=np.int32)
+        return np.empty(capacity, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # encoding
+    def _intern(self, s):
+        code = self._text_codes.get(s)
+        if code is None:
+            code = len(self._texts)
+            self._texts.append(s)
+            self._text_codes[s] = code
+        return code
+
+    @staticmethod
+    def _format_time(v):
+        return str(np.datetime64(int(v), "s")).replace("T", " ")
+
+    def _encode(self, kind, v):
+        """ -> (column value, fits) ; fits=False means the raw value goes to the side table """
+        if kind == INT:
+            if type(v) is int or isinstance(v, np.integer):
+                return int(v), True
+            if isinstance(v, float) and v.is_integer():
+                return int(v), False
+            return MISSING_INT, False
+        if kind == FLOAT:
+            if isinstance(v, (float, int, np.floating, np.integer)) and not isinstance(v, bool):
+                f = float(v)
+                return f, f == f
+            return np.nan, False
+        if kind == TEXT:
+            if isinstance(v, str):
+                return self._intern(v), True
+            return -1, False
+        # TIME
+        if isinstance(v, str):
+            if len(v) == TIME_FMT_LEN:
+                try:
+                    secs = int(np.datetime64(v, "s").astype(np.int64))
+                    if self._format_time(secs) == v:
+                        return secs, True
+                except Exception:
+                    pass
+            return TEXT_BASE + self._intern(v), True
+        return MISSING_TIME, False
+
+    def _decode(self, kind, raw):
+        if kind == INT:
+            return None if raw == MISSING_INT else int(raw)
+        if kind == FLOAT:
+            return None if raw != raw else float(raw)
+        if kind == TEXT:
+            return None if raw < 0 else self._texts[raw]
+        if raw == MISSING_TIME:
+            return None
+        if raw < TEXT_BASE + (1 << 61):
+            return self._texts[int(raw - TEXT_BASE)]
+        return self._format_time(raw)
+
+    # ------------------------------------------------------------------
+    # list-of-dicts compatibility
+    def __len__(self):
+        return self._n
+
+    def _grow(self, need):
+        cap = len(self._cols[self._names[0]])
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for k, col in self._cols.items():
+            grown = np.empty(new_cap, dtype=col.dtype)
+            grown[:self._n] = col[:self._n]
+            self._cols[k] = grown
+
+    def append(self, rec):
+        self.extend((rec,))
+
+    def extend(self, records):
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            base, m = self._n, len(records)
+            self._grow(base + m)
+            for k, kind in self.FIELDS:
+                self._cols[k][base:base + m] = self._encode_column(k, kind, records, base)
+            names = self._names
+            for j, rec in enumerate(records):
+                keys = list(rec)
+                if keys == names:
+                    continue
+                unknown = {k: rec[k] for k in keys if k not in self._kinds}
+                if unknown:
+                    self._extras.setdefault(base + j, {}).update(unknown)
+                if keys != [k for k in names if k in rec]:
+                    self._order[base + j] = keys
+            self._n = base + m
+
+    def _encode_column(self, k, kind, records, base):
+        absent = self._encode(kind, None)[0]
+        vals = [rec.get(k, _ABSENT) for rec in records]
+
+        # vectorized fast paths for the common, well-typed case
+        if kind == INT and all(type(v) is int for v in vals):
+            return np.array(vals, dtype=np.int64)
+        if kind == FLOAT and all(isinstance(v, (float, int)) and not isinstance(v, bool) for v in vals):
+            arr = np.array(vals, dtype=np.float64)
+            if not np.isnan(arr).any():
+                return arr
+        if kind == TEXT and all(type(v) is str for v in vals):
+            return np.array([self._intern(v) for v in vals], dtype=np.int32)
+
+        out = self._empty(kind, len(vals))
+        done = np.zeros(len(vals), dtype=bool)
+        if kind == TIME:
+            # parse every well-formed timestamp in one go; the rest (status strings) go one by one
+            idx = [j for j, v in enumerate(vals) if type(v) is str and len(v) == TIME_FMT_LEN]
+            if idx:
+                try:
+                    strs = [vals[j] for j in idx]
+                    arr = np.array(strs, dtype="datetime64[s]")
+                    ok = np.datetime_as_string(arr) == np.array([v.replace(" ", "T") for v in strs])
+                    idx = np.array(idx)
+                    out[idx[ok]] = arr[ok].astype(np.int64)
+                    done[idx[ok]] = True
+                except Exception:
+                    pass
+            if done.all():
+                return out
+
+        for j, v in enumerate(vals):
+            if done[j]:
+                continue
+            if v is _ABSENT:
+                out[j] = absent
+                continue
+            enc, fits = self._encode(kind, v)
+            out[j] = enc
+            if not fits:
+                self._extras.setdefault(base + j, {})[k] = v
+        return out
+
+    def pop(self):
+        with self._lock:
+            if not self._n:
+                raise IndexError("pop from empty SampleStore")
+            rec = self._record(self._n - 1)
+            self._n -= 1
+            self._extras.pop(self._n, None)
+            self._order.pop(self._n, None)
+            return rec
+
+    def _record(self, i):
+        extras = self._extras.get(i)
+        rec = {}
+        for k, kind in self.FIELDS:
+            if extras and k in extras:
+                rec[k] = extras[k]
+                continue
+            v = self._decode(kind, self._cols[k][i])
+            if v is not None:
+                rec[k] = v
+        if extras:
+            for k, v in extras.items():
+                if k not in rec:
+                    rec[k] = v
+        order = self._order.get(i)
+        if order:
+            rec = {k: rec[k] for k in order if k in rec}
+        return rec
+
+    def __getitem__(self, i):
+        with self._lock:
+            if isinstance(i, slice):
+                return [self._record(j) for j in range(*i.indices(self._n))]
+            if i < 0:
+                i += self._n
+            if not 0 <= i < self._n:
+                raise IndexError("SampleStore index out of range")
+            return self._record(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_records(self):
+        with self._lock:
+            return [self._record(i) for i in range(self._n)]
+
+    # ------------------------------------------------------------------
+    # columnar access
+    def snapshot(self):
+        """ Frozen copy (a memcpy of the columns) that other threads can iterate freely. """
+        with self._lock:
+            snap = SampleStore.__new__(SampleStore)
+            snap._lock = threading.RLock()
+            snap._kinds = self._kinds
+            snap._names = self._names
+            snap._n = self._n
+            snap._cols = {k: col[:self._n].copy() for k, col in self._cols.items()}
+            # interned strings are append-only, so sharing the table is safe
+            snap._texts = self._texts
+            snap._text_codes = self._text_codes
+            snap._extras = dict(self._extras)
+            snap._order = dict(self._order)
+            return snap
+
+    def column(self, name, start=None, stop=None):
+        """ Raw numpy view of one column (epoch seconds for timestamps). Do not modify. """
+        with self._lock:
+            return self._cols[name][:self._n][start:stop]
+
+    def window(self, n, fields):
+        """ Last n values of each numeric field as numpy arrays (missing values -> 0). """
+        with self._lock:
+            out = {}
+            start = max(0, self._n - int(n))
+            for k in fields:
+                col = self._cols[k][start:self._n]
+                kind = self._kinds[k]
+                if kind == INT:
+                    col = np.where(col == MISSING_INT, 0, col)
+                elif kind == FLOAT:
+                    col = np.nan_to_num(col)
+                else:
+                    col = col.copy()
+                out[k] = col
+            return out
+
+    def time_seconds(self):
+        """ Epoch seconds of every sample (float, NaN where the time is not a timestamp). """
+        with self._lock:
+            t = self._cols["time"][:self._n]
+            return np.where(t > TEXT_BASE + (1 << 61), t, np.nan).astype(np.float64)
+
+    def nbytes(self):
+        return sum(col.nbytes for col in self._cols.values())
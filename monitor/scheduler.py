@@ -0,0 +1,151 @@
+# monitor/scheduler.py
+import threading
+
+
+class PollingScheduler:
+    """
+    Splits a global request budget (requests per minute) between the running monitors.
+
+    Every monitor reports its predicted time-to-target after each sample. The interval it
+    would like is eta / SAMPLES_TO_TARGET, clamped to [min_interval, max_interval]. A video
+    about to reach its milestone therefore asks for a few seconds, while a stalled one drops
+    to max_interval. Monitors without a usable prediction use the global interval, and a
+    per-tab local interval is honoured as-is.
+
+    When the combined demand exceeds the budget, every monitor keeps at least one request
+    per max_interval. The rest of the budget goes to the monitors in order of urgency
+    (shortest wanted interval first), so the videos closest to a milestone are the last to
+    be stretched.
+
+    Each monitor is told its interval through monitor.on_scheduled_interval(seconds). A
+    monitor whose interval dropped noticeably is also woken so the change applies now.
+    """
+
+    SAMPLES_TO_TARGET = 60     # samples we would like to take before the milestone is reached
+    SPRINT_REMAINING = 500     # views left at which the old fixed sprint interval kicks in
+    SPRINT_INTERVAL = 10
+    WAKE_RATIO = 0.7           # wake a monitor when its interval shrinks below this fraction
+
+    def __init__(self, budget_rpm=40, min_interval=5, max_interval=600, get_default_interval=None,
+                 on_log=None):
+        self.on_log = on_log or (lambda m: print("[Scheduler]", m))
+        self.budget_rpm = float(budget_rpm)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.get_default_interval = get_default_interval or (lambda: 75)
+        self._lock = threading.Lock()
+        self._entries = {}  # monitor -> {"eta", "remaining", "fixed", "interval"}
+
+    def log(self, msg):
+        try:
+            self.on_log("[Scheduler] " + str(msg))
+        except Exception:
+            print("[Scheduler]", msg)
+
+    def configure(self, budget_rpm=None, min_interval=None, max_interval=None):
+        with self._lock:
+            if budget_rpm is not None:
+                self.budget_rpm = max(1.0, float(budget_rpm))
+            if min_interval is not None:
+                self.min_interval = max(1.0, float(min_interval))
+            if max_interval is not None:
+                self.max_interval = max(self.min_interval, float(max_interval))
+        self.rebalance()
+
+    # ------------------------------------------------------------------
+    def register(self, monitor):
+        with self._lock:
+            self._entries.setdefault(monitor, {"eta": None, "remaining": None, "fixed": None, "interval": None})
+        self.rebalance()
+
+    def unregister(self, monitor):
+        with self._lock:
+            self._entries.pop(monitor, None)
+        self.rebalance()
+
+    def report(self, monitor, eta_seconds=None, remaining=None, fixed_interval=None):
+        """
+        eta_seconds: predicted seconds to the target (None when unknown)
+        remaining: views left to the target
+        fixed_interval: the monitor's local interval override, if any
+        """
+        with self._lock:
+            e = self._entries.get(monitor)
+            if e is None:
+                return
+            e["eta"] = eta_seconds
+            e["remaining"] = remaining
+            e["fixed"] = fixed_interval
+        self.rebalance()
+
+    def interval_for(self, monitor):
+        with self._lock:
+            e = self._entries.get(monitor)
+            return e["interval"] if e else None
+
+    # ------------------------------------------------------------------
+    def _desired(self, e, default):
+        if e["fixed"]:
+            return float(e["fixed"])
+        eta, remaining = e["eta"], e["remaining"]
+        if eta is None:
+            desired = float(default)
+        else:
+            desired = max(0.0, float(eta)) / self.SAMPLES_TO_TARGET
+        if remaining is not None and 0 < remaining <= self.SPRINT_REMAINING:
+            desired = min(desired, self.SPRINT_INTERVAL)
+        return min(self.max_interval, max(self.min_interval, desired))
+
+    def _allocate(self, desired, fixed):
+        """ desired: {monitor: seconds}; fixed monitors are not stretched. -> {monitor: seconds} """
+        demand = {m: 60.0 / s for m, s in desired.items()}
+        if sum(demand.values()) <= self.budget_rpm:
+            return dict(desired)
+
+        out = {m: desired[m] for m in fixed}
+        budget = self.budget_rpm - sum(demand[m] for m in fixed)
+        flexible = sorted((m for m in desired if m not in fixed), key=lambda m: desired[m])
+        floor = 60.0 / self.max_interval
+        # everybody keeps its floor; the rest goes to the most urgent monitors first
+        budget -= floor * len(flexible)
+        for m in flexible:
+            rpm = floor + max(0.0, min(demand[m] - floor, budget))
+            budget -= rpm - floor
+            out[m] = 60.0 / rpm
+        return out
+
+    def rebalance(self):
+        try:
+            default = self.get_default_interval()
+        except Exception:
+            default = 75
+        with self._lock:
+            desired = {m: self._desired(e, default) for m, e in self._entries.items()}
+            fixed = {m for m, e in self._entries.items() if e["fixed"]}
+            alloc = self._allocate(desired, fixed)
+            changes = []
+            for m, iv in alloc.items():
+                iv = int(round(iv))
+                e = self._entries[m]
+                old = e["interval"]
+                if old != iv:
+                    e["interval"] = iv
+                    changes.append((m, iv, old is not None and iv < old * self.WAKE_RATIO))
+        for m, iv, wake in changes:
+            try:
+                m.on_scheduled_interval(iv)
+                if wake:
+                    m.wake()
+            except Exception as ex:
+                self.log("更新间隔失败: %s" % ex)
+
+    def stats(self):
+        with self._lock:
+            ivs = [e["interval"] for e in self._entries.values() if e["interval"]]
+            return {
+                "monitors": len(self._entries),
+                "budget_rpm": self.budget_rpm,
+                "planned_rpm": sum(60.0 / iv for iv in ivs),
+                "min_interval": min(ivs) if ivs else None,
+                "max_interval": max(ivs) if ivs else None,
+            }
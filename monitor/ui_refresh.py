@@ -0,0 +1,76 @@
+# monitor/ui_refresh.py
+import threading
+import time
+
+
+class RefreshTicker:
+    """
+    One GUI refresh loop at a fixed frame rate, on the Tk thread.
+
+    Producers (any thread) call mark(key, fn) when something behind a widget changed; marking
+    the same key again before the next frame only keeps the latest fn. Every frame runs each
+    pending fn once, so UI work follows the frame rate, not sample rate x number of BVs. The
+    callbacks decide for themselves whether they are on screen (hidden views skip their work
+    and catch up when shown).
+    """
+
+    DEFAULT_FPS = 4
+
+    def __init__(self, root, fps=DEFAULT_FPS, on_log=None):
+        self.root = root
+        self.fps = max(0.5, float(fps or self.DEFAULT_FPS))
+        self.on_log = on_log or print
+        self._lock = threading.Lock()
+        self._dirty = {}  # key -> fn, in marking order
+        self._running = False
+        self._frames = 0
+        self._calls = 0
+        self._frame_time = 0.0
+
+    def mark(self, key, fn):
+        """ Run fn on the next frame (thread-safe, coalesced per key). """
+        with self._lock:
+            self._dirty[key] = fn
+
+    def discard(self, key):
+        with self._lock:
+            self._dirty.pop(key, None)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(int(1000 / self.fps), self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def _tick(self):
+        if not self._running:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        t0 = time.perf_counter()
+        for fn in dirty.values():
+            try:
+                fn()
+            except Exception as e:
+                try:
+                    self.on_log("界面刷新失败: %s" % e)
+                except Exception:
+                    pass
+        if dirty:
+            self._frames += 1
+            self._calls += len(dirty)
+            self._frame_time += time.perf_counter() - t0
+        try:
+            self.root.after(int(1000 / self.fps), self._tick)
+        except Exception:
+            self._running = False
+
+    def stats(self):
+        return {
+            "fps": self.fps,
+            "frames": self._frames,
+            "calls": self._calls,
+            "avg_frame_ms": (self._frame_time / self._frames * 1000) if self._frames else 0.0,
+        }
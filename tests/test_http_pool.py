@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from monitor import http_pool
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+
+class Server:
+    """ Local HTTP server that records the client port of every request and the peak concurrency. """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.peers = []
+        self.active = 0
+        self.peak = 0
+        self._runner = None
+        self.url = None
+
+    async def _handle(self, request):
+        self.peers.append(request.transport.get_extra_info("peername")[1])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return web.Response(text="ok")
+        finally:
+            self.active -= 1
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = "http://127.0.0.1:%d/" % self._runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def default_settings():
+    yield
+    http_pool.configure(None, **http_pool.DEFAULTS)
+
+
+async def fetch(url):
+    async with http_pool.get_async_session().get(url) as resp:
+        return await resp.text()
+
+
+def test_session_is_shared_and_keeps_connections_alive():
+    async def run():
+        async with Server() as server:
+            session = http_pool.get_async_session()
+            assert http_pool.get_async_session() is session
+            for _ in range(5):
+                assert await fetch(server.url) == "ok"
+            await http_pool.close_async()
+            return server.peers
+
+    peers = asyncio.run(run())
+    assert len(peers) == 5
+    assert len(set(peers)) == 1  # one keep-alive connection for all five requests
+
+
+def test_per_host_limit():
+    http_pool.configure(http_pool_per_host=2)
+
+    async def run():
+        async with Server(delay=0.1) as server:
+            await asyncio.gather(*(fetch(server.url) for _ in range(8)))
+            await http_pool.close_async()
+            return server
+
+    server = asyncio.run(run())
+    assert server.peak == 2
+    assert len(set(server.peers)) == 2
+
+
+def test_total_limit_over_hosts():
+    http_pool.configure(http_pool_per_host=8, http_pool_total=3)
+
+    async def run():
+        async with Server(delay=0.1) as a, Server(delay=0.1) as b:
+            peak = 0
+
+            async def watch():
+                nonlocal peak
+                while True:
+                    peak = max(peak, a.active + b.active)
+                    await asyncio.sleep(0.005)
+
+            watcher = asyncio.ensure_future(watch())
+            await asyncio.gather(*(fetch(s.url) for s in (a, b) for _ in range(4)))
+            watcher.cancel()
+            await http_pool.close_async()
+            return peak
+
+    assert asyncio.run(run()) == 3
+
+
+def test_close_async():
+    async def run():
+        async with Server() as server:
+            session = http_pool.get_async_session()
+            await fetch(server.url)
+            await http_pool.close_async()
+            assert session.closed
+            # the next use on this loop gets a fresh session
+            fresh = http_pool.get_async_session()
+            assert fresh is not session and not fresh.closed
+            assert await fetch(server.url) == "ok"
+            await http_pool.close_async()
+            assert fresh.closed
+            await http_pool.close_async()  # nothing left to close
+
+    asyncio.run(run())
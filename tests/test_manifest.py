@@ -0,0 +1,24 @@
+import os
+
+from monitor.manifest import entry_matches, load_manifest, update_manifest
+
+
+def test_entry_matches_by_size_and_mtime(tmp_path):
+    path = tmp_path / "BV1xx.xlsx"
+    path.write_bytes(b"x" * 100)
+    records = [{"time": "2024-01-01 00:00:00", "view": 1}, {"time": "2024-01-01 00:00:30", "view": 2}]
+
+    entry = update_manifest(str(tmp_path), "xlsx", str(path), records)
+    assert load_manifest(str(tmp_path)) == {"xlsx": entry}
+    assert (entry["records"], entry["last_time"]) == (2, "2024-01-01 00:00:30")
+    assert entry_matches(entry, str(path))
+
+    # touched: same bytes, but no longer the file that was recorded
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert not entry_matches(entry, str(path))
+
+    path.write_bytes(b"y" * 101)
+    assert not entry_matches(entry, str(path))
+    assert not entry_matches(entry, str(tmp_path / "missing.xlsx"))
+    assert not entry_matches(None, str(path))
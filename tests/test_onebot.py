@@ -0,0 +1,247 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from monitor.fake_onebot import FakeOneBot, measure_failover
+from monitor.notifier import OneBotError, OneBotWSClient
+from monitor.outbox import Outbox
+
+
+def config(*bots, **extra):
+    cfg = {
+        "onebot_enabled": True,
+        "onebot_ws_urls": [b.url for b in bots],
+        "onebot_target_rate_per_min": 60000,
+        "onebot_coalesce_window": 0,
+    }
+    cfg.update(extra)
+    return cfg
+
+
+def wait_for(cond, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met within %ss" % timeout)
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def bots():
+    started = []
+
+    def make(cls=FakeOneBot, **kw):
+        bot = cls(**kw)
+        bot.log = lambda msg: None
+        started.append(bot.start())
+        return bot
+
+    yield make
+    for bot in started:
+        bot.stop()
+
+
+@pytest.fixture
+def clients():
+    started = []
+
+    def make(cfg, cls=OneBotWSClient, **kw):
+        client = cls(lambda: cfg, on_log=lambda msg: None, **kw)
+        started.append(client)
+        return client
+
+    yield make
+    for client in started:
+        client.stop()
+
+
+def test_send_while_loop_starts(bots, clients):
+    bot = bots()
+    draining = threading.Event()
+    submitted = threading.Event()
+
+    class SlowStart(OneBotWSClient):
+        async def _enqueue(self, *item):
+            if not draining.is_set():
+                # first backlog item: hold the loop thread while another send comes in
+                draining.set()
+                submitted.wait(5)
+            await super()._enqueue(*item)
+
+    client = clients(config(bot), SlowStart)
+    first = client.send_async("send_group_msg", {"group_id": 1, "message": "a"})
+    assert draining.wait(5)
+    second = client.send_async("send_group_msg", {"group_id": 1, "message": "b"})
+    submitted.set()
+
+    assert first.result(10)["status"] == "ok"
+    assert second.result(10)["status"] == "ok"
+    assert [p["message"] for _, a, p in bot.received if a == "send_group_msg"] == ["a", "b"]
+
+
+def test_concurrent_sends_during_start(bots, clients):
+    bot = bots()
+    client = clients(config(bot))
+    futures = []
+    lock = threading.Lock()
+
+    def submit(worker):
+        for i in range(20):
+            fut = client.send_async("send_private_msg", {"user_id": worker, "message": str(i)})
+            with lock:
+                futures.append(fut)
+
+    threads = [threading.Thread(target=submit, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(futures) == 80
+    for fut in futures:
+        assert fut.result(10)["status"] == "ok"
+    assert bot.count("send_private_msg") == 80
+
+
+def test_expired_merged_forward_is_forgotten(bots, clients):
+    # forwards are never answered; get_status still is, so the socket stays up and only the
+    # echo timeouts can settle the merged forward
+    bot = bots(hang_actions=["send_group_forward_msg"])
+    client = clients(config(bot, onebot_coalesce_window=0.3))
+    futures = [client.send_group_forward_async(1, [{"type": "node", "data": {"content": str(i)}}], timeout=0.5)
+               for i in range(3)]
+
+    for fut in futures:
+        with pytest.raises(OneBotError, match="timed out"):
+            fut.result(10)
+    assert bot.count("send_group_forward_msg") == 1  # the three rode in one forward
+    assert client.stats()["coalesced"] == 2
+    assert client.is_connected()
+    wait_for(lambda: not client._pending)
+    assert client._merged == {}
+    assert client._member_of == {}
+    for ep in client._endpoints.values():
+        assert not any(client._is_live(e) for e in ep.inflight)
+
+
+def endpoint(client, bot):
+    return client._endpoints[bot.url]
+
+
+def on_loop(client, coro, timeout=10):
+    return asyncio.run_coroutine_threadsafe(coro, client._loop).result(timeout)
+
+
+def test_failover_to_next_endpoint(bots, clients):
+    primary, backup = bots(name="primary"), bots(name="backup")
+    client = clients(config(primary, backup))
+    client.start()
+    wait_for(lambda: client.stats()["healthy"] == 2)
+
+    assert client.send_and_wait("send_group_msg", {"group_id": 1, "message": "before"})["status"] == "ok"
+    assert (primary.count("send_group_msg"), backup.count("send_group_msg")) == (1, 0)
+
+    primary.go_down()
+    wait_for(lambda: not endpoint(client, primary).healthy)
+    futures = [client.send_async("send_group_msg", {"group_id": 1, "message": str(i)}) for i in range(5)]
+    for fut in futures:
+        assert fut.result(10)["status"] == "ok"
+    assert (primary.count("send_group_msg"), backup.count("send_group_msg")) == (1, 5)
+
+    # back up: failover mode prefers the first configured endpoint again
+    primary.go_up()
+    wait_for(lambda: endpoint(client, primary).healthy, timeout=15)
+    client.send_and_wait("send_group_msg", {"group_id": 1, "message": "after"})
+    assert (primary.count("send_group_msg"), backup.count("send_group_msg")) == (2, 5)
+
+
+def test_outbox_delivers_through_failover():
+    result = measure_failover(messages=20, interval=0.02, kill_after=5)
+    assert result["undelivered"] == 0
+    assert result["backup"] >= 15
+    assert result["primary"] + result["backup"] >= 20  # at least once: in-flight ones may repeat
+
+
+def test_pinned_action_fails_when_its_endpoint_is_down(bots, clients):
+    primary, backup = bots(name="primary"), bots(name="backup")
+    client = clients(config(primary, backup))
+    client.start()
+    wait_for(lambda: client.stats()["healthy"] == 2)
+
+    # pinned to the backup while the primary (first in failover order) is up
+    resp = on_loop(client, client._request("get_login_info", {}, 5, endpoint=endpoint(client, backup)))
+    assert resp["data"]["nickname"] == "backup"
+    assert primary.count("get_login_info") == 0
+
+    ep = endpoint(client, primary)
+    primary.go_down()
+    wait_for(lambda: not ep.healthy)
+    with pytest.raises(OneBotError, match="not connected"):
+        on_loop(client, client._request("get_login_info", {}, 5, endpoint=ep))
+    assert backup.count("get_login_info") == 1  # not rerouted
+
+
+def test_inflight_actions_fail_when_socket_drops(bots, clients):
+    bot = bots(hang_actions=["send_group_msg"])
+    client = clients(config(bot))
+    fut = client.send_async("send_group_msg", {"group_id": 1, "message": "x"}, timeout=60)
+    wait_for(lambda: bot.count("send_group_msg") == 1)
+    assert not fut.done()
+
+    bot.go_down()
+    with pytest.raises(OneBotError, match="connection lost"):
+        fut.result(5)  # long before its 60 s timeout
+    assert not client._pending
+
+
+def test_action_expiring_while_no_endpoint_is_healthy_is_never_sent(bots, clients):
+    bot = bots()
+    client = clients(config(bot))
+    client.start()
+    wait_for(client.is_connected)
+    bot.go_down()
+    wait_for(lambda: not client.is_connected())
+
+    fut = client.send_async("send_group_msg", {"group_id": 1, "message": "late"}, timeout=0.5)
+    with pytest.raises(OneBotError, match="timed out"):
+        fut.result(5)  # the deadline runs while the action waits, not from the send
+
+    bot.go_up()
+    wait_for(client.is_connected, timeout=15)
+    assert client.send_and_wait("send_group_msg", {"group_id": 1, "message": "next"})["status"] == "ok"
+    # the caller was told "failed": the expired action must not be delivered afterwards
+    assert [p["message"] for _, a, p in bot.received if a == "send_group_msg"] == ["next"]
+    assert not client._pending
+
+
+class FlakyBot(FakeOneBot):
+    """ Rejects the first attempt of each message listed in fail_once. """
+
+    def __init__(self, fail_once, **kw):
+        super().__init__(**kw)
+        self.fail_once = set(fail_once)
+
+    def _answer(self, action, echo):
+        message = self.received[-1][2].get("message")  # answered right after it is recorded
+        if message in self.fail_once:
+            self.fail_once.discard(message)
+            return {"status": "failed", "retcode": 100, "data": None, "wording": "fake failure", "echo": echo}
+        return super()._answer(action, echo)
+
+
+def test_outbox_failure_mid_batch_keeps_order(bots, clients, tmp_path):
+    bot = bots(cls=FlakyBot, fail_once=["b"])
+    outbox = Outbox(str(tmp_path), on_log=lambda m: None)
+    for message in "abcd":  # queued before the client starts: all in its first peek
+        outbox.put("send_group_msg", {"group_id": 1, "message": message}, target="group:1")
+    acked = []
+    ack = outbox.ack
+    outbox.ack = lambda seq: (acked.append(seq), ack(seq))
+    client = clients(config(bot), outbox=outbox)
+    client.start()
+    wait_for(lambda: not len(outbox))
+    # "b" is rejected once: nothing behind it goes out (or is acked) before its retry succeeds
+    assert [p["message"] for _, a, p in bot.received if a == "send_group_msg"] == ["a", "b", "b", "c", "d"]
+    assert acked == [0, 1, 2, 3]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from monitor.core import BVMonitor
+
+
+class Engine:
+    """ The parts of MonitorEngine that BVMonitor's tick scheduling uses. """
+
+    fixed_rate = True
+    align_ticks = False
+    scheduler = None
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def call_soon(self, fn):
+        self.loop.call_soon_threadsafe(fn)
+
+
+def make_monitor(interval):
+    logs = []
+    loop = asyncio.get_running_loop()
+    monitor = BVMonitor("BV1tick", lambda: interval, on_log=logs.append, exporter=object(),
+                        engine=Engine(loop), cover_cache=object())
+    monitor.is_monitoring = True
+    monitor._wake_event = asyncio.Event()
+    monitor._tick_interval = interval
+    return monitor, logs
+
+
+def skipped(logs):
+    return [m for m in logs if "跳过" in m]
+
+
+def test_overrun_skips_missed_ticks():
+    async def run():
+        monitor, logs = make_monitor(0.2)
+        loop = asyncio.get_running_loop()
+        tick = loop.time() - 0.9  # the sample overran the ticks at +0.2 … +0.8
+        nxt = await monitor._sleep_interval(monitor._run_id, tick)
+        return logs, nxt - tick
+
+    logs, gap = asyncio.run(run())
+    assert skipped(logs) == ["[BV1tick] 采样超时，跳过 4 个周期"]
+    assert gap == pytest.approx(1.0)
+
+
+def test_interval_shrink_while_sleeping_is_not_an_overrun():
+    async def run():
+        monitor, logs = make_monitor(2.0)
+        loop = asyncio.get_running_loop()
+        tick = loop.time()
+        sleep = asyncio.ensure_future(monitor._sleep_interval(monitor._run_id, tick))
+        await asyncio.sleep(0.5)
+        monitor._local_interval = 0.1  # as set_local_interval, without its int() rounding
+        monitor.wake()
+        nxt = await asyncio.wait_for(sleep, 1)
+        return logs, nxt - tick, loop.time() - tick
+
+    logs, gap, elapsed = asyncio.run(run())
+    assert skipped(logs) == []
+    # 0.1 s after the last tick is already past: the next sample is due at once
+    assert 0.5 <= gap <= elapsed < 1.0
+
+
+def test_interval_change_between_samples_is_not_an_overrun():
+    async def run():
+        monitor, logs = make_monitor(2.0)
+        monitor._scheduled_interval = 0.1  # the scheduler shrank the share during the sample
+        loop = asyncio.get_running_loop()
+        tick = loop.time() - 0.5
+        nxt = await monitor._sleep_interval(monitor._run_id, tick)
+        # from here on the ticks follow the new interval again
+        following = await monitor._sleep_interval(monitor._run_id, nxt)
+        return logs, nxt - tick, following - nxt
+
+    logs, gap, following = asyncio.run(run())
+    assert skipped(logs) == []
+    assert gap == pytest.approx(0.5, abs=0.05)
+    assert following == pytest.approx(0.1)
+
+
+def test_interval_growth_while_sleeping_extends_the_tick():
+    async def run():
+        monitor, logs = make_monitor(0.3)
+        loop = asyncio.get_running_loop()
+        tick = loop.time()
+        sleep = asyncio.ensure_future(monitor._sleep_interval(monitor._run_id, tick))
+        await asyncio.sleep(0.1)
+        monitor._local_interval = 0.6
+        monitor.wake()
+        nxt = await sleep
+        return logs, nxt - tick
+
+    logs, gap = asyncio.run(run())
+    assert skipped(logs) == []
+    assert gap == pytest.approx(0.6)